@@ -0,0 +1,102 @@
+# api/accounts.py
+"""
+Cached account lookups on the login and authentication paths.
+
+Email -> username resolution for logins goes through LOWER(email), which
+migration 0016 indexes on auth_user, instead of `email__iexact`
+(UPPER()/LIKE, a full scan). The answer, including "no such user", is
+cached for LOGIN_EMAIL_CACHE_TTL seconds; saving a user drops the entry
+for their current email, so a new registration can log in straight away.
+
+TokenState caches the few user fields that stateless access tokens are
+checked against (api/authentication.py); it is dropped on the same saves.
+"""
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.functions import Lower
+
+_MISSING = ""  # cached "no user with this email"
+
+
+def _key(email):
+    return f"login-email:{email}"
+
+
+def users_with_email(email):
+    """Case-insensitive match on email that can use the LOWER(email) index."""
+    return User.objects.alias(email_lower=Lower("email")).filter(email_lower=email.strip().lower())
+
+
+def username_for_email(email):
+    """The username to authenticate `email` with, or None if nobody has it."""
+    email = email.strip().lower()
+    username = cache.get(_key(email))
+    if username is None:
+        username = users_with_email(email).order_by("pk").values_list("username", flat=True).first()
+        cache.set(_key(email), username or _MISSING, timeout=getattr(settings, "LOGIN_EMAIL_CACHE_TTL", 60))
+    return username or None
+
+
+def forget_email(email):
+    if email:
+        cache.delete(_key(email.strip().lower()))
+
+
+# ---------- token state (see api/authentication.py) ----------
+
+class TokenState(NamedTuple):
+    """What access-token claims are checked against; None means inactive/gone."""
+    version: int
+    is_staff: bool
+    email: str
+    name: str
+
+
+_UNSET = object()
+_STATE_FIELDS = ("profile__token_version", "is_staff", "email", "first_name", "last_name")
+
+
+def _state_key(user_id):
+    return f"token-state:{user_id}"
+
+
+def _state(row):
+    if row is None:
+        return None
+    version, is_staff, email, first, last = row
+    return TokenState(version or 0, is_staff, email, f"{first} {last}".strip())
+
+
+def _state_query(user_id):
+    return User.objects.filter(pk=user_id, is_active=True).values_list(*_STATE_FIELDS)
+
+
+def token_state(user_id):
+    """The user's current TokenState, cached for TOKEN_STATE_CACHE_TTL seconds."""
+    state = cache.get(_state_key(user_id), _UNSET)
+    if state is _UNSET:
+        state = _state(_state_query(user_id).first())
+        cache.set(_state_key(user_id), state, timeout=getattr(settings, "TOKEN_STATE_CACHE_TTL", 300))
+    return state
+
+
+def fresh_token_state(user_id):
+    """token_state() read from the database, refreshing this process's cached copy."""
+    state = _state(_state_query(user_id).first())
+    cache.set(_state_key(user_id), state, timeout=getattr(settings, "TOKEN_STATE_CACHE_TTL", 300))
+    return state
+
+
+async def atoken_state(user_id):
+    state = await cache.aget(_state_key(user_id), _UNSET)
+    if state is _UNSET:
+        state = _state(await _state_query(user_id).afirst())
+        await cache.aset(_state_key(user_id), state, timeout=getattr(settings, "TOKEN_STATE_CACHE_TTL", 300))
+    return state
+
+
+def forget_token_state(user_id):
+    cache.delete(_state_key(user_id))
@@ -0,0 +1,145 @@
+# api/async_views.py
+"""
+Native async versions of the hot read endpoints, routed in front of the
+DRF views when ASYNC_READ_VIEWS is on (config/asgi.py turns it on).
+
+Under ASGI every sync DRF view costs a hop to the thread pool. These serve
+the common case on the event loop with the async ORM and cache, and render
+the same JSON as the DRF views (the style catalog even shares their cache
+entries and ETags). Anything off the hot path — writes, the browsable API,
+cursor pagination, bad filters, missing or invalid tokens — is handed to
+the sync view, so behaviour and error bodies stay identical.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.dateparse import parse_date
+from django.utils.timezone import now
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .authentication import TokenUserAuthentication, atoken_user
+from .cache import acurrent_version, etag_matches, response_entry, response_key
+from .models import Appointment, SlotAvailability, STYLE_CACHE_NAMESPACE
+from .serializers import AppointmentReadSerializer, StyleSerializer
+from .views import INVALID_STYLE_ID, AppointmentViewSet, StyleViewSet, _bad_style_id
+
+
+def _fallback(view):
+    """Run a DRF view on the sync thread and hand back a rendered response."""
+    return sync_to_async(lambda request: view(request).render())
+
+
+def _action_view(name):
+    """The DRF view the router mounts for an AppointmentViewSet list action."""
+    handler = getattr(AppointmentViewSet, name)
+    return _fallback(AppointmentViewSet.as_view(
+        {"get": name}, basename="appointment", detail=False, **handler.kwargs
+    ))
+
+
+_sync_styles = _fallback(StyleViewSet.as_view({"get": "list", "post": "create"}))
+_sync_taken = _action_view("taken")
+_sync_upcoming = _action_view("upcoming")
+
+PAGINATION_PARAMS = ("page_size", "cursor")
+
+
+def _json(data, status=200, headers=None):
+    return HttpResponse(
+        JSONRenderer().render(data), status=status, headers=headers, content_type="application/json",
+    )
+
+
+def _hot_path(request, paginated=False):
+    """Plain JSON GETs only; the browsable API and ?format= stay on DRF."""
+    return (
+        request.method == "GET"
+        and "format" not in request.GET
+        and "text/html" not in request.headers.get("Accept", "")
+        and not (paginated and any(p in request.GET for p in PAGINATION_PARAMS))
+    )
+
+
+def _style_queryset(request):
+    """StyleViewSet's filtered, ordered queryset; builds SQL but runs none."""
+    view = StyleViewSet(request=Request(request), format_kwarg=None, action="list")
+    queryset = view.get_queryset()
+    for backend in view.filter_backends:
+        queryset = backend().filter_queryset(view.request, queryset, view)
+    return queryset
+
+
+@csrf_exempt
+async def style_list(request):
+    """GET /api/styles/"""
+    if not _hot_path(request, paginated=True):
+        return await _sync_styles(request)
+
+    version = await acurrent_version(STYLE_CACHE_NAMESPACE)
+    key = response_key(STYLE_CACHE_NAMESPACE, version, "json", request)
+    entry = await cache.aget(key)
+    if entry is None:
+        try:
+            queryset = _style_queryset(request)
+        except ValidationError:
+            return await _sync_styles(request)
+        data = StyleSerializer([style async for style in queryset.aiterator()], many=True).data
+        entry = response_entry("json", data)
+        await cache.aset(key, entry, timeout=getattr(settings, "RESPONSE_CACHE_TTL", 300))
+    data, etag = entry
+
+    if etag_matches(request, etag):
+        return HttpResponse(status=304, headers={"ETag": etag})
+    return _json(data, headers={"ETag": etag})
+
+
+async def taken(request):
+    """GET /api/appointments/taken/?date=YYYY-MM-DD[&style_id=]"""
+    if not _hot_path(request):
+        return await _sync_taken(request)
+
+    date_str = request.GET.get("date")
+    day = parse_date(date_str) if date_str else None
+    if not day:
+        return _json({"detail": "Missing or invalid date (YYYY-MM-DD)."}, status=400)
+
+    style_id = request.GET.get("style_id")
+    if _bad_style_id(style_id):
+        return _json({"detail": INVALID_STYLE_ID}, status=400)
+    availability = await SlotAvailability.objects.aavailability_on(day, style_id)
+    return _json({"date": date_str, "style_id": style_id, **availability})
+
+
+async def _token_user(request):
+    """The LazyTokenUser for a valid Bearer token, or None to let DRF answer."""
+    auth = TokenUserAuthentication()
+    header = auth.get_header(request)
+    raw = auth.get_raw_token(header) if header else None
+    if raw is None:
+        return None
+    try:
+        token = auth.get_validated_token(raw)
+    except (InvalidToken, TokenError):
+        return None
+    return await atoken_user(token)
+
+
+async def upcoming(request):
+    """GET /api/appointments/upcoming/ with a Bearer token."""
+    if not _hot_path(request, paginated=True):
+        return await _sync_upcoming(request)
+    user = await _token_user(request)
+    if user is None:
+        return await _sync_upcoming(request)
+
+    qs = Appointment.objects.all()
+    if not user.is_staff:
+        qs = qs.filter(user_id=user.id)
+    qs = qs.filter(datetime__gte=now()).exclude(status="cancelled").order_by("datetime")
+    rows = [row async for row in AppointmentReadSerializer.values_queryset(qs).aiterator()]
+    return _json(AppointmentReadSerializer(rows, many=True).data)
@@ -0,0 +1,124 @@
+# api/authentication.py
+"""
+Stateless JWT authentication.
+
+Access tokens carry the claims most requests need: user id, is_staff,
+email, name, and `ver` (the user's Profile.token_version at issue time).
+TokenUserAuthentication trusts them instead of fetching the User on every
+request. It only checks them against the user's cached TokenState
+(api/accounts.py; one small query on a miss):
+
+- user inactive or gone, or `ver` behind: 401. revoke_tokens() bumps the
+  version, which kills every outstanding access and refresh token; it
+  runs whenever a password changes or a user is deactivated;
+- is_staff/email/name changed since issue: the real User is loaded, so
+  the request sees current data until the client logs in again;
+- otherwise request.user is a LazyTokenUser built from the claims.
+
+Touching anything on a LazyTokenUser beyond id/pk/is_staff/email and
+get_full_name() loads the real User once. The ORM only takes real User
+instances, so filter and assign foreign keys by id (`user_id=user.id`).
+"""
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .accounts import atoken_state, forget_token_state, fresh_token_state, token_state
+from .models import Profile
+
+CLAIMS = ("is_staff", "email", "name", "ver")
+
+
+def add_claims(token, user):
+    """Stamp the stateless claims onto a freshly issued token."""
+    # read fresh: a version cached before a revocation would mint dead tokens
+    state = fresh_token_state(user.pk)
+    token["is_staff"] = user.is_staff
+    token["email"] = user.email
+    token["name"] = user.get_full_name()
+    token["ver"] = state.version if state else 0
+    return token
+
+
+def revoke_tokens(user_id):
+    """
+    Invalidate every access and refresh token issued to this user so far.
+    Saving a User with a new password, or deactivating one, calls this.
+    """
+    Profile.objects.filter(user_id=user_id).update(token_version=F("token_version") + 1)
+    forget_token_state(user_id)
+
+
+def _claims_current(token, state):
+    return all(name in token for name in CLAIMS) and (
+        token["is_staff"], token["email"], token["name"]
+    ) == (state.is_staff, state.email, state.name)
+
+
+def check_token(token, state):
+    """Raise unless `token` (access or refresh) is still valid for `state`."""
+    if state is None:
+        raise AuthenticationFailed(_("User is inactive or no longer exists."), code="user_inactive")
+    if token.get("ver", 0) != state.version:
+        raise AuthenticationFailed(_("Token has been revoked."), code="token_revoked")
+
+
+class LazyTokenUser(TokenUser):
+    """request.user backed by token claims; the User row is loaded on demand."""
+
+    @cached_property
+    def id(self):
+        # simplejwt stores the id claim as a string
+        return User._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def email(self):
+        return self.token["email"]
+
+    def get_full_name(self):
+        return self.token["name"]
+
+    @cached_property
+    def username(self):
+        return self.instance.username
+
+    @cached_property
+    def instance(self):
+        return User.objects.get(pk=self.id)
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.instance, attr)
+
+
+class TokenUserAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from exc
+
+        state = token_state(user_id)
+        check_token(validated_token, state)
+        if _claims_current(validated_token, state):
+            return LazyTokenUser(validated_token)
+        return super().get_user(validated_token)
+
+
+async def atoken_user(validated_token):
+    """LazyTokenUser for async views, or None if the sync path must decide."""
+    user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+    if user_id is None:
+        return None
+    state = await atoken_state(user_id)
+    try:
+        check_token(validated_token, state)
+    except AuthenticationFailed:
+        return None
+    return LazyTokenUser(validated_token) if _claims_current(validated_token, state) else None
@@ -0,0 +1,326 @@
+# api/bench/fixtures.py
+"""
+Seed data, stubs and the endpoint budgets shared by the bench scenarios
+and the test suite. Patches settings and network clients, so only tests
+and `manage.py bench` import it.
+"""
+import hashlib
+import hmac
+import json
+import random
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.mail import get_connection
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from ..cache import bump_version
+from ..models import Style, Appointment, Profile, SlotAvailability, STYLE_CACHE_NAMESPACE
+
+
+def seed_styles(count=3):
+    return Style.objects.bulk_create(
+        Style(
+            name=f"Bench Style {i}", category="bench",
+            price_min=50, price_max=80, duration_mins=60,
+        )
+        for i in range(count)
+    )
+
+
+def seed_history(styles, size, days_back=365, days_ahead=90, seed=11):
+    """Bulk-insert `size` appointments spread over [-days_back, +days_ahead] days."""
+    rng = random.Random(seed)
+    now = timezone.now()
+    span = (days_back + days_ahead) * 24 * 60
+    Appointment.objects.bulk_create(
+        (
+            Appointment(
+                style=rng.choice(styles),
+                datetime=now + timedelta(minutes=rng.randrange(span) - days_back * 24 * 60),
+                status=rng.choice(["pending", "approved", "paid", "completed", "cancelled"]),
+                contact_name="Bench Guest",
+                contact_email=f"bench{i}@example.com",
+            )
+            for i in range(size)
+        ),
+        batch_size=5000,
+    )
+
+
+def auth_header(user):
+    from ..views import MyTokenObtainPairSerializer
+    return {"HTTP_AUTHORIZATION": f"Bearer {MyTokenObtainPairSerializer.get_token(user).access_token}"}
+
+
+def seed_appointments(styles, start, days, per_day, rng=None):
+    """
+    Bulk-insert `per_day` appointments per day on half-hour slots between
+    09:00 and 18:00, then rebuild the affected availability buckets.
+    """
+    rng = rng or random.Random(42)
+    slots = [(h, m) for h in range(9, 18) for m in (0, 30)]
+    rows = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        for i in range(per_day):
+            hour, minute = rng.choice(slots)
+            rows.append(Appointment(
+                style=rng.choice(styles),
+                datetime=datetime(day.year, day.month, day.day, hour, minute, tzinfo=dt_timezone.utc),
+                status=rng.choice(["pending", "approved", "paid", "cancelled"]),
+                contact_name="Bench Guest",
+                contact_email=f"bench{offset}-{i}@example.com",
+            ))
+    Appointment.objects.bulk_create(rows, batch_size=1000)
+    SlotAvailability.objects.refresh_many(
+        (start + timedelta(days=d), s.id) for d in range(days) for s in styles
+    )
+    return len(rows)
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """
+    Minimal local SMTP server that accepts everything and counts
+    connections/messages, so mail benchmarks don't need a real relay.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPStubHandler)
+        self.connections = 0
+        self.messages = 0
+        self._count_lock = threading.Lock()
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+    def connection(self):
+        host, port = self.server_address
+        return get_connection(
+            "django.core.mail.backends.smtp.EmailBackend", host=host, port=port, fail_silently=False,
+        )
+
+    def count(self, attr):
+        with self._count_lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+
+class _SMTPStubHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.count("connections")
+        self.reply("220 stub ready")
+        in_data = False
+        for raw in self.rfile:
+            line = raw.rstrip(b"\r\n")
+            if in_data:
+                if line == b".":
+                    in_data = False
+                    self.server.count("messages")
+                    self.reply("250 queued")
+                continue
+            verb = line[:4].upper()
+            if verb == b"DATA":
+                in_data = True
+                self.reply("354 go ahead")
+            elif verb == b"QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+    def reply(self, text):
+        self.wfile.write(text.encode() + b"\r\n")
+
+
+# ---------- endpoint budgets (tests + `bench endpoints`) ----------
+
+BENCH_PASSWORD = "pw-bench-12345"
+WEBHOOK_SECRET = "whsec_bench_secret"
+
+
+def stripe_signature(payload, secret, timestamp=None):
+    """Stripe-Signature header as stripe.Webhook.construct_event verifies it."""
+    timestamp = int(timestamp or time.time())
+    digest = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+class StubCheckout:
+    """Stands in for stripe.checkout.Session so checkout makes no network calls."""
+
+    def __init__(self):
+        self.created = 0
+
+    def create(self, **kwargs):
+        self.created += 1
+        return SimpleNamespace(
+            id=f"cs_stub_{self.created}", url=f"https://checkout.stripe.test/{self.created}",
+            expires_at=int(time.time()) + 24 * 3600,
+        )
+
+    def expire(self, session_id):
+        pass
+
+
+@contextmanager
+def endpoint_environment():
+    """Stripe stubbed and a known webhook secret, for driving every endpoint."""
+    with mock.patch("stripe.api_key", "sk_test_stub"), \
+            mock.patch("stripe.checkout.Session", StubCheckout()), \
+            override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET):
+        yield
+
+
+def seed_realistic(styles=40, customers=25, per_customer=20, history=3000):
+    """
+    A catalog, customers (with profiles) who each have past and upcoming
+    bookings, a staff user, guest history, and a busy day in the index.
+    """
+    catalog = seed_styles(styles)
+    password = make_password(BENCH_PASSWORD)  # hash once, not per user
+    users = User.objects.bulk_create(
+        User(username=f"bench-user-{i}", email=f"bench-user-{i}@example.com",
+             first_name="Bench", last_name=f"User {i}", password=password)
+        for i in range(customers)
+    )
+    Profile.objects.bulk_create(Profile(user=user) for user in users)
+    staff = User.objects.create(
+        username="bench-staff", email="bench-staff@example.com", is_staff=True, password=password,
+    )
+
+    start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=120)
+    Appointment.objects.bulk_create(
+        (
+            Appointment(
+                user=user, style=catalog[(i + j) % len(catalog)],
+                datetime=start + timedelta(days=j * 9, hours=i % 8),
+                status="completed" if j < per_customer // 2 else "approved",
+                contact_name=user.get_full_name(), contact_email=user.email,
+            )
+            for i, user in enumerate(users) for j in range(per_customer)
+        ),
+        batch_size=1000,
+    )
+    seed_history(catalog, history, days_back=120, days_ahead=60)
+    day = timezone.localdate() + timedelta(days=3)
+    seed_appointments(catalog[:5], day, days=1, per_day=30)
+    return {"styles": catalog, "customer": users[0], "staff": staff, "day": day, "n": 0}
+
+
+def _json(method, path, data, **headers):
+    return method, path, {"data": json.dumps(data), "content_type": "application/json", **headers}
+
+
+def _fresh_booking(ctx):
+    """An upcoming booking owned by the customer, unique per call."""
+    ctx["n"] += 1
+    customer = ctx["customer"]
+    return Appointment.objects.create(
+        user=customer, style=ctx["styles"][-1],
+        datetime=timezone.now() + timedelta(days=200 + ctx["n"]),
+        contact_name="Bench", contact_email=customer.email,
+    )
+
+
+def _register(ctx):
+    ctx["n"] += 1
+    return _json("post", "/api/auth/register/",
+                 {"email": f"new-{ctx['n']}@example.com", "password": BENCH_PASSWORD})
+
+
+def _guest_booking(ctx):
+    ctx["n"] += 1
+    when = timezone.now() + timedelta(days=400 + ctx["n"])
+    return _json("post", "/api/appointments/", {
+        "style": ctx["styles"][0].id, "datetime": when.isoformat(),
+        "contact_name": "Walk-in", "contact_email": f"guest-{ctx['n']}@example.com",
+    })
+
+
+def _styles_uncached(ctx):
+    bump_version(STYLE_CACHE_NAMESPACE)
+    return "get", "/api/styles/", {}
+
+
+def _cancel(ctx):
+    return "post", f"/api/appointments/{_fresh_booking(ctx).id}/cancel/", ctx["as_customer"]
+
+
+def _checkout(ctx):
+    return "post", f"/api/checkout/create-session/{_fresh_booking(ctx).id}/", ctx["as_customer"]
+
+
+def _webhook(ctx):
+    booking = _fresh_booking(ctx)
+    payload = json.dumps({
+        "id": f"evt_bench_{booking.id}", "object": "event", "type": "checkout.session.completed",
+        "data": {"object": {"amount_total": 5000, "metadata": {"appointment_id": str(booking.id)}}},
+    })
+    return "post", "/api/webhooks/stripe/", {
+        "data": payload, "content_type": "application/json",
+        "HTTP_STRIPE_SIGNATURE": stripe_signature(payload, WEBHOOK_SECRET),
+    }
+
+
+# (name, max queries, max p50 ms, request builder). Budgets are today's
+# counts: raise one only with a reason, never to paper over an N+1.
+# EndpointBudgetTests asserts the query counts; latency depends on the
+# machine, so `bench endpoints` only reports p50 against its target.
+# Authenticated requests cost no query for the user (api/authentication.py).
+ENDPOINT_BUDGETS = [
+    ("register", 6, 2000, _register),  # password hashing dominates
+    ("login (email)", 3, 2000, lambda ctx: _json(  # token version is read fresh, not cached
+        "post", "/api/auth/login/", {"username": ctx["customer"].email, "password": BENCH_PASSWORD})),
+    ("styles list (uncached)", 1, 150, _styles_uncached),
+    ("styles list (cached)", 0, 50, lambda ctx: ("get", "/api/styles/", {})),
+    ("style detail", 1, 50, lambda ctx: ("get", f"/api/styles/{ctx['styles'][0].id}/", {})),
+    ("appointments list (customer)", 1, 150, lambda ctx: ("get", "/api/appointments/", ctx["as_customer"])),
+    ("appointments page (staff)", 1, 150,
+     lambda ctx: ("get", "/api/appointments/?page_size=50", ctx["as_staff"])),
+    ("appointment create (guest)", 13, 150, _guest_booking),
+    ("taken", 1, 50, lambda ctx: ("get", f"/api/appointments/taken/?date={ctx['day'].isoformat()}", {})),
+    ("taken-range (31 days)", 1, 100, lambda ctx: (
+        "get", f"/api/appointments/taken-range/?start={ctx['day'].isoformat()}"
+               f"&end={(ctx['day'] + timedelta(days=30)).isoformat()}", {})),
+    ("upcoming", 1, 100, lambda ctx: ("get", "/api/appointments/upcoming/", ctx["as_customer"])),
+    ("cancel", 6, 100, _cancel),  # saved and re-indexed in one locked transaction
+    ("me/appointments", 1, 150, lambda ctx: ("get", "/api/me/appointments/", ctx["as_customer"])),
+    ("me/profile", 1, 50, lambda ctx: ("get", "/api/me/profile/", ctx["as_customer"])),
+    ("checkout", 10, 100, _checkout),
+    ("webhook", 12, 100, _webhook),
+    ("stats summary (staff)", 2, 200, lambda ctx: ("get", "/api/stats/summary/", ctx["as_staff"])),
+]
+
+
+def call_endpoint(client, ctx, build):
+    """Issue one request; returns (response, elapsed ms, query count)."""
+    method, path, kwargs = build(ctx)
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = getattr(client, method)(path, **kwargs)
+        if response.streaming:
+            b"".join(response.streaming_content)  # streamed bodies query lazily
+        elapsed = (time.perf_counter() - started) * 1000
+    return response, elapsed, len(queries)
+
+
+def endpoint_context(ctx):
+    ctx["as_customer"] = auth_header(ctx["customer"])
+    ctx["as_staff"] = auth_header(ctx["staff"])
+    return ctx
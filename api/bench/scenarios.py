@@ -0,0 +1,425 @@
+# api/bench/scenarios.py
+"""
+Benchmark scenarios for `python manage.py bench <scenario>`.
+
+Each scenario seeds its own data; the command runs it inside a transaction
+that is rolled back afterwards, so it is safe to point at a dev database.
+"""
+import random
+import tracemalloc
+from io import StringIO
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.mail import send_mail
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, modify_settings
+from django.test import Client
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from ..accounts import username_for_email, users_with_email
+from ..cache import bump_version
+from ..models import Style, Appointment, Profile, OutboxMessage, STYLE_CACHE_NAMESPACE
+from ..notifications import NotificationDispatcher, queue_reminders
+from ..reporting import percentile, summarize, timed
+from ..serializers import AppointmentSerializer, AppointmentReadSerializer
+from ..stats import booking_stats
+from ..transfer import FORMATS, export_rows, import_rows, read_rows, render
+
+from .fixtures import (
+    BENCH_PASSWORD,
+    ENDPOINT_BUDGETS,
+    SMTPStub,
+    auth_header,
+    call_endpoint,
+    endpoint_context,
+    endpoint_environment,
+    seed_appointments,
+    seed_history,
+    seed_realistic,
+    seed_styles,
+)
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+
+@scenario("taken_month")
+def bench_taken_month(out, repeat=20, size=40):
+    """Month calendar grid: 30 per-day /taken/ calls vs one /taken-range/ call."""
+    styles = seed_styles()
+    start = date.today() + timedelta(days=1)
+    end = start + timedelta(days=29)
+    seed_appointments(styles, start, days=30, per_day=size)
+    client = Client()
+    style_id = styles[0].id
+
+    def per_day_loop():
+        for offset in range(30):
+            day = start + timedelta(days=offset)
+            client.get("/api/appointments/taken/", {"date": day.isoformat(), "style_id": style_id})
+
+    def one_range():
+        resp = client.get(
+            "/api/appointments/taken-range/",
+            {"start": start.isoformat(), "end": end.isoformat(), "style_id": style_id},
+        )
+        b"".join(resp.streaming_content)
+
+    loop = [timed(per_day_loop)[1] for _ in range(repeat)]
+    ranged = [timed(one_range)[1] for _ in range(repeat)]
+    return [
+        summarize("per-day loop", loop, requests=30),
+        summarize("taken-range", ranged, requests=1),
+    ]
+
+
+@scenario("notifications")
+def bench_notifications(out, repeat=3, size=1000):
+    """Deliver `size` emails to a local SMTP stub: send_mail per message vs NotificationDispatcher."""
+    messages = [
+        OutboxMessage(channel="email", to=f"guest{i}@example.com", subject="Reminder", body="See you soon!")
+        for i in range(size)
+    ]
+    rows = []
+    with SMTPStub() as smtp:
+        def per_message():
+            for m in messages:
+                send_mail(m.subject, m.body, "noreply@hairsalon.dev", [m.to], connection=smtp.connection())
+
+        def dispatcher():
+            with NotificationDispatcher(smtp.connection()) as d:
+                d.send_emails(messages)
+
+        for label, fn in (("send_mail per message", per_message), ("dispatcher", dispatcher)):
+            smtp.connections = smtp.messages = 0
+            samples = [timed(fn)[1] for _ in range(repeat)]
+            rows.append(summarize(
+                label, samples,
+                msgs_per_s=size * 1000 / (sum(samples) / len(samples)),
+                connections=smtp.connections // repeat,
+                delivered=smtp.messages // repeat,
+            ))
+    return rows
+
+
+@scenario("reminders")
+def bench_reminders(out, repeat=3, size=20000):
+    """queue_reminders(24h) over `size` appointments spread across the next 7 days."""
+    styles = seed_styles()
+    rng = random.Random(7)
+    now = timezone.now()
+    Appointment.objects.bulk_create(
+        (
+            Appointment(
+                style=rng.choice(styles),
+                datetime=now + timedelta(minutes=rng.randrange(7 * 24 * 60)),
+                status=rng.choice(["pending", "approved", "paid", "cancelled"]),
+                contact_name="Bench Guest",
+                contact_email=f"bench{i}@example.com",
+            )
+            for i in range(size)
+        ),
+        batch_size=1000,
+    )
+
+    samples, peaks, reminded = [], [], 0
+    for _ in range(repeat):
+        Appointment.objects.update(reminded_at=None)
+        OutboxMessage.objects.all().delete()
+        tracemalloc.start()
+        reminded, elapsed = timed(lambda: queue_reminders(within_hours=24, chunk_size=1000))
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024 / 1024)
+        tracemalloc.stop()
+        samples.append(elapsed)
+
+    return [summarize(
+        "queue_reminders", samples,
+        appointments=size,
+        reminded=reminded,
+        rows_per_s=reminded * 1000 / (sum(samples) / len(samples)),
+        peak_mb=max(peaks),
+    )]
+
+
+@scenario("styles_cache")
+def bench_styles_cache(out, repeat=200, size=200):
+    """GET /api/styles/ with `size` styles: uncached vs cached vs conditional 304."""
+    seed_styles(size)
+    client = Client()
+
+    def uncached():
+        bump_version(STYLE_CACHE_NAMESPACE)
+        client.get("/api/styles/")
+
+    state = {}
+
+    def conditional():
+        client.get("/api/styles/", HTTP_IF_NONE_MATCH=state["etag"])
+
+    cases = [
+        ("uncached", uncached),
+        ("cached", lambda: client.get("/api/styles/")),
+        ("If-None-Match 304", conditional),
+    ]
+    rows = []
+    for label, fn in cases:
+        state["etag"] = client.get("/api/styles/")["ETag"]  # warm up
+        samples = [timed(fn)[1] for _ in range(repeat)]
+        rows.append(summarize(label, samples, req_per_s=1000 / (sum(samples) / len(samples))))
+    return rows
+
+
+@scenario("appointment_list")
+def bench_appointment_list(out, repeat=3, size=100000):
+    """Staff /api/appointments/ over `size` rows: full list vs first and deep cursor pages."""
+    styles = seed_styles()
+    staff = User.objects.create_user("bench-staff", "staff@example.com", "x", is_staff=True)
+    seed_history(styles, size, days_back=90, days_ahead=90)
+    client = Client(**auth_header(staff))
+
+    deep_url = "/api/appointments/?page_size=50"
+    for _ in range(50):
+        following = client.get(deep_url).json()["next"]
+        if not following:
+            break
+        deep_url = following
+
+    cases = [
+        ("unpaginated", "/api/appointments/"),
+        ("page 1 (50 rows)", "/api/appointments/?page_size=50"),
+        ("page 51 (50 rows)", deep_url),
+    ]
+    rows = []
+    for label, url in cases:
+        samples = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                resp, elapsed = timed(lambda: client.get(url))
+            samples.append(elapsed)
+        rows.append(summarize(label, samples, queries=len(ctx), kb=len(resp.content) // 1024))
+    return rows
+
+
+@scenario("appointment_serialize")
+def bench_appointment_serialize(out, repeat=5, size=5000):
+    """Fetch + serialize + render `size` appointments: AppointmentSerializer vs AppointmentReadSerializer."""
+    styles = seed_styles()
+    seed_appointments(styles, date.today(), days=max(1, size // 100), per_day=min(size, 100))
+    qs = Appointment.objects.select_related("style", "user")
+    count = qs.count()
+    renderer = JSONRenderer()
+
+    def full():
+        return renderer.render(AppointmentSerializer(qs.all(), many=True).data)
+
+    def lean():
+        rows = AppointmentReadSerializer.values_queryset(qs.all())
+        return renderer.render(AppointmentReadSerializer(rows, many=True).data)
+
+    assert full() == lean()
+    rows = []
+    for label, fn in (("AppointmentSerializer", full), ("AppointmentReadSerializer", lean)):
+        samples = [timed(fn)[1] for _ in range(repeat)]
+        rows.append(summarize(label, samples, rows=count, rows_per_s=count * 1000 / (sum(samples) / len(samples))))
+    return rows
+
+
+@scenario("stats")
+def bench_stats(out, repeat=3, size=1000000):
+    """Staff stats over `size` appointments: SQL aggregation vs hydrating a month in Python."""
+    styles = seed_styles(12)
+    for i, style in enumerate(styles):
+        style.category = ["braids", "cut", "color", "styling"][i % 4]
+    Style.objects.bulk_update(styles, ["category"])
+    seed_history(styles, size)
+    today = timezone.localdate()
+    month_ago = today - timedelta(days=30)
+
+    def python_month():
+        totals = {}
+        qs = Appointment.objects.select_related("style").filter(
+            datetime__date__gte=month_ago, datetime__date__lte=today,
+        )
+        for appt in qs:
+            key = (timezone.localdate(appt.datetime), appt.style.category)
+            bucket = totals.setdefault(key, [0, 0])
+            bucket[0] += 1
+            if appt.status != "cancelled":
+                bucket[1] += appt.style.price_min
+        return totals
+
+    cases = [
+        ("python loop, 30 days by category", python_month),
+        ("sql, 30 days by category", lambda: booking_stats("day", "category", month_ago, today)),
+        ("sql, all weeks by style", lambda: booking_stats("week", "style")),
+        ("sql, monthly by status", lambda: booking_stats("month", "status")),
+        ("sql, summary by status", lambda: booking_stats(by="status")),
+    ]
+    rows = []
+    for label, fn in cases:
+        samples = [timed(fn)[1] for _ in range(repeat)]
+        rows.append(summarize(label, samples, appointments=size))
+    return rows
+
+
+@scenario("metrics_overhead")
+def bench_metrics_overhead(out, repeat=500, size=50):
+    """Cost of MetricsMiddleware: the same cheap requests with and without it."""
+    styles = seed_styles(size)
+    day = timezone.localdate() + timedelta(days=7)
+    seed_appointments(styles[:3], day, days=1, per_day=10)
+    urls = [
+        ("taken (index read)", f"/api/appointments/taken/?date={day.isoformat()}"),
+        ("styles (cached)", "/api/styles/"),
+    ]
+
+    with modify_settings(MIDDLEWARE={"remove": "config.metrics.MetricsMiddleware"}):
+        bare = Client()
+        bare.get(urls[0][1])  # middleware chain is built on first request
+    instrumented = Client()
+
+    rows = []
+    for label, url in urls:
+        samples = {"off": [], "on": []}
+        for _ in range(repeat):  # interleaved so drift hits both equally
+            samples["off"].append(timed(lambda: bare.get(url))[1])
+            samples["on"].append(timed(lambda: instrumented.get(url))[1])
+        base = percentile(samples["off"], 50)
+        for mode in ("off", "on"):
+            p50 = percentile(samples[mode], 50)
+            rows.append(summarize(
+                f"{label}, metrics {mode}", samples[mode],
+                overhead_pct=(p50 - base) / base * 100 if base else 0.0,
+            ))
+    return rows
+
+
+@scenario("endpoints")
+def bench_endpoints(out, repeat=20, size=3000):
+    """Every API endpoint against realistic data: latency, queries and budgets."""
+    ctx = endpoint_context(seed_realistic(history=size))
+    client = Client()
+    rows = []
+    with endpoint_environment():
+        for name, max_queries, max_ms, build in ENDPOINT_BUDGETS:
+            samples, counts, statuses = [], [], set()
+            for _ in range(repeat):
+                response, elapsed, queries = call_endpoint(client, ctx, build)
+                samples.append(elapsed)
+                counts.append(queries)
+                statuses.add(response.status_code)
+            rows.append(summarize(
+                name, samples,
+                queries=max(counts), budget=max_queries, max_ms=max_ms,
+                status=",".join(map(str, sorted(statuses))),
+            ))
+    return rows
+
+
+@scenario("login_lookup")
+def bench_login_lookup(out, repeat=50, size=500000):
+    """Email -> username over `size` users: iexact scan vs LOWER(email) index vs cache, and a full login."""
+    password = make_password(BENCH_PASSWORD)
+    for start in range(0, size, 10000):
+        User.objects.bulk_create(
+            User(username=f"login-{i}", email=f"Login.User{i}@Example.com", password=password)
+            for i in range(start, min(start + 10000, size))
+        )
+    emails = [f"login.user{i}@example.com" for i in random.Random(5).sample(range(size), repeat)]
+    client = Client()
+
+    cases = [
+        ("email__iexact (before)", lambda email: User.objects.filter(email__iexact=email)
+            .values_list("username", flat=True).first()),
+        ("LOWER(email) index", lambda email: users_with_email(email)
+            .values_list("username", flat=True).first()),
+        ("cached", username_for_email),
+        ("POST /api/auth/login/", lambda email: client.post(
+            "/api/auth/login/", {"username": email, "password": BENCH_PASSWORD})),
+    ]
+    for email in emails:
+        username_for_email(email)  # warm the cache for the "cached" case
+
+    rows = []
+    for label, fn in cases:
+        samples = []
+        for email in emails:
+            with CaptureQueriesContext(connection) as ctx:
+                samples.append(timed(lambda: fn(email))[1])
+        rows.append(summarize(label, samples, users=size, queries=len(ctx)))
+    return rows
+
+
+@scenario("transfer")
+def bench_transfer(out, repeat=3, size=100000):
+    """Export and import throughput for `size` appointments and size/10 users, CSV and NDJSON."""
+    styles = seed_styles(40)
+    customers = max(1, size // 10)
+    volumes = (("users", customers), ("appointments", size))
+
+    sid = transaction.savepoint()
+    users = User.objects.bulk_create(
+        (User(username=f"transfer-{i}", email=f"transfer{i}@example.com", first_name="Transfer")
+         for i in range(customers)),
+        batch_size=5000,
+    )
+    Profile.objects.bulk_create((Profile(user=user, phone_number="+15550000000") for user in users),
+                                batch_size=5000)
+    rng = random.Random(17)
+    now = timezone.now()
+    Appointment.objects.bulk_create(
+        (
+            Appointment(
+                style=rng.choice(styles),
+                user=users[i % customers] if i % 3 else None,  # a third are guests
+                datetime=now + timedelta(minutes=5 * i),
+                status=rng.choice(["pending", "approved", "paid", "completed", "cancelled"]),
+                contact_name="Transfer Guest",
+                contact_email=f"transfer{i % customers}@example.com",
+            )
+            for i in range(size)
+        ),
+        batch_size=5000,
+    )
+
+    rows, dumps = [], {}
+    for kind, count in volumes:
+        for fmt in FORMATS:
+            dumps[kind, fmt] = "".join(render(fmt, *export_rows(kind)))
+            samples = [timed(lambda: sum(1 for _ in render(fmt, *export_rows(kind))))[1] for _ in range(repeat)]
+            tracemalloc.start()
+            for _ in render(fmt, *export_rows(kind)):
+                pass
+            peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+            rows.append(summarize(
+                f"export {kind} {fmt}", samples, rows=count,
+                rows_per_s=count * 1000 / (sum(samples) / len(samples)),
+                file_mb=len(dumps[kind, fmt]) / 1024 / 1024, peak_mb=peak,
+            ))
+    transaction.savepoint_rollback(sid)  # import into empty tables
+
+    for kind, count in volumes:
+        for fmt in FORMATS:
+            samples = []
+            for _ in range(repeat):
+                sid = transaction.savepoint()
+                result, elapsed = timed(lambda: import_rows(kind, read_rows(fmt, StringIO(dumps[kind, fmt]))))
+                samples.append(elapsed)
+                transaction.savepoint_rollback(sid)
+            rows.append(summarize(
+                f"import {kind} {fmt}", samples, rows=count, imported=result["imported"],
+                rows_per_s=count * 1000 / (sum(samples) / len(samples)),
+            ))
+        if kind == "users":  # appointments resolve user_email against these
+            import_rows(kind, read_rows("csv", StringIO(dumps[kind, "csv"])))
+    return rows
@@ -0,0 +1,105 @@
+# api/cache.py
+"""
+Versioned response cache for read-mostly endpoints (the style catalog).
+
+Every cache key embeds a namespace version. Invalidation just bumps the
+version, so stale entries are never read again and simply expire; this
+works the same on locmem, file or Redis backends. Versions start from a
+timestamp, so a restart or cache clear never reuses an old one.
+
+Each entry stores its ETag, an md5 of the rendered body, so a client's
+ETag only matches while the data it describes is unchanged. Keys include
+the request's scheme and host because bodies carry absolute pagination
+URLs.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+def _version_key(namespace):
+    return f"{namespace}:version"
+
+
+def current_version(namespace):
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        version = time.time_ns()
+        cache.add(_version_key(namespace), version, timeout=None)
+    return version
+
+
+async def acurrent_version(namespace):
+    version = await cache.aget(_version_key(namespace))
+    if version is None:
+        version = time.time_ns()
+        await cache.aadd(_version_key(namespace), version, timeout=None)
+    return version
+
+
+def response_key(namespace, version, fmt, request):
+    """Cache key for one rendering of a GET, shared by sync and async views."""
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.GET.items()))
+    origin = f"{request.scheme}://{request.get_host()}"
+    return f"{namespace}:v{version}:{fmt}:{origin}{request.path}?{query}"
+
+
+def response_entry(fmt, data):
+    """(data, ETag) to cache; the ETag hashes the JSON body, so equal data gives equal ETags."""
+    body = JSONRenderer().render(data)
+    return data, '"%s"' % hashlib.md5(f"{fmt}:".encode() + body).hexdigest()
+
+
+def etag_matches(request, etag):
+    """
+    Whether If-None-Match lists `etag` (or is `*`). Tags are compared
+    exactly after dropping any W/ prefix: the weak comparison RFC 9110
+    requires for If-None-Match.
+    """
+    tags = parse_etags(request.headers.get("If-None-Match", ""))
+    return "*" in tags or etag in (tag.removeprefix("W/") for tag in tags)
+
+
+def bump_version(namespace):
+    """Invalidate everything cached under `namespace`."""
+    try:
+        cache.incr(_version_key(namespace))
+    except ValueError:
+        cache.set(_version_key(namespace), time.time_ns(), timeout=None)
+
+
+class CachedReadMixin:
+    """
+    ViewSet mixin caching list/retrieve response data per
+    (version, path, query, format), with ETag / If-None-Match -> 304.
+    Set `cache_namespace`; call bump_version(namespace) on writes.
+    """
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_read(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_read(request, super().retrieve, *args, **kwargs)
+
+    def _cached_read(self, request, handler, *args, **kwargs):
+        fmt = getattr(request.accepted_renderer, "format", "")
+        key = response_key(self.cache_namespace, current_version(self.cache_namespace), fmt, request)
+
+        entry = cache.get(key)
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = response_entry(fmt, response.data)
+            cache.set(key, entry, timeout=getattr(settings, "RESPONSE_CACHE_TTL", 300))
+        data, etag = entry
+
+        if etag_matches(request, etag):
+            return Response(status=304, headers={"ETag": etag})
+        return Response(data, headers={"ETag": etag})
@@ -0,0 +1,21 @@
+# api/filters.py
+import django_filters
+
+from .models import Style
+
+
+class StyleFilter(django_filters.FilterSet):
+    """
+    Catalog filters:
+      ?category=braids  ?min_price=40&max_price=100  (on the starting price)
+      ?max_duration=60  ?min_rating=4.5
+    """
+    category = django_filters.CharFilter(field_name="category")
+    min_price = django_filters.NumberFilter(field_name="price_min", lookup_expr="gte")
+    max_price = django_filters.NumberFilter(field_name="price_min", lookup_expr="lte")
+    max_duration = django_filters.NumberFilter(field_name="duration_mins", lookup_expr="lte")
+    min_rating = django_filters.NumberFilter(field_name="rating_avg", lookup_expr="gte")
+
+    class Meta:
+        model = Style
+        fields = ("category", "min_price", "max_price", "max_duration", "min_rating")
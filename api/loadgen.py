@@ -0,0 +1,227 @@
+# api/loadgen.py
+"""
+HTTP load generator behind `python manage.py loadtest`.
+
+Virtual users on threads replay a weighted mix of calendar reads
+(`taken`), catalog reads, their own upcoming list, logins, bookings (a
+configurable share of them aimed at a few hot slots, to exercise 409s)
+and cancellations of their own bookings. Everything goes over plain
+HTTP with urllib, so the target can be runserver, the in-process server
+(`--serve`) or a live gunicorn.
+
+It registers its own accounts and books real appointments a year out by
+default: point it at a dev or staging database, not production.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from urllib import error, request
+
+from .reporting import percentile
+
+ACTIONS = ("taken", "styles", "upcoming", "login", "book", "cancel")
+DEFAULT_MIX = {"taken": 50, "styles": 25, "login": 5, "book": 15, "cancel": 5}
+PASSWORD = "pw-loadtest-12345"
+
+
+def parse_mix(text):
+    """"taken=50,book=10" -> {"taken": 50, "book": 10}."""
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in ACTIONS:
+            raise ValueError(f"Unknown action {name!r}; choose from {', '.join(ACTIONS)}.")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("The mix needs at least one action with a positive weight.")
+    return mix
+
+
+class Stats:
+    """Per-action latencies and status codes, shared by all workers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}  # action -> [ms]
+        self.statuses = {}  # action -> {status: count}
+
+    def record(self, action, status, ms):
+        with self._lock:
+            self.latencies.setdefault(action, []).append(ms)
+            counts = self.statuses.setdefault(action, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def rows(self, elapsed):
+        """Table rows per action plus a total; status 0 means no response."""
+        rows = []
+        names = [a for a in ACTIONS if a in self.latencies]
+        totals = {}
+        for name in names:
+            for status, count in self.statuses[name].items():
+                totals[status] = totals.get(status, 0) + count
+        everything = [ms for name in names for ms in self.latencies[name]]
+
+        for name, samples, statuses in [
+            *((a, self.latencies[a], self.statuses[a]) for a in names), ("total", everything, totals),
+        ]:
+            n = len(samples)
+            errors = sum(c for s, c in statuses.items() if s == 0 or s >= 500 or (400 <= s < 500 and s != 409))
+            rows.append({
+                "action": name,
+                "n": n,
+                "req_per_s": n / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(samples, 50),
+                "p95_ms": percentile(samples, 95),
+                "p99_ms": percentile(samples, 99),
+                "error_pct": 100.0 * errors / n if n else 0.0,
+                "conflict_pct": 100.0 * statuses.get(409, 0) / n if n else 0.0,
+            })
+        return rows
+
+
+class LoadRunner:
+    def __init__(self, base_url, mix=None, concurrency=8, duration=30.0, max_requests=None,
+                 collision_rate=0.1, offset_days=365, horizon_days=30, timeout=10.0, seed=None):
+        self.base_url = base_url.rstrip("/")
+        self.mix = mix or DEFAULT_MIX
+        self.concurrency = concurrency
+        self.duration = duration
+        self.max_requests = max_requests
+        self.collision_rate = collision_rate
+        self.first_day = date.today() + timedelta(days=offset_days)
+        self.horizon_days = horizon_days
+        self.timeout = timeout
+        self.seed = seed
+        self.run_id = uuid.uuid4().hex[:8]
+        self.stats = Stats()
+        self._issued = 0
+        self._issued_lock = threading.Lock()
+
+    # ---------- HTTP ----------
+
+    def _call(self, method, path, body=None, token=None):
+        """(status, parsed JSON or None); status 0 on connection errors/timeouts."""
+        headers = {"Accept": "application/json"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        req = request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with request.urlopen(req, timeout=self.timeout) as resp:
+                status, raw = resp.status, resp.read()
+        except error.HTTPError as exc:
+            status, raw = exc.code, exc.read()
+        except (error.URLError, OSError):
+            return 0, None
+        try:
+            return status, json.loads(raw) if raw else None
+        except ValueError:
+            return status, None
+
+    def _timed(self, action, method, path, body=None, token=None):
+        started = time.perf_counter()
+        status, payload = self._call(method, path, body, token)
+        self.stats.record(action, status, (time.perf_counter() - started) * 1000)
+        return status, payload
+
+    # ---------- setup ----------
+
+    def _setup(self):
+        status, payload = self._call("GET", "/api/styles/")
+        if status != 200 or not payload:
+            raise RuntimeError(f"Could not list styles from {self.base_url} (status {status}); seed some first.")
+        styles = payload["results"] if isinstance(payload, dict) else payload
+        self.styles = [s["id"] for s in styles]
+
+        self.users = []
+        for i in range(self.concurrency):
+            email = f"loadtest-{self.run_id}-{i}@example.com"
+            self._call("POST", "/api/auth/register/", {"email": email, "password": PASSWORD})
+            status, tokens = self._call("POST", "/api/auth/login/", {"username": email, "password": PASSWORD})
+            if status != 200:
+                raise RuntimeError(f"Could not log in load-test user {email} (status {status}).")
+            self.users.append({"email": email, "token": tokens["access"], "bookings": []})
+
+    # ---------- actions ----------
+
+    def _day(self, rng):
+        return self.first_day + timedelta(days=rng.randrange(self.horizon_days))
+
+    def taken(self, user, rng):
+        day = self._day(rng).isoformat()
+        self._timed("taken", "GET", f"/api/appointments/taken/?date={day}&style_id={rng.choice(self.styles)}")
+
+    def styles_list(self, user, rng):
+        self._timed("styles", "GET", "/api/styles/")
+
+    def upcoming(self, user, rng):
+        self._timed("upcoming", "GET", "/api/appointments/upcoming/", token=user["token"])
+
+    def login(self, user, rng):
+        status, tokens = self._timed(
+            "login", "POST", "/api/auth/login/", {"username": user["email"], "password": PASSWORD}
+        )
+        if status == 200:
+            user["token"] = tokens["access"]
+
+    def book(self, user, rng):
+        if rng.random() < self.collision_rate:
+            # a handful of hot slots everyone wants
+            style, day, minute = self.styles[0], self.first_day, 10 * 60 + 60 * rng.randrange(3)
+        else:
+            style, day = rng.choice(self.styles), self._day(rng)
+            minute = 9 * 60 + 15 * rng.randrange(36)  # 09:00-17:45 on a 15-minute grid
+        when = f"{day.isoformat()}T{minute // 60:02d}:{minute % 60:02d}:00Z"
+        status, payload = self._timed("book", "POST", "/api/appointments/", {
+            "style": style, "datetime": when, "contact_name": "Load Test",
+        }, token=user["token"])
+        if status == 201:
+            user["bookings"].append(payload["id"])
+
+    def cancel(self, user, rng):
+        if not user["bookings"]:
+            return self.taken(user, rng)
+        appt_id = user["bookings"].pop(rng.randrange(len(user["bookings"])))
+        self._timed("cancel", "POST", f"/api/appointments/{appt_id}/cancel/", {}, token=user["token"])
+
+    # ---------- driver ----------
+
+    def _next_ticket(self):
+        with self._issued_lock:
+            if self.max_requests is not None and self._issued >= self.max_requests:
+                return False
+            self._issued += 1
+            return True
+
+    def _worker(self, index, deadline):
+        rng = random.Random(None if self.seed is None else self.seed + index)
+        user = self.users[index]
+        handlers = {
+            "taken": self.taken, "styles": self.styles_list, "upcoming": self.upcoming, "login": self.login,
+            "book": self.book, "cancel": self.cancel,
+        }
+        names, weights = zip(*self.mix.items())
+        while time.monotonic() < deadline and self._next_ticket():
+            handlers[rng.choices(names, weights)[0]](user, rng)
+
+    def run(self):
+        """Set up accounts, run the mix, and return (stats rows, elapsed seconds)."""
+        self._setup()
+        deadline = time.monotonic() + self.duration
+        threads = [
+            threading.Thread(target=self._worker, args=(i, deadline), daemon=True)
+            for i in range(self.concurrency)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return self.stats.rows(elapsed), elapsed
@@ -0,0 +1,97 @@
+# api/locks.py
+import hashlib
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction, OperationalError
+from django.utils import timezone
+
+
+class SlotBusy(Exception):
+    """Another booking for the same style/day held the lock past the timeout."""
+
+
+# Striped process-local locks for backends without advisory locks (SQLite in
+# dev/tests). Only serializes within one process, which is all SQLite needs.
+# Re-entrant, like Postgres advisory locks: a booking holding its buckets
+# re-takes them when the save signal refreshes the availability index.
+_LOCAL_STRIPES = [threading.RLock() for _ in range(64)]
+
+
+def _lock_key(style_id, day):
+    digest = hashlib.blake2b(f"booking:{style_id}:{day.isoformat()}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _days_touched(style, start):
+    first = timezone.localdate(start)
+    last = timezone.localdate(start + timedelta(minutes=max(style.duration_mins, 1) - 1))
+    days = [first]
+    while days[-1] < last:
+        days.append(days[-1] + timedelta(days=1))
+    return days
+
+
+def booking_lock(style, start, timeout=None):
+    """
+    Open a transaction holding the lock for every (style, day) bucket the
+    booking [start, start + duration) touches. Two overlapping bookings always
+    share a bucket, so they serialize; unrelated slots don't wait on each other.
+
+    Raises SlotBusy if the locks can't be taken within `timeout` seconds.
+    """
+    return booking_locks([(style, start)], timeout)
+
+
+def booking_locks(bookings, timeout=None):
+    """
+    booking_lock() for several (style, start) pairs at once, e.g. a bulk
+    create. Buckets are locked once each, in a global order, so batches
+    can't deadlock against each other or single bookings.
+    """
+    return bucket_locks(
+        ((style.id, day) for style, start in bookings for day in _days_touched(style, start)), timeout,
+    )
+
+
+@contextmanager
+def bucket_locks(buckets, timeout=None, savepoint=True):
+    """
+    Transaction holding the locks for (style_id, day) buckets directly.
+    SlotAvailability rebuilds take these before reading appointments, so
+    a rebuild can't write back a snapshot that misses a booking committed
+    while it ran. `savepoint` is passed to atomic(); callers that never
+    catch errors inside can skip it.
+    """
+    if timeout is None:
+        timeout = getattr(settings, "BOOKING_LOCK_TIMEOUT", 2.0)
+    keys = sorted({_lock_key(style_id, day) for style_id, day in buckets})
+
+    if connection.vendor == "postgresql":
+        with transaction.atomic(savepoint=savepoint):
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT set_config('lock_timeout', %s, true)", [f"{int(timeout * 1000)}ms"]
+                    )
+                    for key in keys:
+                        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [key])
+            except OperationalError as exc:
+                raise SlotBusy() from exc
+            yield
+        return
+
+    stripes = sorted({key % len(_LOCAL_STRIPES) for key in keys})
+    held = []
+    try:
+        for idx in stripes:
+            if not _LOCAL_STRIPES[idx].acquire(timeout=timeout):
+                raise SlotBusy()
+            held.append(_LOCAL_STRIPES[idx])
+        with transaction.atomic(savepoint=savepoint):
+            yield
+    finally:
+        for lock in reversed(held):
+            lock.release()
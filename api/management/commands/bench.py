@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.bench.scenarios import SCENARIOS
+from api.reporting import print_table
+
+
+class Command(BaseCommand):
+    help = "Run a benchmark scenario and print a p50/p95 table (data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=sorted(SCENARIOS))
+        parser.add_argument("--repeat", type=int, help="Samples per case (scenario default if omitted).")
+        parser.add_argument("--size", type=int, help="Scenario-specific data volume.")
+
+    def handle(self, *args, **opts):
+        fn = SCENARIOS[opts["scenario"]]
+        kwargs = {
+            key: opts[key] for key in ("repeat", "size") if opts.get(key) is not None
+        }
+
+        # Test environment: locmem email, "testserver" allowed for the test Client
+        setup_test_environment(debug=False)
+        try:
+            with transaction.atomic():
+                rows = fn(self.stdout, **kwargs)
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(self.style.SUCCESS(f"{opts['scenario']}: {fn.__doc__.strip()}"))
+        print_table(self.stdout, rows)
@@ -0,0 +1,114 @@
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib import error, request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.reporting import print_table
+from api.loadgen import LoadRunner, parse_mix
+
+READ_MIX = "taken=50,styles=30,upcoming=20"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _server_command(name, port, workers, threads):
+    if name == "gunicorn":
+        return [
+            sys.executable, "-m", "gunicorn", "config.wsgi:application",
+            "--bind", f"127.0.0.1:{port}", "--workers", str(workers),
+            "--worker-class", "gthread", "--threads", str(threads), "--log-level", "warning",
+        ]
+    return [
+        sys.executable, "-m", "uvicorn", "config.asgi:application",
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+        "--log-level", "warning", "--no-access-log",
+    ]
+
+
+def _wait_until_up(url, proc, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise CommandError(f"Server exited with status {proc.returncode} before answering {url}.")
+        try:
+            with request.urlopen(url + "/api/styles/", timeout=1):
+                return
+        except (error.URLError, OSError):
+            time.sleep(0.2)
+    raise CommandError(f"Server at {url} did not come up within {timeout:.0f}s.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the read-heavy load mix against gunicorn (WSGI, sync views) and uvicorn "
+        "(ASGI, async read views) at several concurrency levels and compare throughput "
+        "and latency. Registers load-test accounts: use a dev/staging DB."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--servers", default="gunicorn,uvicorn", help="Comma list of gunicorn, uvicorn.")
+        parser.add_argument("--concurrency", default="1,8,32,64", help="Comma list of virtual-user counts.")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run.")
+        parser.add_argument("--mix", default=READ_MIX, help="Load mix (see loadtest --mix).")
+        parser.add_argument("--workers", type=int, default=1, help="Server worker processes.")
+        parser.add_argument("--threads", type=int, default=8, help="Threads per gunicorn worker.")
+        parser.add_argument("--offset-days", type=int, default=365, help="Calendar offset for taken lookups.")
+
+    def handle(self, *args, **opts):
+        servers = [s.strip() for s in opts["servers"].split(",") if s.strip()]
+        for name in servers:
+            if name not in ("gunicorn", "uvicorn"):
+                raise CommandError(f"Unknown server {name!r}; choose gunicorn or uvicorn.")
+            if importlib.util.find_spec(name) is None:
+                raise CommandError(f"{name} is not installed (pip install {name}).")
+        try:
+            mix = parse_mix(opts["mix"])
+            levels = [int(c) for c in opts["concurrency"].split(",")]
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "config.settings", "DJANGO_DEBUG": "false"}
+        rows = []
+        for name in servers:
+            port = _free_port()
+            url = f"http://127.0.0.1:{port}"
+            proc = subprocess.Popen(
+                _server_command(name, port, opts["workers"], opts["threads"]),
+                cwd=settings.BASE_DIR, env=env,
+            )
+            try:
+                _wait_until_up(url, proc)
+                for level in levels:
+                    runner = LoadRunner(
+                        url, mix=mix, concurrency=level, duration=opts["duration"],
+                        offset_days=opts["offset_days"], seed=level,
+                    )
+                    try:
+                        results, _ = runner.run()
+                    except RuntimeError as exc:
+                        raise CommandError(str(exc))
+                    total = results[-1]
+                    rows.append({
+                        "server": name, "concurrency": level,
+                        **{k: v for k, v in total.items() if k not in ("action", "conflict_pct")},
+                    })
+                    self.stdout.write(f"{name} x{level}: {total['req_per_s']:.0f} req/s")
+            finally:
+                proc.terminate()
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+
+        self.stdout.write("")
+        print_table(self.stdout, rows)
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.notifications import NotificationDispatcher, drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued email/SMS notifications from the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--workers", type=int, default=4, help="Delivery threads.")
+        parser.add_argument("--max-attempts", type=int, default=5)
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep polling instead of exiting once the outbox is empty."
+        )
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls in --loop mode.")
+
+    def handle(self, *args, **opts):
+        totals = [0, 0, 0]
+        # One SMS client for the whole run; email connects per batch
+        with NotificationDispatcher() as dispatcher:
+            while True:
+                counts = drain_outbox(
+                    batch_size=opts["batch_size"],
+                    workers=opts["workers"],
+                    max_attempts=opts["max_attempts"],
+                    dispatcher=dispatcher,
+                )
+                totals = [t + c for t, c in zip(totals, counts)]
+                if any(counts):
+                    continue  # more may be due right away
+                if not opts["loop"]:
+                    break
+                time.sleep(opts["interval"])
+
+        sent, retried, failed = totals
+        self.stdout.write(self.style.SUCCESS(
+            f"Outbox drained. Sent: {sent}, Retrying: {retried}, Failed: {failed}."
+        ))
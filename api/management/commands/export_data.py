@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.models import Appointment
+from api.transfer import FORMATS, KINDS, export_rows, render
+
+
+class Command(BaseCommand):
+    help = "Stream styles, users or appointments to CSV/NDJSON with constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=KINDS)
+        parser.add_argument("--output", "-o", default="-", help="File to write (default: stdout).")
+        parser.add_argument("--format", dest="fmt", choices=FORMATS, default="csv")
+        parser.add_argument("--start", help="Appointments: first day (YYYY-MM-DD).")
+        parser.add_argument("--end", help="Appointments: last day (YYYY-MM-DD).")
+        parser.add_argument("--status", choices=[c for c, _ in Appointment.STATUS_CHOICES])
+
+    def handle(self, *args, **opts):
+        bounds = {}
+        for name in ("start", "end"):
+            if opts[name]:
+                bounds[name] = parse_date(opts[name])
+                if bounds[name] is None:
+                    raise CommandError(f"--{name} must be YYYY-MM-DD.")
+
+        columns, rows = export_rows(opts["kind"], status=opts["status"], **bounds)
+        out = self.stdout if opts["output"] == "-" else open(opts["output"], "w", newline="", encoding="utf-8")
+        try:
+            for chunk in render(opts["fmt"], columns, rows):
+                out.write(chunk)
+        finally:
+            if out is not self.stdout:
+                out.close()
@@ -0,0 +1,43 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.transfer import FORMATS, KINDS, format_for, import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Import styles, users or appointments from CSV/NDJSON in chunked bulk inserts. "
+        "Invalid rows are reported and skipped; duplicates of existing records are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=KINDS)
+        parser.add_argument("path", help="File to read ('-' for stdin).")
+        parser.add_argument("--format", dest="fmt", choices=FORMATS, help="Default: from the file extension.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per validated chunk and INSERT.")
+        parser.add_argument("--dry-run", action="store_true", help="Validate only; write nothing.")
+
+    def handle(self, *args, **opts):
+        if opts["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        fmt = format_for(opts["path"], opts["fmt"])
+        fh = sys.stdin if opts["path"] == "-" else open(opts["path"], newline="", encoding="utf-8")
+        try:
+            result = import_rows(
+                opts["kind"], read_rows(fmt, fh), batch_size=opts["batch_size"], dry_run=opts["dry_run"],
+            )
+        except ValueError as exc:  # malformed NDJSON line
+            raise CommandError(str(exc))
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+
+        for line, errors in result["errors"]:
+            self.stderr.write(f"line {line}: {json.dumps(errors)}")
+        verb = "would import" if opts["dry_run"] else "imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{opts['kind']}: {result['rows']} rows, {verb} {result['imported']}, "
+            f"skipped {result['skipped']} existing, {result['invalid']} invalid"
+        ))
@@ -0,0 +1,95 @@
+import json
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+
+from api.reporting import print_table
+from api.loadgen import DEFAULT_MIX, LoadRunner, parse_mix
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a booking traffic mix over HTTP and report throughput, error/409 "
+        "rates and latency percentiles. Creates accounts and bookings: use a dev/staging DB."
+    )
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument("--url", default="http://127.0.0.1:8000", help="Server to load (runserver, gunicorn, ...).")
+        target.add_argument("--serve", action="store_true", help="Start an in-process threaded server instead.")
+        parser.add_argument(
+            "--mix", default=",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()),
+            help="Weighted actions: taken, styles, upcoming, login, book, cancel.",
+        )
+        parser.add_argument("--concurrency", type=int, default=8, help="Virtual users (threads).")
+        parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run.")
+        parser.add_argument("--requests", type=int, help="Stop after this many requests.")
+        parser.add_argument("--collision-rate", type=float, default=0.1, help="Share of bookings aimed at hot slots.")
+        parser.add_argument("--offset-days", type=int, default=365, help="Book this far ahead of today.")
+        parser.add_argument("--horizon-days", type=int, default=30, help="Days of calendar to spread traffic over.")
+        parser.add_argument("--seed", type=int, help="Make each virtual user's choices repeatable.")
+        parser.add_argument("--json", dest="json_path", help="Also write the result rows here.")
+        parser.add_argument("--compare", help="Previous --json output to diff against.")
+
+    def handle(self, *args, **opts):
+        try:
+            mix = parse_mix(opts["mix"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        server = None
+        url = opts["url"]
+        if opts["serve"]:
+            server = ThreadedWSGIServer(("127.0.0.1", 0), _QuietHandler)
+            server.set_app(get_wsgi_application())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = "http://%s:%s" % server.server_address
+
+        runner = LoadRunner(
+            url, mix=mix, concurrency=opts["concurrency"], duration=opts["duration"],
+            max_requests=opts["requests"], collision_rate=opts["collision_rate"],
+            offset_days=opts["offset_days"], horizon_days=opts["horizon_days"], seed=opts["seed"],
+        )
+        try:
+            rows, elapsed = runner.run()
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+        finally:
+            if server:
+                server.shutdown()
+                server.server_close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{url}: {opts['concurrency']} users for {elapsed:.1f}s, mix {opts['mix']}"
+        ))
+        print_table(self.stdout, rows)
+
+        if opts["compare"]:
+            with open(opts["compare"]) as fh:
+                before = {row["action"]: row for row in json.load(fh)["rows"]}
+            self.stdout.write("")
+            print_table(self.stdout, [
+                {
+                    "action": row["action"],
+                    "req_per_s_delta_pct": _delta(before[row["action"]]["req_per_s"], row["req_per_s"]),
+                    "p50_delta_pct": _delta(before[row["action"]]["p50_ms"], row["p50_ms"]),
+                    "p95_delta_pct": _delta(before[row["action"]]["p95_ms"], row["p95_ms"]),
+                }
+                for row in rows if row["action"] in before
+            ])
+
+        if opts["json_path"]:
+            with open(opts["json_path"], "w") as fh:
+                json.dump({"url": url, "mix": mix, "concurrency": opts["concurrency"],
+                           "elapsed": elapsed, "rows": rows}, fh, indent=2)
+
+
+def _delta(before, after):
+    return (after - before) / before * 100 if before else 0.0
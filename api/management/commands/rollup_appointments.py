@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = "Refresh the per-day/per-style booking rollups used by staff reports"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=200, help="(date, style) buckets per rebuild query.")
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep refreshing instead of exiting after one pass."
+        )
+        parser.add_argument("--interval", type=float, default=300.0, help="Seconds between passes in --loop mode.")
+
+    def handle(self, *args, **opts):
+        while True:
+            rebuilt = refresh_rollups(chunk_size=opts["chunk_size"])
+            self.stdout.write(self.style.SUCCESS(f"Rollups refreshed. Buckets rebuilt: {rebuilt}."))
+            if not opts["loop"]:
+                break
+            time.sleep(opts["interval"])
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.seeding import PASSWORD, LoadSeeder
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate styles, users with profiles and appointments at benchmark volumes "
+        "(10k-1M rows) with bulk inserts. Same --seed and --anchor, same data. Dev/bench databases only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--styles", type=int, default=40)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--appointments", type=int, default=10000)
+        parser.add_argument("--seed", type=int, default=1, help="Random seed.")
+        parser.add_argument("--anchor", help="'Today' for the date spread (YYYY-MM-DD; default: today).")
+        parser.add_argument("--days-back", type=int, default=365, help="History before the anchor, in days.")
+        parser.add_argument("--days-ahead", type=int, default=60, help="Upcoming bookings after it, in days.")
+        parser.add_argument("--guest-share", type=float, default=0.35, help="Share of bookings made by guests.")
+        parser.add_argument("--prefix", default="load", help="Tag for generated usernames, emails and style names.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT.")
+
+    def handle(self, *args, **opts):
+        anchor = None
+        if opts["anchor"]:
+            anchor = parse_date(opts["anchor"])
+            if anchor is None:
+                raise CommandError("--anchor must be YYYY-MM-DD.")
+        if min(opts["styles"], opts["users"], opts["appointments"]) < 0:
+            raise CommandError("Counts can't be negative.")
+        if opts["appointments"] and not opts["styles"]:
+            raise CommandError("Appointments need at least one style.")
+        if not 0 <= opts["guest_share"] <= 1:
+            raise CommandError("--guest-share must be between 0 and 1.")
+        if opts["days_back"] + opts["days_ahead"] < 1:
+            raise CommandError("--days-back plus --days-ahead must cover at least one day.")
+        if opts["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        seeder = LoadSeeder(
+            styles=opts["styles"], users=opts["users"], appointments=opts["appointments"],
+            seed=opts["seed"], anchor=anchor, days_back=opts["days_back"], days_ahead=opts["days_ahead"],
+            guest_share=opts["guest_share"], prefix=opts["prefix"], batch_size=opts["batch_size"],
+        )
+        if seeder.already_seeded():
+            raise CommandError(
+                f"Data with prefix {opts['prefix']!r} already exists; use another --prefix or a fresh database."
+            )
+
+        started = time.perf_counter()
+        counts = seeder.run(log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {counts['styles']} styles, {counts['users']} users and {counts['appointments']} "
+            f"appointments in {time.perf_counter() - started:.1f}s. Users log in with password {PASSWORD!r}."
+        ))
+        self.stdout.write("Run `python manage.py rollup_appointments` to bring the staff reports up to date.")
@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
-from api.models import Style
+from django.db import transaction
+from api.cache import bump_version
+from api.models import DailyStyleRollup, SlotAvailability, Style, STYLE_CACHE_NAMESPACE
 
 DEFAULT_STYLES = [
     dict(
@@ -73,21 +75,38 @@ class Command(BaseCommand):
             deleted, _ = Style.objects.all().delete()
             self.stdout.write(self.style.WARNING(f"Deleted {deleted} existing Style rows."))
 
-        created, updated = 0, 0
+        # one read and two bulk writes instead of an update_or_create round trip per style;
+        # name is the natural key for idempotency
+        fields = ["category", "price_min", "price_max", "duration_mins", "image_url", "rating_avg"]
+        existing = {}
+        for obj in Style.objects.filter(name__in=[s["name"] for s in DEFAULT_STYLES]).order_by("-pk"):
+            existing[obj.name] = obj  # oldest wins if a name is duplicated
+        to_create, to_update, resized, repriced = [], [], [], []
         for s in DEFAULT_STYLES:
-            obj, was_created = Style.objects.update_or_create(
-                name=s["name"],  # use name as a natural key for idempotency
-                defaults={
-                    "category": s["category"],
-                    "price_min": s["price_min"],
-                    "price_max": s["price_max"],
-                    "duration_mins": s["duration_mins"],
-                    "image_url": s["image_url"],
-                    "rating_avg": s.get("rating_avg"),
-                },
-            )
-            created += int(was_created)
-            updated += int(not was_created)
+            values = {field: s.get(field) for field in fields}
+            obj = existing.get(s["name"])
+            if obj is None:
+                to_create.append(Style(name=s["name"], **values))
+            else:
+                before = obj.pricing()
+                for field, value in values.items():
+                    setattr(obj, field, value)
+                if obj.pricing() != before:
+                    repriced.append(obj.pk)
+                    if obj.duration_mins != before[0]:
+                        resized.append(obj.pk)
+                to_update.append(obj)
+        with transaction.atomic():
+            Style.objects.bulk_create(to_create)
+            Style.objects.bulk_update(to_update, fields)
+            # bulk_update skips the signal that re-sizes booked slots and re-prices reports
+            for style_id in resized:
+                SlotAvailability.objects.refresh_style(style_id)
+            if repriced:
+                DailyStyleRollup.objects.filter(style_id__in=repriced).update(stale=True)
+        created, updated = len(to_create), len(to_update)
+
+        bump_version(STYLE_CACHE_NAMESPACE)  # drop cached catalog responses
 
         self.stdout.write(self.style.SUCCESS(
             f"Seeding complete. Created: {created}, Updated: {updated}."
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.notifications import queue_reminders
+
+
+class Command(BaseCommand):
+    help = "Queue reminders for appointments starting within the next N hours"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=24, help="Look-ahead window.")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Run as a scheduler, re-scanning every --interval seconds."
+        )
+        parser.add_argument("--interval", type=float, default=300.0)
+
+    def handle(self, *args, **opts):
+        while True:
+            started = time.perf_counter()
+            count = queue_reminders(within_hours=opts["hours"], chunk_size=opts["chunk_size"])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"Queued reminders for {count} appointments in {elapsed:.2f}s."
+            ))
+            if not opts["loop"]:
+                break
+            time.sleep(opts["interval"])
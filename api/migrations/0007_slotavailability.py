@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_availability(apps, schema_editor):
+    Appointment = apps.get_model("api", "Appointment")
+    SlotAvailability = apps.get_model("api", "SlotAvailability")
+
+    buckets = {}
+    rows = (
+        Appointment.objects
+        .exclude(status="cancelled")
+        .values_list("datetime", "style_id")
+        .iterator()
+    )
+    for dt, style_id in rows:
+        local = timezone.localtime(dt)
+        buckets.setdefault((local.date(), style_id), set()).add(local.strftime("%H:%M"))
+
+    SlotAvailability.objects.bulk_create(
+        [
+            SlotAvailability(date=day, style_id=style_id, taken=sorted(taken))
+            for (day, style_id), taken in buckets.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_profile_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('taken', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('style', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to='api.style')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'style'), name='unique_availability_date_style')],
+            },
+        ),
+        migrations.RunPython(backfill_availability, migrations.RunPython.noop),
+    ]
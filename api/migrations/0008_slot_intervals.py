@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:21
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_blocked(apps, schema_editor):
+    Appointment = apps.get_model("api", "Appointment")
+    SlotAvailability = apps.get_model("api", "SlotAvailability")
+
+    for row in SlotAvailability.objects.all().iterator():
+        start = timezone.make_aware(datetime.combine(row.date, time.min))
+        intervals = []
+        bookings = (
+            Appointment.objects
+            .filter(style_id=row.style_id, datetime__gte=start, datetime__lt=start + timedelta(days=1))
+            .exclude(status="cancelled")
+            .values_list("datetime", "style__duration_mins")
+        )
+        for dt, duration in bookings:
+            local = timezone.localtime(dt)
+            begin = local.hour * 60 + local.minute
+            intervals.append((begin, begin + max(duration, 1)))
+
+        merged = []
+        for begin, end in sorted(intervals):
+            if merged and begin <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([begin, end])
+        row.blocked = merged
+        row.save(update_fields=["blocked"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_slotavailability'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slotavailability',
+            name='blocked',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['style', 'datetime'], name='appt_style_datetime_idx'),
+        ),
+        migrations.RunPython(backfill_blocked, migrations.RunPython.noop),
+    ]
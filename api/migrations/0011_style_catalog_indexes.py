@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_appointment_reminded_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='style',
+            index=models.Index(fields=['name'], name='style_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='style',
+            index=models.Index(fields=['category', 'name'], name='style_category_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='style',
+            index=models.Index(fields=['category', 'price_min'], name='style_category_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='style',
+            index=models.Index(fields=['price_min'], name='style_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='style',
+            index=models.Index(fields=['rating_avg'], name='style_rating_idx'),
+        ),
+    ]
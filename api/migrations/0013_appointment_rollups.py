@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_appointment_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='DailyStyleRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('paid', 'Paid')], max_length=20)),
+                ('appointment_count', models.PositiveIntegerField(default=0)),
+                ('minutes', models.PositiveIntegerField(default=0)),
+                ('expected_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('stale', models.BooleanField(default=False)),
+                ('style', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='api.style')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='rollup_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'style', 'status'), name='unique_rollup_date_style_status')],
+            },
+        ),
+    ]
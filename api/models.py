@@ -1,10 +1,21 @@
 # api/models.py
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
 from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.db.models import Q
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
+
+from .accounts import forget_email, forget_token_state
+from .cache import bump_version
+from .locks import bucket_locks
+
+STYLE_CACHE_NAMESPACE = "styles"
 
 class Style(models.Model):
     name = models.CharField(max_length=120)
@@ -15,9 +26,46 @@ class Style(models.Model):
     image_url = models.URLField(blank=True)
     rating_avg = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # catalog default ordering / cursor position
+            models.Index(fields=["name"], name="style_name_idx"),
+            # ?category= browsing, ordered by name or filtered/ordered by price
+            models.Index(fields=["category", "name"], name="style_category_name_idx"),
+            models.Index(fields=["category", "price_min"], name="style_category_price_idx"),
+            models.Index(fields=["price_min"], name="style_price_idx"),
+            models.Index(fields=["rating_avg"], name="style_rating_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # the availability index and the report rollups are sized and priced by these
+        if "duration_mins" in field_names and "price_min" in field_names:
+            instance._loaded_pricing = instance.pricing()
+        return instance
+
+    def pricing(self):
+        """(duration_mins, price_min) as stored, whatever type price_min was assigned as."""
+        return self.duration_mins, Decimal(str(self.price_min))
+
+
+class AppointmentQuerySet(models.QuerySet):
+    def overlapping(self, style, start):
+        """
+        Live bookings of `style` whose [datetime, datetime + duration) overlaps
+        one starting at `start`. Same style means same duration, so this is a
+        plain range scan on the (style, datetime) index.
+        """
+        span = timedelta(minutes=max(style.duration_mins, 1))
+        return (
+            self.filter(style=style, datetime__gt=start - span, datetime__lt=start + span)
+            .exclude(status="cancelled")
+        )
+
 
 class Appointment(models.Model):
     STATUS_CHOICES = [
@@ -46,9 +94,22 @@ class Appointment(models.Model):
     contact_phone = models.CharField(max_length=40, blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # rollup_appointments watermark; bulk .update() calls must set it explicitly
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    reminded_at = models.DateTimeField(null=True, blank=True)  # set by send_reminders
+
+    objects = AppointmentQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["style", "datetime"], name="appt_style_datetime_idx"),
+            models.Index(fields=["status", "datetime"], name="appt_status_datetime_idx"),
+            # list endpoints: own history, staff history, own upcoming
+            models.Index(fields=["user", "-created_at"], name="appt_user_created_idx"),
+            models.Index(fields=["-created_at"], name="appt_created_idx"),
+            models.Index(fields=["user", "datetime"], name="appt_user_datetime_idx"),
+        ]
         constraints = [
             # Prevent duplicate for signed-in users (same user+style+datetime)
             models.UniqueConstraint(
@@ -68,6 +129,233 @@ class Appointment(models.Model):
         who = self.user or self.contact_name or "Guest"
         return f"{who} - {self.style} @ {self.datetime}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember where the row sat in the availability index so a
+        # reschedule can also refresh the day/style it moved away from.
+        if "datetime" in field_names and "style_id" in field_names:
+            instance._loaded_slot = instance.slot_key()
+        return instance
+
+    def slot_key(self):
+        """(local date, style_id) bucket this appointment occupies."""
+        return timezone.localdate(self.datetime), self.style_id
+
+
+# ---------- slot intervals (minutes from local midnight) ----------
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _merge_intervals(intervals):
+    merged = []
+    for begin, end in sorted(intervals):
+        if merged and begin <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([begin, end])
+    return merged
+
+
+def _hhmm(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+REFRESH_CHUNK_SIZE = 500
+
+
+class SlotAvailabilityManager(models.Manager):
+    def refresh(self, day, style_id):
+        """
+        Rebuild taken start times and blocked intervals for one (day, style)
+        from Appointment. Drops the row entirely once nothing is booked that day.
+
+        Runs under the bucket's booking lock, so the appointments it reads
+        can't miss a booking that commits before the rebuilt row is written.
+        """
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        with bucket_locks([(style_id, day)], savepoint=False):
+            rows = (
+                Appointment.objects
+                .filter(style_id=style_id, datetime__gte=start, datetime__lt=start + timedelta(days=1))
+                .exclude(status="cancelled")
+                .values_list("datetime", "style__duration_mins")
+            )
+            taken, intervals = set(), []
+            for dt, duration in rows:
+                local = timezone.localtime(dt)
+                begin = local.hour * 60 + local.minute
+                taken.add(_hhmm(begin))
+                intervals.append((begin, begin + max(duration, 1)))
+
+            if taken:
+                self.update_or_create(
+                    date=day, style_id=style_id,
+                    defaults={"taken": sorted(taken), "blocked": _merge_intervals(intervals)},
+                )
+            else:
+                self.filter(date=day, style_id=style_id).delete()
+
+    def refresh_many(self, keys):
+        """
+        refresh() for several (day, style_id) buckets, e.g. after bulk writes,
+        in a fixed number of queries per chunk of buckets: one read of the
+        appointments and one of the index rows spanning each style's days,
+        then bulk writes, all under the chunk's booking locks.
+        """
+        keys = sorted(set(keys))
+        # locked a chunk at a time: a million-row seed shouldn't hold every bucket at once
+        for start in range(0, len(keys), REFRESH_CHUNK_SIZE):
+            chunk = keys[start:start + REFRESH_CHUNK_SIZE]
+            with bucket_locks(((style_id, day) for day, style_id in chunk), savepoint=False):
+                self._rebuild(set(chunk))
+
+    def refresh_style(self, style_id):
+        """
+        refresh_many() for every indexed bucket of `style_id` from yesterday
+        on (yesterday's late bookings block the start of today), e.g. after
+        its duration_mins changed.
+        """
+        since = timezone.localdate() - timedelta(days=1)
+        days = self.filter(style_id=style_id, date__gte=since).values_list("date", flat=True)
+        self.refresh_many((day, style_id) for day in days)
+
+    def _rebuild(self, keys):
+        days_by_style = defaultdict(list)
+        for day, style_id in keys:
+            days_by_style[style_id].append(day)
+        booked, indexed = Q(), Q()
+        for style_id, days in days_by_style.items():
+            first, last = min(days), max(days)
+            start = timezone.make_aware(datetime.combine(first, time.min))
+            end = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min))
+            booked |= Q(style_id=style_id, datetime__gte=start, datetime__lt=end)
+            indexed |= Q(style_id=style_id, date__gte=first, date__lte=last)
+
+        taken, intervals = defaultdict(set), defaultdict(list)
+        rows = (
+            Appointment.objects.filter(booked).exclude(status="cancelled")
+            .values_list("style_id", "datetime", "style__duration_mins")
+            .iterator(chunk_size=5000)
+        )
+        for style_id, dt, duration in rows:
+            local = timezone.localtime(dt)
+            key = (local.date(), style_id)
+            if key in keys:
+                begin = local.hour * 60 + local.minute
+                taken[key].add(_hhmm(begin))
+                intervals[key].append((begin, begin + max(duration, 1)))
+
+        existing = {
+            (row.date, row.style_id): row
+            for row in self.filter(indexed) if (row.date, row.style_id) in keys
+        }
+        created, updated, emptied = [], [], []
+        now = timezone.now()  # bulk_update skips auto_now
+        for key in keys:
+            row = existing.get(key)
+            if key not in taken:
+                if row is not None:
+                    emptied.append(row.pk)
+                continue
+            values = sorted(taken[key]), _merge_intervals(intervals[key])
+            if row is None:
+                created.append(self.model(date=key[0], style_id=key[1], taken=values[0], blocked=values[1]))
+            elif (row.taken, row.blocked) != values:
+                row.taken, row.blocked = values
+                row.updated_at = now
+                updated.append(row)
+
+        self.bulk_create(created, batch_size=1000)
+        self.bulk_update(updated, ["taken", "blocked", "updated_at"], batch_size=1000)
+        if emptied:
+            self.filter(pk__in=emptied).delete()
+
+    def availability_on(self, day, style_id=None):
+        """
+        {"taken": ["HH:MM", ...], "blocked": [{"start", "end"}, ...]} for `day`,
+        for one style or all. Blocked ranges include bookings from the day
+        before that run past midnight.
+        """
+        return self._availability(self._availability_rows(day, style_id), day)
+
+    async def aavailability_on(self, day, style_id=None):
+        """availability_on() for async views."""
+        rows = [row async for row in self._availability_rows(day, style_id)]
+        return self._availability(rows, day)
+
+    def _availability_rows(self, day, style_id):
+        qs = self.filter(date__range=(day - timedelta(days=1), day))
+        if style_id:
+            qs = qs.filter(style_id=style_id)
+        return qs.values_list("date", "taken", "blocked")
+
+    @staticmethod
+    def _availability(rows, day):
+        taken, intervals = set(), []
+        for row_day, row_taken, blocked in rows:
+            offset = (row_day - day).days * MINUTES_PER_DAY
+            if not offset:
+                taken.update(row_taken)
+            for begin, end in blocked:
+                begin, end = max(begin + offset, 0), min(end + offset, MINUTES_PER_DAY)
+                if begin < end:
+                    intervals.append((begin, end))
+
+        return {
+            "taken": sorted(taken),
+            "blocked": [
+                {"start": _hhmm(b), "end": _hhmm(e)} for b, e in _merge_intervals(intervals)
+            ],
+        }
+
+    def taken_between(self, start, end, style_id=None):
+        """
+        Iterator of (day, sorted "HH:MM" list) for every day in [start, end],
+        including free days, fed by a single date-bounded query.
+        """
+        qs = self.filter(date__range=(start, end))
+        if style_id:
+            qs = qs.filter(style_id=style_id)
+        rows = qs.order_by("date").values_list("date", "taken").iterator()
+        return self._by_day(rows, start, end)
+
+    @staticmethod
+    def _by_day(rows, start, end):
+        row = next(rows, None)
+        day = start
+        while day <= end:
+            merged = set()
+            while row is not None and row[0] == day:
+                merged.update(row[1])
+                row = next(rows, None)
+            yield day, sorted(merged)
+            day += timedelta(days=1)
+
+
+class SlotAvailability(models.Model):
+    """
+    Denormalized index of taken slots per (date, style), maintained by the
+    Appointment signal handlers below so the booking calendar can be served
+    without scanning appointments.
+    """
+    date = models.DateField()
+    style = models.ForeignKey(Style, on_delete=models.CASCADE, related_name="availability")
+    taken = models.JSONField(default=list)  # sorted "HH:MM" start times
+    blocked = models.JSONField(default=list)  # merged [start, end) minute pairs
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SlotAvailabilityManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "style"], name="unique_availability_date_style"),
+        ]
+
+    def __str__(self):
+        return f"{self.style_id} @ {self.date}: {len(self.taken)} taken"
+
 
 class Profile(models.Model):
     """
@@ -77,13 +365,198 @@ class Profile(models.Model):
     dob = models.DateField(null=True, blank=True)
     phone_number = models.CharField(max_length=40, blank=True, default="")
     preferred_stylist = models.CharField(max_length=120, blank=True, default="")
+    # Stamped into JWTs as "ver"; bumping it revokes them (api.authentication.revoke_tokens)
+    token_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"Profile({self.user_id})"
 
 
+class OutboxMessage(models.Model):
+    """
+    A pending email/SMS. Request handlers only insert rows here; the
+    `drain_outbox` command delivers them with retry/backoff.
+    """
+    CHANNEL_CHOICES = [
+        ("email", "Email"),
+        ("sms", "SMS"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),  # gave up after max attempts
+    ]
+
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    to = models.CharField(max_length=254)
+    subject = models.CharField(max_length=200, blank=True)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} to {self.to} ({self.status})"
+
+
+class CheckoutSession(models.Model):
+    """
+    The open Stripe Checkout session for an appointment, reused while it is
+    unexpired and was created from the same inputs (see `fingerprint`).
+    """
+    appointment = models.OneToOneField(
+        Appointment, on_delete=models.CASCADE, related_name="checkout_session"
+    )
+    session_id = models.CharField(max_length=255)
+    url = models.TextField()
+    amount_cents = models.PositiveIntegerField()
+    # hash of the Session.create() arguments: price, service, time, customer
+    fingerprint = models.CharField(max_length=64)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.session_id} for {self.appointment_id}"
+
+
+class StripeEvent(models.Model):
+    """
+    Ledger of processed Stripe webhook events. Stripe redelivers on any
+    slow or failed response; a redelivered event id is acknowledged
+    without being processed again.
+    """
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    appointment = models.ForeignKey(
+        Appointment, on_delete=models.SET_NULL, null=True, blank=True, related_name="stripe_events"
+    )
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.event_id} ({self.type})"
+
+
+class DailyStyleRollup(models.Model):
+    """
+    Bookings per (date, style, status) with their minutes and expected
+    revenue, maintained incrementally by `rollup_appointments` so reports
+    over older periods read a few summary rows instead of appointments.
+    """
+    date = models.DateField()
+    style = models.ForeignKey(Style, on_delete=models.CASCADE, related_name="rollups")
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    appointment_count = models.PositiveIntegerField(default=0)
+    minutes = models.PositiveIntegerField(default=0)
+    expected_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # from price_min
+    # set when an appointment moves out of / is deleted from this bucket,
+    # or the style's price or duration changes
+    stale = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "style", "status"], name="unique_rollup_date_style_status"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["date"], name="rollup_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.style_id} @ {self.date} {self.status}: {self.appointment_count}"
+
+
+class RollupWatermark(models.Model):
+    """How far (by Appointment.updated_at) a named rollup has been processed."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.value}"
+
+
 @receiver(post_save, sender=User)
 def _create_profile_on_user_create(sender, instance, created, **kwargs):
     # get_or_create avoids race conditions and duplicate creation
     if created:
-        Profile.objects.get_or_create(user=instance)
\ No newline at end of file
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _forget_cached_account(sender, instance, **kwargs):
+    forget_email(instance.email)
+    forget_token_state(instance.pk)
+
+
+@receiver(pre_save, sender=User)
+def _note_credential_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None:
+        return
+    saving = lambda field: update_fields is None or field in update_fields
+    # set_password() leaves the raw password on _password until save()
+    password_changed = getattr(instance, "_password", None) is not None and saving("password")
+    deactivated = (
+        not instance.is_active and saving("is_active")
+        and User.objects.filter(pk=instance.pk, is_active=True).exists()
+    )
+    instance._revoke_tokens = password_changed or deactivated
+
+
+@receiver(post_save, sender=User)
+def _revoke_tokens_on_credential_change(sender, instance, **kwargs):
+    if getattr(instance, "_revoke_tokens", False):
+        instance._revoke_tokens = False
+        from .authentication import revoke_tokens  # authentication imports this module
+        revoke_tokens(instance.pk)
+
+
+@receiver(post_save, sender=Style)
+@receiver(post_delete, sender=Style)
+def _invalidate_style_cache(sender, **kwargs):
+    bump_version(STYLE_CACHE_NAMESPACE)
+
+
+@receiver(post_save, sender=Style)
+def _follow_pricing_change(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, "_loaded_pricing", None)
+    if not raw and not created and previous is not None and previous != instance.pricing():
+        if previous[0] != instance.duration_mins:
+            SlotAvailability.objects.refresh_style(instance.pk)
+        # rollups froze minutes and revenue at the old values
+        DailyStyleRollup.objects.filter(style_id=instance.pk).update(stale=True)
+    instance._loaded_pricing = instance.pricing()
+
+
+@receiver(post_save, sender=Appointment)
+def _refresh_availability_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    keys = {instance.slot_key()}
+    previous = getattr(instance, "_loaded_slot", None)
+    if previous and previous != instance.slot_key():
+        keys.add(previous)
+        _mark_rollup_stale(*previous)
+    for day, style_id in keys:
+        SlotAvailability.objects.refresh(day, style_id)
+    instance._loaded_slot = instance.slot_key()
+
+
+@receiver(post_delete, sender=Appointment)
+def _refresh_availability_on_delete(sender, instance, **kwargs):
+    day, style_id = getattr(instance, "_loaded_slot", None) or instance.slot_key()
+    SlotAvailability.objects.refresh(day, style_id)
+    _mark_rollup_stale(day, style_id)
+
+
+def _mark_rollup_stale(day, style_id):
+    # updated_at can't flag the bucket an appointment left, so flag its rollup
+    DailyStyleRollup.objects.filter(date=day, style_id=style_id).update(stale=True)
@@ -1,42 +1,243 @@
 # api/notifications.py
-from django.core.mail import send_mail
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 
-def _send_email(to_email: str, subject: str, message: str):
-    if not to_email:
-        return
-    try:
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [to_email],
-            fail_silently=True,
-        )
-    except Exception:
-        pass
-
-def _send_sms(to_number: str, body: str):
-    sid = getattr(settings, "TWILIO_SID", "")
-    token = getattr(settings, "TWILIO_AUTH_TOKEN", "")
-    from_num = getattr(settings, "TWILIO_PHONE_NUMBER", "")
-    if not (sid and token and from_num and to_number):
-        return
-    try:
-        from twilio.rest import Client
-        Client(sid, token).messages.create(
-            to=to_number,
+from .models import Appointment, OutboxMessage
+
+# ---------- Outbox (request path) ----------
+
+def enqueue(channel: str, to: str, body: str, subject: str = ""):
+    """
+    Queue one message for the `drain_outbox` worker. Cheap enough to call
+    from a request: a single INSERT, no network I/O.
+    """
+    if not to:
+        return None
+    return OutboxMessage.objects.create(channel=channel, to=to, subject=subject, body=body)
+
+# ---------- Delivery (worker side) ----------
+
+@lru_cache(maxsize=4)
+def _sms_client(sid: str, token: str):
+    from twilio.rest import Client
+    return Client(sid, token)
+
+class NotificationDispatcher:
+    """
+    Delivers outbox messages over one email connection per drained batch and
+    a cached SMS client, instead of a new SMTP session / Twilio Client per
+    message. The SMTP session is opened when a batch has email to send and
+    closed once it's done, so a long-running worker never reuses a session
+    the server dropped while it sat idle between polls. Use as a context
+    manager around a worker run.
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection or get_connection(fail_silently=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.connection.close()
+
+    def send_emails(self, messages):
+        """
+        Send email messages over a connection opened for this batch. Each
+        goes through its own send_messages() call so a failure is pinned to
+        the right row without re-sending the ones before it. Returns
+        [(message, exc)].
+        """
+        if not messages:
+            return []
+        results = []
+        try:
+            self.connection.open()
+        except Exception as exc:
+            return [(message, exc) for message in messages]
+        try:
+            for message in messages:
+                email = EmailMessage(
+                    message.subject, message.body, settings.DEFAULT_FROM_EMAIL, [message.to],
+                    connection=self.connection,
+                )
+                try:
+                    self.connection.send_messages([email])
+                    results.append((message, None))
+                except Exception as exc:
+                    results.append((message, exc))
+                    self._reconnect()
+        finally:
+            self.connection.close()
+        return results
+
+    def send_sms(self, message):
+        sid = getattr(settings, "TWILIO_SID", "")
+        token = getattr(settings, "TWILIO_AUTH_TOKEN", "")
+        from_num = getattr(settings, "TWILIO_PHONE_NUMBER", "")
+        if not (sid and token and from_num and message.to):
+            return  # SMS not configured: treat as delivered (no-op in dev)
+        _sms_client(sid, token).messages.create(
+            to=message.to,
             from_=from_num,
-            body=body,
+            body=message.body,
         )
-    except Exception:
-        pass
 
-def send_booking_confirmation(appt):
+    def _reconnect(self):
+        # A failed SMTP command can leave the session unusable
+        try:
+            self.connection.close()
+            self.connection.open()
+        except Exception:
+            pass
+
+def _backoff(attempts: int) -> timedelta:
+    base = getattr(settings, "OUTBOX_RETRY_BASE_SECONDS", 30)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+def _claim_due(batch_size: int):
     """
-    Email/SMS right after an appointment is created.
-    Slots are enforced, so we confirm immediately.
+    Lease a batch of due messages by pushing next_attempt_at forward, so
+    several workers can drain the same table without double-sending.
+    """
+    lease = timedelta(seconds=getattr(settings, "OUTBOX_LEASE_SECONDS", 300))
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(status="pending", next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        OutboxMessage.objects.filter(id__in=[m.id for m in batch]).update(next_attempt_at=now + lease)
+    return batch
+
+def drain_outbox(batch_size: int = 100, workers: int = 4, max_attempts: int = 5, dispatcher=None):
+    """
+    Deliver one batch of due messages. Emails go out sequentially over one
+    connection opened for the batch while SMS fan out on a thread pool.
+    Returns (sent, retried, failed) counts.
+    """
+    if dispatcher is None:
+        with NotificationDispatcher() as dispatcher:
+            return drain_outbox(batch_size, workers, max_attempts, dispatcher)
+
+    batch = _claim_due(batch_size)
+    if not batch:
+        return 0, 0, 0
+
+    def attempt_sms(message):
+        try:
+            dispatcher.send_sms(message)
+            return message, None
+        except Exception as exc:
+            return message, exc
+
+    emails = [m for m in batch if m.channel == "email"]
+    texts = [m for m in batch if m.channel == "sms"]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        email_results = pool.submit(dispatcher.send_emails, emails)
+        results = list(pool.map(attempt_sms, texts))
+        results += email_results.result()
+
+    now = timezone.now()
+    sent_ids = [m.id for m, exc in results if exc is None]
+    OutboxMessage.objects.filter(id__in=sent_ids).update(status="sent", sent_at=now)
+
+    retried = failed = 0
+    for message, exc in results:
+        if exc is None:
+            continue
+        attempts = message.attempts + 1
+        gave_up = attempts >= max_attempts
+        OutboxMessage.objects.filter(id=message.id).update(
+            attempts=attempts,
+            status="failed" if gave_up else "pending",
+            next_attempt_at=now + _backoff(attempts),
+            last_error=repr(exc)[:2000],
+        )
+        failed += int(gave_up)
+        retried += int(not gave_up)
+    return len(sent_ids), retried, failed
+
+# ---------- Reminders ----------
+
+REMINDABLE_STATUSES = ("pending", "approved", "paid")
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def queue_reminders(within_hours: int = 24, chunk_size: int = 1000):
     """
+    Queue reminder email/SMS for live appointments starting in the next
+    `within_hours`. Streams the due rows from one (status, datetime) range
+    scan, claims each chunk by stamping reminded_at, and bulk-inserts the
+    outbox rows. Safe to run repeatedly or concurrently: a row is only
+    reminded once. Returns the number of appointments reminded.
+    """
+    now = timezone.now()
+    due = (
+        Appointment.objects
+        .filter(
+            status__in=REMINDABLE_STATUSES,
+            datetime__gte=now,
+            datetime__lt=now + timedelta(hours=within_hours),
+            reminded_at__isnull=True,
+        )
+        .order_by()  # let the index drive the scan instead of Meta.ordering
+        .values_list("id", "datetime", "contact_name", "contact_email", "contact_phone", "style__name")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    reminded = 0
+    for chunk in _chunked(due, chunk_size):
+        rows = {row[0]: row for row in chunk}
+        with transaction.atomic():
+            claimed = list(
+                Appointment.objects
+                .select_for_update(skip_locked=True)
+                .filter(id__in=rows, reminded_at__isnull=True)
+                .order_by()
+                .values_list("id", flat=True)
+            )
+            Appointment.objects.filter(id__in=claimed).update(reminded_at=now)
+
+            outbox = []
+            for appt_id in claimed:
+                _, dt, name, email, phone, service = rows[appt_id]
+                outbox += _outbox_rows(email, phone, *_reminder_text(name, service, dt))
+            OutboxMessage.objects.bulk_create(outbox, batch_size=chunk_size)
+        reminded += len(claimed)
+    return reminded
+
+# ---------- Messages ----------
+
+def _reminder_text(name, service, when):
+    dt = timezone.localtime(when).strftime("%Y-%m-%d %H:%M")
+    subject = "Reminder: your Hair Salon appointment"
+    message = (
+        f"Hi {name or 'there'},\n\n"
+        f"This is a reminder of your appointment for {service or 'your service'} on {dt}.\n"
+        f"If you can no longer make it, please cancel from your account so we can offer the slot to someone else.\n\n"
+        f"Please do not reply to this email. For assistance, contact the salon using the phone or email listed on our website.\n\n"
+        f"— Hair Salon"
+    )
+    return subject, message
+
+def _confirmation_text(appt):
     service = getattr(appt.style, "name", "Service")
     dt = appt.datetime.strftime("%Y-%m-%d %H:%M")
     name = appt.contact_name or "there"
@@ -49,13 +250,64 @@ def send_booking_confirmation(appt):
         f"Please do not reply to this email. For assistance, contact the salon using the phone or email listed on our website.\n\n"
         f"— Hair Salon"
     )
+    return subject, message
 
-    _send_email(appt.contact_email or "", subject, message)
-    _send_sms(appt.contact_phone or "", message)
+def _status_text(name, service, when, status):
+    dt = timezone.localtime(when).strftime("%Y-%m-%d %H:%M")
+    if status == "cancelled":
+        subject = "Your Hair Salon appointment was cancelled"
+        change = (
+            f"Unfortunately your appointment for {service or 'your service'} on {dt} has been cancelled by the salon.\n"
+            f"Please book a new time from your account; we’re sorry for the inconvenience.\n\n"
+        )
+    else:
+        subject = "Your Hair Salon appointment is approved"
+        change = f"Your appointment for {service or 'your service'} on {dt} has been approved.\n\n"
+    message = (
+        f"Hi {name or 'there'},\n\n"
+        f"{change}"
+        f"Please do not reply to this email. For assistance, contact the salon using the phone or email listed on our website.\n\n"
+        f"— Hair Salon"
+    )
+    return subject, message
+
+def _outbox_rows(email, phone, subject, body):
+    rows = []
+    if email:
+        rows.append(OutboxMessage(channel="email", to=email, subject=subject, body=body))
+    if phone:
+        rows.append(OutboxMessage(channel="sms", to=phone, body=body))
+    return rows
+
+def send_booking_confirmation(appt):
+    """
+    Queue email/SMS right after an appointment is created.
+    Slots are enforced, so we confirm immediately.
+    """
+    subject, message = _confirmation_text(appt)
+    enqueue("email", appt.contact_email or "", message, subject=subject)
+    enqueue("sms", appt.contact_phone or "", message)
+
+def queue_booking_confirmations(appts):
+    """Confirmation email/SMS for many new appointments in one INSERT."""
+    outbox = []
+    for appt in appts:
+        outbox += _outbox_rows(appt.contact_email, appt.contact_phone, *_confirmation_text(appt))
+    return OutboxMessage.objects.bulk_create(outbox)
+
+def queue_status_updates(rows, status):
+    """
+    Approval/cancellation notices in one INSERT. `rows` are
+    (contact_name, contact_email, contact_phone, style name, datetime).
+    """
+    outbox = []
+    for name, email, phone, service, when in rows:
+        outbox += _outbox_rows(email, phone, *_status_text(name, service, when, status))
+    return OutboxMessage.objects.bulk_create(outbox)
 
 def send_payment_confirmation(appt, amount: float):
     """
-    Email acknowledgement when Stripe marks the appointment as paid.
+    Queue an email acknowledgement when Stripe marks the appointment as paid.
     """
     service = getattr(appt.style, "name", "Service")
     dt = appt.datetime.strftime("%Y-%m-%d %H:%M")
@@ -71,4 +323,4 @@ def send_payment_confirmation(appt, amount: float):
         f"Please do not reply to this email. For assistance, contact the salon using the phone number or email listed on our website.\n\n"
         f"— Hair Salon"
     )
-    _send_email(appt.contact_email or "", subject, message)
\ No newline at end of file
+    enqueue("email", appt.contact_email or "", message, subject=subject)
@@ -0,0 +1,30 @@
+# api/pagination.py
+from rest_framework.pagination import CursorPagination
+
+
+class OptInCursorPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination that only kicks in when the client asks for
+    it with ?page_size= or ?cursor=, so existing clients keep receiving a
+    plain list. Pages cost the same no matter how deep you go.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not {self.cursor_query_param, self.page_size_query_param} & set(request.query_params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class StyleCursorPagination(OptInCursorPagination):
+    ordering = ("name",)
+
+
+class AppointmentCursorPagination(OptInCursorPagination):
+    ordering = ("-created_at",)
+
+
+class UpcomingCursorPagination(OptInCursorPagination):
+    ordering = ("datetime",)
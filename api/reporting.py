@@ -0,0 +1,48 @@
+# api/reporting.py
+"""
+Latency percentiles and plain-text result tables for the `bench`,
+`bench_servers` and `loadtest` commands.
+"""
+import time
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+def timed(fn):
+    """Run fn() once and return (result, elapsed milliseconds)."""
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def summarize(label, samples_ms, **extra):
+    row = {
+        "case": label,
+        "n": len(samples_ms),
+        "p50_ms": percentile(samples_ms, 50),
+        "p95_ms": percentile(samples_ms, 95),
+    }
+    row.update(extra)
+    return row
+
+
+def print_table(out, rows):
+    if not rows:
+        return
+    headers = list(rows[0].keys())
+    cells = [[_fmt(r.get(h, "")) for h in headers] for r in rows]
+    widths = [max(len(h), *(len(c[i]) for c in cells)) for i, h in enumerate(headers)]
+    out.write("  ".join(h.ljust(w) for h, w in zip(headers, widths)).rstrip())
+    out.write("  ".join("-" * w for w in widths))
+    for c in cells:
+        out.write("  ".join(v.ljust(w) for v, w in zip(c, widths)).rstrip())
+
+
+def _fmt(value):
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
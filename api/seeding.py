@@ -0,0 +1,197 @@
+# api/seeding.py
+"""
+Synthetic data at benchmark volumes, behind `python manage.py seed_load`.
+
+Everything is generated from one random.Random(seed) and written with
+bulk_create in batches, so the same options produce the same rows (dates
+are relative to `anchor`, today by default) and a million appointments
+take minutes, not hours. Shapes roughly follow a real salon:
+
+- styles: a few categories with their own duration and price bands;
+- users: most have a phone on their profile, some a birthday or a
+  preferred stylist; a minority of regulars make most of the bookings;
+- appointments: mostly history, some upcoming; busiest on Fridays and
+  Saturdays, closed Sundays, half-hour starts 09:00-17:30; past bookings
+  are mostly completed, upcoming ones pending or approved; a share are
+  guests with only an email or a phone.
+
+Rows are tagged with `prefix` (usernames, emails, style names) so a load
+set is easy to tell apart from real data. bulk_create skips the model
+signals, so the SlotAvailability index is rebuilt at the end and the
+style catalog cache is invalidated; run `rollup_appointments` afterwards
+for the staff reports.
+"""
+import random
+from datetime import datetime, time, timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_version
+from .models import Style, Appointment, Profile, SlotAvailability, STYLE_CACHE_NAMESPACE
+
+PASSWORD = "pw-seed-load-123"
+
+# category -> (weight, duration choices in minutes, price_min range)
+CATEGORIES = {
+    "braids": (3, (120, 180, 240, 300), (80, 220)),
+    "cut": (5, (30, 40, 45, 60), (20, 70)),
+    "color": (2, (90, 120, 150, 180), (90, 250)),
+    "styling": (3, (45, 60, 75, 90), (40, 100)),
+}
+FIRST_NAMES = ("Amara", "Jordan", "Kemi", "Luis", "Maya", "Noah", "Priya", "Sam", "Tariq", "Zoe")
+LAST_NAMES = ("Adeyemi", "Brown", "Chen", "Diaz", "Evans", "Garcia", "Khan", "Okafor", "Smith", "Williams")
+STYLISTS = ("Ada", "Bea", "Cruz", "Dee", "Eli")
+
+WEEKDAY_WEIGHTS = (8, 10, 10, 12, 18, 24, 0)  # Monday..Sunday
+SLOTS = [(hour, minute) for hour in range(9, 18) for minute in (0, 30)]
+SLOT_WEIGHTS = [1 if hour < 11 else 3 if hour < 16 else 2 for hour, _ in SLOTS]
+PAST_STATUSES = (("completed", 70), ("paid", 12), ("cancelled", 15), ("approved", 3))
+UPCOMING_STATUSES = (("pending", 40), ("approved", 35), ("paid", 15), ("cancelled", 10))
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class LoadSeeder:
+    """seed_load's generator: call run() once; counts are in the result."""
+
+    def __init__(self, styles=40, users=1000, appointments=10000, seed=1, anchor=None,
+                 days_back=365, days_ahead=60, guest_share=0.35, prefix="load", batch_size=5000):
+        self.rng = random.Random(seed)
+        self.counts = {"styles": styles, "users": users, "appointments": appointments}
+        self.anchor = anchor or timezone.localdate()
+        self.days_back, self.days_ahead = days_back, days_ahead
+        self.guest_share = guest_share
+        self.prefix = prefix
+        self.batch_size = batch_size
+
+    def already_seeded(self):
+        return (
+            User.objects.filter(username__startswith=f"{self.prefix}-").exists()
+            or Style.objects.filter(name__startswith=f"{self.prefix.title()} ").exists()
+        )
+
+    def run(self, log=lambda message: None):
+        style_ids = self.styles()
+        log(f"styles: {len(style_ids)}")
+        user_rows = self.users()
+        log(f"users: {len(user_rows)} (with profiles)")
+        written = self.appointments(style_ids, user_rows, log)
+        log(f"appointments: {written}")
+        return {"styles": len(style_ids), "users": len(user_rows), "appointments": written}
+
+    # ---------- styles ----------
+
+    def styles(self):
+        rng = self.rng
+        names = list(CATEGORIES)
+        weights = [CATEGORIES[name][0] for name in names]
+        objs = []
+        for i, category in enumerate(rng.choices(names, weights=weights, k=self.counts["styles"])):
+            _, durations, (low, high) = CATEGORIES[category]
+            price_min = rng.randrange(low, high, 5)
+            objs.append(Style(
+                name=f"{self.prefix.title()} {category.title()} {i + 1}", category=category,
+                price_min=price_min, price_max=price_min + rng.randrange(0, 80, 5),
+                duration_mins=rng.choice(durations), rating_avg=round(rng.uniform(3.6, 5.0), 1),
+            ))
+        styles = Style.objects.bulk_create(objs, batch_size=self.batch_size)
+        bump_version(STYLE_CACHE_NAMESPACE)  # bulk_create skips the signal
+        return [style.pk for style in styles]
+
+    # ---------- users ----------
+
+    def users(self):
+        rng = self.rng
+        password = make_password(PASSWORD)  # hash once, not per user
+        joined_from = timezone.now() - timedelta(days=self.days_back * 2)
+        rows = []
+        for start in range(0, self.counts["users"], self.batch_size):
+            stop = min(start + self.batch_size, self.counts["users"])
+            users = [
+                User(
+                    username=f"{self.prefix}-user-{i}", email=f"{self.prefix}.user{i}@example.com",
+                    first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES), password=password,
+                    date_joined=joined_from + timedelta(minutes=rng.randrange(self.days_back * 2 * 24 * 60)),
+                )
+                for i in range(start, stop)
+            ]
+            with transaction.atomic():
+                users = User.objects.bulk_create(users)
+                Profile.objects.bulk_create(self._profile(user) for user in users)
+            rows.extend((user.pk, user.email, user.get_full_name()) for user in users)
+        return rows
+
+    def _profile(self, user):
+        rng = self.rng
+        profile = Profile(user=user)
+        if rng.random() < 0.7:
+            profile.phone_number = f"+1555{rng.randrange(10 ** 7):07d}"
+        if rng.random() < 0.5:
+            profile.dob = self.anchor - timedelta(days=rng.randrange(18 * 365, 70 * 365))
+        if rng.random() < 0.2:
+            profile.preferred_stylist = rng.choice(STYLISTS)
+        return profile
+
+    # ---------- appointments ----------
+
+    def _starts(self):
+        """Every open slot in [anchor - days_back, anchor + days_ahead) and cumulative weights."""
+        tz = timezone.get_current_timezone()
+        first = self.anchor - timedelta(days=self.days_back)
+        starts, weights = [], []
+        for n in range(self.days_back + self.days_ahead):
+            day = first + timedelta(days=n)
+            for (hour, minute), weight in zip(SLOTS, SLOT_WEIGHTS):
+                if WEEKDAY_WEIGHTS[day.weekday()]:
+                    starts.append((timezone.make_aware(datetime.combine(day, time(hour, minute)), tz), day))
+                    weights.append(WEEKDAY_WEIGHTS[day.weekday()] * weight)
+        return starts, list(accumulate(weights))
+
+    def _generate(self, style_ids, user_rows):
+        rng = self.rng
+        starts, cum_weights = self._starts()
+        statuses = {
+            past: (tuple(status for status, _ in table), list(accumulate(weight for _, weight in table)))
+            for past, table in ((True, PAST_STATUSES), (False, UPCOMING_STATUSES))
+        }
+        for i in range(self.counts["appointments"]):
+            start, day = rng.choices(starts, cum_weights=cum_weights)[0]
+            names, cum = statuses[day < self.anchor]
+            appt = Appointment(
+                style_id=rng.choice(style_ids), datetime=start, status=rng.choices(names, cum_weights=cum)[0],
+            )
+            if user_rows and rng.random() >= self.guest_share:
+                # skewed towards the first users: a fifth of them make over half the bookings
+                customer = user_rows[int(len(user_rows) * rng.random() ** 3)]
+                appt.user_id, appt.contact_email, appt.contact_name = customer
+            else:
+                appt.contact_name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+                if rng.random() < 0.8:
+                    appt.contact_email = f"{self.prefix}.guest{i}@example.com"
+                else:
+                    appt.contact_phone = f"+1555{rng.randrange(10 ** 7):07d}"
+            if rng.random() < 0.1:
+                appt.notes = "Seeded note"
+            yield appt
+
+    def appointments(self, style_ids, user_rows, log):
+        if not style_ids or not self.counts["appointments"]:
+            return 0
+        written, keys = 0, set()
+        for batch in _batched(self._generate(style_ids, user_rows), self.batch_size):
+            # a regular may draw the same style and slot twice; the unique constraint drops the repeat
+            Appointment.objects.bulk_create(batch, ignore_conflicts=True)
+            keys.update(appt.slot_key() for appt in batch)
+            written += len(batch)
+            if written % (self.batch_size * 20) == 0:
+                log(f"  {written} appointments...")
+        SlotAvailability.objects.refresh_many(keys)  # bulk_create skips the index signals
+        return Appointment.objects.filter(style_id__in=style_ids).count()
@@ -1,7 +1,9 @@
 # api/serializers.py
 from django.contrib.auth.models import User
+from django.db.models import BooleanField, Case, F, Value, When
 from rest_framework import serializers
 
+from .accounts import users_with_email
 from .models import Style, Appointment, Profile
 
 # ---------- Register ----------
@@ -20,7 +22,7 @@ class RegisterSerializer(serializers.ModelSerializer):
 
     def validate_email(self, value: str) -> str:
         email = value.strip().lower()
-        if User.objects.filter(email__iexact=email).exists():
+        if users_with_email(email).exists():
             raise serializers.ValidationError(
                 "An account with this email already exists.", code="unique"
             )
@@ -65,25 +67,26 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ("email",)
 
     def update(self, instance, validated_data):
-        # Pull nested profile data if present
+        """Write only the columns whose values actually change."""
         profile_data = validated_data.pop("profile", {})
 
-        # Update simple user fields
-        instance.first_name = validated_data.get("first_name", instance.first_name)
-        instance.last_name = validated_data.get("last_name", instance.last_name)
-        instance.save(update_fields=["first_name", "last_name"])
+        changed = [f for f, v in validated_data.items() if getattr(instance, f) != v]
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+        if changed:
+            instance.save(update_fields=changed)
 
-        # Ensure profile exists and update it
-        profile, _ = Profile.objects.get_or_create(user=instance)
-
-        if "dob" in profile_data:
-            profile.dob = profile_data.get("dob")
-        if "phone_number" in profile_data:
-            profile.phone_number = profile_data.get("phone_number", "")
-        if "preferred_stylist" in profile_data:
-            profile.preferred_stylist = profile_data.get("preferred_stylist", "")
-        profile.save()
+        # MeProfileView loads the profile with select_related; no query here
+        profile = getattr(instance, "profile", None)
+        if profile is None:
+            instance.profile = Profile.objects.create(user=instance, **profile_data)
+            return instance
 
+        changed = [f for f, v in profile_data.items() if getattr(profile, f) != v]
+        for field in changed:
+            setattr(profile, field, profile_data[field])
+        if changed:
+            profile.save(update_fields=changed)
         return instance
 
 # ---------- Styles ----------
@@ -171,7 +174,7 @@ class AppointmentSerializer(serializers.ModelSerializer):
         # Auto-fill for signed-in users (snapshot)
         if user and getattr(user, "is_authenticated", False):
             if not name:
-                name = (f"{user.first_name} {user.last_name}").strip() or user.username
+                name = user.get_full_name().strip() or user.get_username()
                 attrs["contact_name"] = name
             if not email and user.email:
                 attrs["contact_email"] = user.email.strip().lower()
@@ -185,4 +188,98 @@ class AppointmentSerializer(serializers.ModelSerializer):
                 "contact_phone": "Provide at least one contact method (email or phone).",
             })
 
-        return attrs
\ No newline at end of file
+        return attrs
+
+# ---------- Appointments (bulk import) ----------
+class _PreloadedField(serializers.Field):
+    """Resolves a value through a dict in the serializer context, not a query per row."""
+    default_error_messages = {"does_not_exist": "Unknown {name} {value!r}."}
+
+    def __init__(self, context_key, **kwargs):
+        self.context_key = context_key
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            return self.context[self.context_key][str(data).strip().lower()]
+        except KeyError:
+            self.fail("does_not_exist", name=self.field_name, value=data)
+
+
+class AppointmentImportSerializer(AppointmentSerializer):
+    """
+    AppointmentSerializer's rules (including validate()) for rows from
+    `import_data`. Status and the owning user are writable; style (id or
+    name) and user_email resolve through maps preloaded per chunk in
+    context["styles"] and context["users"].
+    """
+    style = _PreloadedField("styles")
+    user_email = _PreloadedField("users", source="user", required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=Appointment.STATUS_CHOICES, default="pending")
+
+    class Meta(AppointmentSerializer.Meta):
+        fields = (
+            "style", "user_email", "datetime", "status", "notes",
+            "contact_name", "contact_email", "contact_phone",
+        )
+        read_only_fields = ()
+        # no per-row uniqueness queries: the importer drops duplicates per chunk
+        validators = []
+
+    def validate(self, attrs):
+        # a signed-in booking's contact snapshot comes from its user, as at booking time
+        user = attrs.get("user")
+        if user is not None:
+            attrs["contact_name"] = attrs.get("contact_name") or user.get_full_name() or user.username
+            attrs["contact_email"] = attrs.get("contact_email") or user.email
+        return super().validate(attrs)
+
+
+# ---------- Appointments (lean read path for lists) ----------
+_DATETIME = serializers.DateTimeField()
+_PRICE = serializers.DecimalField(max_digits=8, decimal_places=2)
+
+class AppointmentReadSerializer(serializers.BaseSerializer):
+    """
+    Read-only fast path for appointment lists. Takes the flat rows produced
+    by `values_queryset()` (joins, is_paid and amount done in SQL) and
+    renders exactly the JSON AppointmentSerializer would, without model
+    instances, SerializerMethodFields or dotted-source lookups per row.
+    """
+
+    @staticmethod
+    def values_queryset(queryset):
+        return queryset.values(
+            "id", "user", "style", "datetime", "status", "notes",
+            "contact_name", "contact_email", "contact_phone", "created_at",
+        ).annotate(
+            user_email=F("user__email"),
+            style_name=F("style__name"),
+            is_paid=Case(When(status="paid", then=Value(True)), default=Value(False), output_field=BooleanField()),
+            # no appointment-level amount column yet: same fallback as get_amount
+            amount=F("style__price_min"),
+            style_price_min=F("style__price_min"),
+        )
+
+    def to_representation(self, row):
+        data = {
+            "id": row["id"],
+            "user": row["user"],
+            "user_email": row["user_email"],
+            "style": row["style"],
+            "style_name": row["style_name"],
+            "datetime": _DATETIME.to_representation(row["datetime"]),
+            "status": row["status"],
+            "notes": row["notes"],
+            "contact_name": row["contact_name"],
+            "contact_email": row["contact_email"],
+            "contact_phone": row["contact_phone"],
+            "created_at": _DATETIME.to_representation(row["created_at"]),
+            "is_paid": row["is_paid"],
+            "amount": row["amount"],
+            "style_price_min": _PRICE.to_representation(row["style_price_min"]),
+        }
+        if row["user"] is None:
+            # AppointmentSerializer skips source="user.email" for guests
+            del data["user_email"]
+        return data
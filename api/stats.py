@@ -0,0 +1,132 @@
+# api/stats.py
+"""
+Staff reporting: bookings and revenue aggregated in the database.
+
+Nothing here hydrates Appointment rows. Days already covered by
+`rollup_appointments` are read from DailyStyleRollup; the rest is a
+single GROUP BY over Appointment joined with Style, and the two halves
+are summed per bucket.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import Trunc, TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Appointment, DailyStyleRollup
+from .rollups import rollup_cutoff
+
+PERIODS = {"day": TruncDate, "week": TruncWeek, "month": TruncMonth}
+
+# group name -> (values() fields, extra annotations)
+GROUPS = {
+    "status": (("status",), {}),
+    "category": ((), {"category": F("style__category")}),
+    "style": (("style",), {"style_name": F("style__name")}),
+}
+
+LIVE = ~Q(status="cancelled")
+
+METRICS = ("bookings", "cancelled", "booked_minutes", "revenue", "paid_revenue")
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def booking_stats(period=None, by=None, start=None, end=None):
+    """
+    Rows of {period?, <group fields>?, bookings, cancelled, booked_minutes,
+    revenue, paid_revenue} for appointments starting in [start, end].
+    Revenue is the expected take from Style.price_min; cancelled bookings
+    are excluded from minutes and revenue. Rolled-up days reflect the
+    last `rollup_appointments` run.
+    """
+    cutoff = rollup_cutoff()
+    if cutoff is None or (start and start >= cutoff):
+        return [_format(row) for row in _live(period, by, start, end)]
+    if end and end < cutoff:
+        return [_format(row) for row in _rolled_up(period, by, start, end)]
+
+    rows = _merge(
+        _grouping(by, period, "datetime")[2],
+        _rolled_up(period, by, start, cutoff - timedelta(days=1)),
+        _live(period, by, cutoff, end),
+    )
+    return [_format(row) for row in rows]
+
+
+def _grouping(by, period, date_field):
+    fields, extra = GROUPS.get(by, ((), {}))
+    if period and date_field == "date":
+        # already a local date: plain truncation, no timezone cast
+        extra = {"period": Trunc("date", period, output_field=DateField()), **extra}
+    elif period:
+        extra = {"period": PERIODS[period](date_field, output_field=DateField()), **extra}
+    return fields, extra, [*extra, *fields]
+
+
+def _live(period, by, start, end):
+    qs = Appointment.objects.order_by()  # Meta.ordering would leak into GROUP BY
+    if start:
+        qs = qs.filter(datetime__gte=_aware(start))
+    if end:
+        qs = qs.filter(datetime__lt=_aware(end + timedelta(days=1)))
+
+    fields, extra, keys = _grouping(by, period, "datetime")
+    return (
+        qs.values(*fields, **extra)
+        .annotate(
+            bookings=Count("id"),
+            cancelled=Count("id", filter=Q(status="cancelled")),
+            booked_minutes=Sum("style__duration_mins", filter=LIVE, default=0),
+            revenue=Sum("style__price_min", filter=LIVE, default=0),
+            paid_revenue=Sum("style__price_min", filter=Q(status="paid"), default=0),
+        )
+        .order_by(*keys)
+    )
+
+
+def _rolled_up(period, by, start, end):
+    qs = DailyStyleRollup.objects.order_by()
+    if start:
+        qs = qs.filter(date__gte=start)
+    if end:
+        qs = qs.filter(date__lte=end)
+
+    fields, extra, keys = _grouping(by, period, "date")
+    return (
+        qs.values(*fields, **extra)
+        .annotate(
+            bookings=Sum("appointment_count", default=0),
+            cancelled=Sum("appointment_count", filter=Q(status="cancelled"), default=0),
+            booked_minutes=Sum("minutes", filter=LIVE, default=0),
+            revenue=Sum("expected_revenue", filter=LIVE, default=0),
+            paid_revenue=Sum("expected_revenue", filter=Q(status="paid"), default=0),
+        )
+        .order_by(*keys)
+    )
+
+
+def _merge(keys, *parts):
+    """Sum the metrics of rows sharing a bucket, ordered like the queries."""
+    merged = {}
+    for rows in parts:
+        for row in rows:
+            bucket = tuple(row[k] for k in keys)
+            if bucket in merged:
+                for metric in METRICS:
+                    merged[bucket][metric] += row[metric]
+            else:
+                merged[bucket] = row
+    return [merged[bucket] for bucket in sorted(merged)]
+
+
+def _format(row):
+    if "style" in row:
+        row["style_id"] = row.pop("style")
+    if row.get("period") is not None:
+        row["period"] = row["period"].isoformat()
+    for money in ("revenue", "paid_revenue"):
+        row[money] = f"{row[money]:.2f}"
+    return row
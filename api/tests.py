@@ -1,3 +1,1455 @@
-from django.test import TestCase
+import json
+from io import StringIO
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models.functions import TruncDate
+from django.test import AsyncRequestFactory, LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Style, Appointment, Profile, SlotAvailability, OutboxMessage, DailyStyleRollup, RollupWatermark, StripeEvent, CheckoutSession
+from rest_framework.renderers import JSONRenderer
+
+from config.metrics import REGISTRY, MetricsMiddleware
+
+from .bench.fixtures import (
+    ENDPOINT_BUDGETS,
+    SMTPStub,
+    call_endpoint,
+    endpoint_context,
+    endpoint_environment,
+    seed_realistic,
+    stripe_signature,
+)
+from .serializers import AppointmentSerializer, AppointmentReadSerializer
+from .notifications import NotificationDispatcher, drain_outbox, queue_reminders
+from .loadgen import LoadRunner, parse_mix
+from .rollups import refresh_rollups
+from .stats import booking_stats
+from .transfer import FORMATS, import_rows, read_rows
+from .seeding import LoadSeeder
+from .authentication import LazyTokenUser, revoke_tokens
+from .locks import booking_lock
+from .views import MyTokenObtainPairSerializer
+from . import async_views
+
+
+def make_style(**overrides):
+    data = dict(
+        name="Box Braids", category="braids",
+        price_min=140, price_max=220, duration_mins=240,
+    )
+    data.update(overrides)
+    return Style.objects.create(**data)
+
+
+def at(day, hhmm):
+    hour, minute = map(int, hhmm.split(":"))
+    return datetime(day.year, day.month, day.day, hour, minute, tzinfo=dt_timezone.utc)
+
+
+class BookingTestCase(TestCase):
+    """Two styles, one day, and helpers to book slots on it."""
+
+    def setUp(self):
+        self.style = make_style()
+        self.other = make_style(name="Taper Fade", category="cut", duration_mins=45)
+        self.day = datetime(2030, 5, 14).date()
+        self.client = APIClient()
+
+    def book(self, hhmm, style=None, day=None, **extra):
+        return Appointment.objects.create(
+            style=style or self.style,
+            datetime=at(day or self.day, hhmm),
+            contact_name="Guest",
+            contact_email=extra.pop("contact_email", f"{hhmm.replace(':', '')}@example.com"),
+            **extra,
+        )
+
+    def indexed(self, day, style_id=None):
+        return SlotAvailability.objects.availability_on(day, style_id)["taken"]
+
+    def taken(self, **params):
+        params.setdefault("date", self.day.isoformat())
+        return self.client.get("/api/appointments/taken/", params).json()["taken"]
+
+
+class SlotAvailabilityIndexTests(BookingTestCase):
+    def test_create_cancel_and_delete_keep_index_in_sync(self):
+        first = self.book("10:00")
+        second = self.book("09:30")
+        self.assertEqual(self.indexed(self.day, self.style.id), ["09:30", "10:00"])
+
+        first.status = "cancelled"
+        first.save(update_fields=["status"])
+        self.assertEqual(self.indexed(self.day, self.style.id), ["09:30"])
+
+        second.delete()
+        self.assertFalse(SlotAvailability.objects.filter(date=self.day).exists())
+
+    def test_reschedule_refreshes_old_and_new_day(self):
+        appt = self.book("10:00")
+        appt = Appointment.objects.get(pk=appt.pk)
+        next_day = self.day + timedelta(days=1)
+        appt.datetime = at(next_day, "11:15")
+        appt.save()
+
+        self.assertEqual(self.indexed(self.day, self.style.id), [])
+        self.assertEqual(self.indexed(next_day, self.style.id), ["11:15"])
+
+    def test_duration_change_resizes_blocked_intervals(self):
+        self.book("10:00")
+        blocked = lambda: SlotAvailability.objects.get(date=self.day, style=self.style).blocked
+
+        style = Style.objects.get(pk=self.style.pk)  # as the admin would load it
+        style.duration_mins = 120
+        style.save()
+        self.assertEqual(blocked(), [[600, 720]])
+
+        call_command("seed_styles", stdout=mock.MagicMock())  # Box Braids back to 240, via bulk_update
+        self.assertEqual(blocked(), [[600, 840]])
+
+    def test_refresh_many_creates_updates_and_drops_buckets_at_once(self):
+        next_day = self.day + timedelta(days=1)
+        self.book("10:00")
+        gone = self.book("09:00", day=next_day)
+        # writes that skip the signals leave the index stale
+        Appointment.objects.filter(pk=gone.pk).update(status="cancelled")
+        Appointment.objects.bulk_create([
+            Appointment(style=self.style, datetime=at(self.day, "15:00"), contact_name="G", contact_email="a@x.com"),
+            Appointment(style=self.other, datetime=at(next_day, "12:00"), contact_name="G", contact_email="b@x.com"),
+        ])
+
+        keys = [(self.day, self.style.id), (next_day, self.style.id), (next_day, self.other.id)]
+        with self.assertNumQueries(5):  # 2 reads, then insert, update and delete
+            SlotAvailability.objects.refresh_many(keys)
+        self.assertEqual(self.indexed(self.day, self.style.id), ["10:00", "15:00"])
+        self.assertFalse(SlotAvailability.objects.filter(date=next_day, style=self.style).exists())
+        self.assertEqual(self.indexed(next_day, self.other.id), ["12:00"])
+
+    def test_taken_endpoint_filters_by_style_and_uses_one_query(self):
+        self.book("10:00")
+        self.book("10:00", style=self.other)
+        self.book("13:00", style=self.other)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.taken(), ["10:00", "13:00"])
+        self.assertEqual(self.taken(style_id=self.style.id), ["10:00"])
+
+    def test_taken_rejects_missing_date(self):
+        resp = self.client.get("/api/appointments/taken/")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_taken_rejects_a_non_numeric_style_id(self):
+        resp = self.client.get("/api/appointments/taken/", {"date": self.day.isoformat(), "style_id": "abc"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("style_id", resp.json()["detail"])
+
+
+class TakenRangeTests(BookingTestCase):
+    def taken_range(self, **params):
+        resp = self.client.get("/api/appointments/taken-range/", params)
+        self.assertEqual(resp.status_code, 200)
+        return json.loads(b"".join(resp.streaming_content))
+
+    def test_returns_every_day_in_range(self):
+        next_day = self.day + timedelta(days=1)
+        self.book("10:00")
+        self.book("09:00", style=self.other)
+        self.book("15:30", day=next_day)
+
+        body = self.taken_range(
+            start=self.day.isoformat(),
+            end=(self.day + timedelta(days=2)).isoformat(),
+        )
+        self.assertEqual(body["taken"], {
+            self.day.isoformat(): ["09:00", "10:00"],
+            next_day.isoformat(): ["15:30"],
+            (self.day + timedelta(days=2)).isoformat(): [],
+        })
+
+        by_style = self.taken_range(
+            start=self.day.isoformat(), end=self.day.isoformat(), style_id=self.other.id,
+        )
+        self.assertEqual(by_style["taken"], {self.day.isoformat(): ["09:00"]})
+
+    def test_rejects_inverted_or_oversized_range(self):
+        for start, end in [(self.day + timedelta(days=1), self.day),
+                           (self.day, self.day + timedelta(days=400))]:
+            resp = self.client.get(
+                "/api/appointments/taken-range/",
+                {"start": start.isoformat(), "end": end.isoformat()},
+            )
+            self.assertEqual(resp.status_code, 400)
+
+        resp = self.client.get("/api/appointments/taken-range/", {
+            "start": self.day.isoformat(), "end": self.day.isoformat(), "style_id": "abc",
+        })
+        self.assertEqual(resp.status_code, 400)  # a plain response, not a stream that breaks mid-body
+        self.assertIn("style_id", resp.json()["detail"])
+
+
+class SlotConflictTests(BookingTestCase):
+    def post(self, hhmm, style=None, email="new@example.com"):
+        return self.client.post("/api/appointments/", {
+            "style": (style or self.style).id,
+            "datetime": at(self.day, hhmm).isoformat(),
+            "contact_name": "New Guest",
+            "contact_email": email,
+        }, format="json")
+
+    def test_long_booking_blocks_later_start_for_same_style(self):
+        self.book("10:00")  # 240 minutes -> blocked until 14:00
+
+        self.assertEqual(self.post("10:30").status_code, 409)
+        self.assertEqual(self.post("08:00").status_code, 409)  # would run into 10:00
+        self.assertEqual(self.post("14:00").status_code, 201)
+        self.assertEqual(self.post("10:30", style=self.other).status_code, 201)
+
+    def test_cancelled_booking_frees_its_interval(self):
+        appt = self.book("10:00")
+        appt.status = "cancelled"
+        appt.save(update_fields=["status"])
+        self.assertEqual(self.post("11:00").status_code, 201)
+
+    def test_taken_reports_blocked_ranges_including_overnight_spill(self):
+        self.book("22:00", day=self.day - timedelta(days=1))  # runs to 02:00
+        self.book("10:00")
+        self.book("12:00", style=self.other)
+
+        body = self.client.get("/api/appointments/taken/", {"date": self.day.isoformat()}).json()
+        self.assertEqual(body["taken"], ["10:00", "12:00"])
+        self.assertEqual(body["blocked"], [
+            {"start": "00:00", "end": "02:00"},
+            {"start": "10:00", "end": "14:00"},
+        ])
+
+    def test_overnight_booking_conflicts_with_next_morning(self):
+        self.book("22:00", day=self.day - timedelta(days=1))
+        self.assertEqual(self.post("01:00").status_code, 409)
+        self.assertEqual(self.post("02:00").status_code, 201)
+
+    def test_reschedule_into_overlap_is_rejected(self):
+        self.book("10:00")
+        user = User.objects.create_user("amy", "amy@example.com", "pw-123456789")
+        mine = self.book("15:00", user=user, contact_email="amy@example.com")
+        self.client.force_authenticate(user)
+
+        resp = self.client.patch(
+            f"/api/appointments/{mine.id}/", {"datetime": at(self.day, "12:00").isoformat()}, format="json"
+        )
+        self.assertEqual(resp.status_code, 409)
+        resp = self.client.patch(
+            f"/api/appointments/{mine.id}/", {"datetime": at(self.day, "14:30").isoformat()}, format="json"
+        )
+        self.assertEqual(resp.status_code, 200)
+
+    def test_overlap_is_checked_against_appointments_not_just_the_index(self):
+        # bulk_create skips the signals, so the index doesn't know about this one
+        Appointment.objects.bulk_create([
+            Appointment(style=self.style, datetime=at(self.day, "12:00"), contact_name="G", contact_email="g@x.com"),
+        ])
+        self.assertEqual(self.post("12:30").status_code, 409)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Burst of different guests POSTing the same slot at once."""
+
+    THREADS = 12
+
+    def setUp(self):
+        self.style = make_style()
+        self.when = at(datetime(2030, 5, 14).date(), "10:00")
+
+    def _burst(self, payload_for):
+        barrier = threading.Barrier(self.THREADS)
+        statuses = []
+
+        def worker(i):
+            try:
+                client = APIClient()
+                barrier.wait()
+                statuses.append(client.post("/api/appointments/", payload_for(i), format="json").status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return statuses
+
+    def test_exactly_one_winner_per_slot(self):
+        statuses = self._burst(lambda i: {
+            "style": self.style.id,
+            "datetime": (self.when + timedelta(minutes=15 * (i % 3))).isoformat(),
+            "contact_name": f"Guest {i}",
+            "contact_email": f"guest{i}@example.com",
+        })
+
+        self.assertEqual(sorted(statuses), [201] + [409] * (self.THREADS - 1))
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_index_rebuild_waits_for_a_booking_in_flight(self):
+        booked = threading.Event()
+
+        def book():
+            try:
+                with booking_lock(self.style, self.when):
+                    Appointment.objects.create(
+                        style=self.style, datetime=self.when, contact_name="B", contact_email="b@example.com",
+                    )
+                    booked.set()
+                    time.sleep(0.3)  # still uncommitted while the rebuild below starts
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=book)
+        thread.start()
+        booked.wait()
+        # e.g. a cancel elsewhere that day: must not write back a snapshot without the booking
+        SlotAvailability.objects.refresh(timezone.localdate(self.when), self.style.id)
+        thread.join()
+        self.assertEqual(
+            SlotAvailability.objects.availability_on(timezone.localdate(self.when), self.style.id)["taken"],
+            [timezone.localtime(self.when).strftime("%H:%M")],
+        )
+
+
+class FakeSMSClient:
+    """Stands in for twilio.rest.Client; records or fails every message."""
+
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+        self.messages = self
+
+    def create(self, to, from_, body):
+        if self.fail:
+            raise RuntimeError("sms gateway down")
+        self.sent.append((to, body))
+
+
+@override_settings(TWILIO_SID="AC123", TWILIO_AUTH_TOKEN="secret", TWILIO_PHONE_NUMBER="+15550000000")
+class NotificationOutboxTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sms = FakeSMSClient()
+        patcher = mock.patch("api.notifications._sms_client", return_value=self.sms)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_booking(self):
+        return self.client.post("/api/appointments/", {
+            "style": self.style.id,
+            "datetime": at(self.day, "10:00").isoformat(),
+            "contact_name": "Ada",
+            "contact_email": "ada@example.com",
+            "contact_phone": "+15551234567",
+        }, format="json")
+
+    def test_booking_only_enqueues(self):
+        self.assertEqual(self.post_booking().status_code, 201)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(self.sms.sent, [])
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list("channel", "to", "status")),
+            [("email", "ada@example.com", "pending"), ("sms", "+15551234567", "pending")],
+        )
+
+    def test_booking_and_its_confirmation_commit_together(self):
+        with mock.patch("api.views.send_booking_confirmation", side_effect=RuntimeError("outbox down")):
+            with self.assertRaises(RuntimeError):
+                self.post_booking()
+        self.assertFalse(Appointment.objects.exists())
+        self.assertFalse(SlotAvailability.objects.exists())
+
+    def test_worker_delivers_email_and_sms(self):
+        self.post_booking()
+        call_command("drain_outbox", "--workers", "2", stdout=mock.MagicMock())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["ada@example.com"])
+        self.assertEqual([to for to, _ in self.sms.sent], ["+15551234567"])
+        self.assertFalse(OutboxMessage.objects.exclude(status="sent").exists())
+
+    def test_failed_delivery_backs_off_then_gives_up(self):
+        self.sms.fail = True
+        self.post_booking()
+
+        self.assertEqual(drain_outbox(max_attempts=2), (1, 1, 0))
+        msg = OutboxMessage.objects.get(channel="sms")
+        self.assertEqual((msg.status, msg.attempts), ("pending", 1))
+        self.assertGreater(msg.next_attempt_at, timezone.now())
+        self.assertEqual(drain_outbox(max_attempts=2), (0, 0, 0))  # not due yet
+
+        OutboxMessage.objects.filter(pk=msg.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(drain_outbox(max_attempts=2), (0, 0, 1))
+        msg.refresh_from_db()
+        self.assertEqual((msg.status, msg.attempts), ("failed", 2))
+        self.assertIn("sms gateway down", msg.last_error)
+
+
+class NotificationDispatcherTests(TestCase):
+    def test_batch_reuses_one_smtp_connection(self):
+        OutboxMessage.objects.bulk_create(
+            OutboxMessage(channel="email", to=f"g{i}@example.com", subject="Hi", body="Body")
+            for i in range(20)
+        )
+        with SMTPStub() as smtp:
+            with NotificationDispatcher(smtp.connection()) as dispatcher:
+                self.assertEqual(drain_outbox(dispatcher=dispatcher), (20, 0, 0))
+            self.assertEqual((smtp.connections, smtp.messages), (1, 20))
+
+    def test_idle_polls_never_reuse_a_stale_connection(self):
+        def queue(n):
+            OutboxMessage.objects.bulk_create(
+                OutboxMessage(channel="email", to=f"g{i}@example.com", subject="Hi", body="Body")
+                for i in range(n)
+            )
+
+        with SMTPStub() as smtp:
+            with NotificationDispatcher(smtp.connection()) as dispatcher:
+                queue(3)
+                self.assertEqual(drain_outbox(dispatcher=dispatcher), (3, 0, 0))
+                # An empty poll doesn't connect, and no session outlives its batch
+                self.assertEqual(drain_outbox(dispatcher=dispatcher), (0, 0, 0))
+                self.assertIsNone(dispatcher.connection.connection)
+                queue(2)
+                self.assertEqual(drain_outbox(dispatcher=dispatcher), (2, 0, 0))
+            self.assertEqual((smtp.connections, smtp.messages), (2, 5))
+        self.assertFalse(OutboxMessage.objects.filter(attempts__gt=0).exists())
+
+
+class ReminderTests(TestCase):
+    def setUp(self):
+        self.style = make_style(duration_mins=30)
+        self.now = timezone.now()
+
+    def book(self, hours_ahead, status="pending", **extra):
+        return Appointment.objects.create(
+            style=self.style,
+            datetime=self.now + timedelta(hours=hours_ahead),
+            status=status,
+            contact_name="Guest",
+            contact_email=f"guest{hours_ahead}@example.com",
+            **extra,
+        )
+
+    def test_reminds_due_appointments_once(self):
+        soon = self.book(2, contact_phone="+15551234567")
+        later = self.book(30)
+        cancelled = self.book(3, status="cancelled")
+        past = self.book(-2)
+
+        self.assertEqual(queue_reminders(within_hours=24, chunk_size=1), 1)
+        self.assertEqual(queue_reminders(within_hours=24, chunk_size=1), 0)
+
+        reminded = set(Appointment.objects.filter(reminded_at__isnull=False).values_list("id", flat=True))
+        self.assertEqual(reminded, {soon.id})
+        self.assertNotIn(later.id, reminded)
+        self.assertNotIn(cancelled.id, reminded)
+        self.assertNotIn(past.id, reminded)
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list("channel", "to")),
+            [("email", "guest2@example.com"), ("sms", "+15551234567")],
+        )
+
+    def test_scan_is_chunked_and_query_count_is_flat(self):
+        for i in range(10):
+            self.book(1 + i / 10)
+        with self.assertNumQueries(1 + 5 * 5):  # scan + per chunk: savepoint, claim, update, insert, release
+            self.assertEqual(queue_reminders(within_hours=24, chunk_size=2), 10)
+
+    def test_command_reports_count(self):
+        self.book(5)
+        out = mock.MagicMock()
+        call_command("send_reminders", "--hours", "6", stdout=out)
+        self.assertIn("1 appointments", out.write.call_args[0][0])
+
+
+class StyleCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.style = make_style()
+        self.client = APIClient()
+
+    def test_list_is_served_from_cache_until_a_style_changes(self):
+        first = self.client.get("/api/styles/")
+        with self.assertNumQueries(0):
+            again = self.client.get("/api/styles/")
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(again["ETag"], first["ETag"])
+
+        Style.objects.filter(pk=self.style.pk).update(name="ignored")  # no signal
+        self.assertEqual(self.client.get("/api/styles/").json()[0]["name"], "Box Braids")
+
+        self.style.name = "Knotless Braids"
+        self.style.save()
+        fresh = self.client.get("/api/styles/")
+        self.assertEqual(fresh.json()[0]["name"], "Knotless Braids")
+        self.assertNotEqual(fresh["ETag"], first["ETag"])
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(f"/api/styles/{self.style.id}/")["ETag"]
+        with self.assertNumQueries(0):
+            resp = self.client.get(f"/api/styles/{self.style.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        self.style.delete()
+        self.assertEqual(self.client.get(f"/api/styles/{self.style.id}/", HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_if_none_match_compares_whole_entity_tags(self):
+        url = f"/api/styles/{self.style.id}/"
+        etag = self.client.get(url)["ETag"]
+        for header, status in (
+            (f'"stale", W/{etag}', 304),
+            ("*", 304),
+            (f'"x{etag[1:-1]}x"', 200),  # contains the tag, but isn't it
+            (etag[1:-1], 200),  # unquoted
+            ("", 200),
+        ):
+            with self.subTest(header=header):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=header).status_code, status)
+
+    @override_settings(ALLOWED_HOSTS=["a.example.com", "b.example.com"])
+    def test_cached_pages_keep_their_own_host(self):
+        make_style(name="Silk Press", category="natural")
+        for host in ("a.example.com", "b.example.com"):
+            page = self.client.get("/api/styles/", {"page_size": 1}, HTTP_HOST=host).json()
+            self.assertTrue(page["next"].startswith(f"http://{host}/"))
+
+    def test_etag_follows_the_body_across_a_cache_clear(self):
+        first = self.client.get(f"/api/styles/{self.style.id}/")
+        cache.clear()  # restart or flush: the version starts over
+        Style.objects.filter(pk=self.style.pk).update(price_min="99.00")  # no signal
+
+        resp = self.client.get(f"/api/styles/{self.style.id}/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["price_min"], "99.00")
+
+        cache.clear()
+        again = self.client.get(f"/api/styles/{self.style.id}/", HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(again.status_code, 304)  # same body, same ETag
+
+    def test_seed_styles_invalidates(self):
+        etag = self.client.get("/api/styles/")["ETag"]
+        call_command("seed_styles", stdout=mock.MagicMock())
+        resp = self.client.get("/api/styles/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()), 9)  # Box Braids was updated in place
+
+    def test_seed_styles_upserts_in_bulk(self):
+        with self.assertNumQueries(5):  # read, then insert and update in one savepoint
+            call_command("seed_styles", stdout=mock.MagicMock())
+        self.assertEqual(Style.objects.get(pk=self.style.pk).duration_mins, 240)
+        self.assertEqual(str(Style.objects.get(pk=self.style.pk).rating_avg), "4.8")
+        with self.assertNumQueries(4):
+            call_command("seed_styles", stdout=mock.MagicMock())
+        self.assertEqual(Style.objects.count(), 9)
+
+
+class StyleCatalogQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for i, (category, price, minutes, rating) in enumerate([
+            ("braids", 140, 240, 4.8), ("braids", 80, 120, 4.7), ("cut", 35, 45, 4.6),
+            ("cut", 25, 40, 4.9), ("color", 120, 150, None),
+        ]):
+            make_style(name=f"Style {i}", category=category, price_min=price,
+                       duration_mins=minutes, rating_avg=rating)
+
+    def names(self, **params):
+        return [s["name"] for s in self.client.get("/api/styles/", params).json()]
+
+    def test_filters(self):
+        self.assertEqual(self.names(category="braids"), ["Style 0", "Style 1"])
+        self.assertEqual(self.names(min_price=30, max_price=120), ["Style 1", "Style 2", "Style 4"])
+        self.assertEqual(self.names(max_duration=45), ["Style 2", "Style 3"])
+        self.assertEqual(self.names(min_rating=4.75), ["Style 0", "Style 3"])
+
+    def test_ordering(self):
+        self.assertEqual(self.names(ordering="-price_min")[:2], ["Style 0", "Style 4"])
+        self.assertEqual(self.names(category="cut", ordering="duration_mins"), ["Style 3", "Style 2"])
+
+    def test_cursor_pagination_is_opt_in(self):
+        self.assertIsInstance(self.client.get("/api/styles/").json(), list)
+
+        page = self.client.get("/api/styles/", {"page_size": 2}).json()
+        seen = [s["name"] for s in page["results"]]
+        while page["next"]:
+            page = self.client.get(page["next"]).json()
+            seen += [s["name"] for s in page["results"]]
+        self.assertEqual(seen, [f"Style {i}" for i in range(5)])
+
+
+class AppointmentListPaginationTests(TestCase):
+    ROWS = 600
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.style = make_style(duration_mins=30)
+        cls.user = User.objects.create_user("amy", "amy@example.com", "pw-123456789")
+        cls.staff = User.objects.create_user("desk", "desk@example.com", "pw-123456789", is_staff=True)
+        start = timezone.now() + timedelta(days=1)
+        Appointment.objects.bulk_create(
+            Appointment(
+                user=cls.user if i % 2 else None,
+                style=cls.style,
+                datetime=start + timedelta(minutes=30 * i),
+                status="cancelled" if i % 10 == 0 else "pending",
+                contact_name="Guest",
+                contact_email=f"g{i}@example.com",
+            )
+            for i in range(cls.ROWS)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def walk(self, url, page_size=50):
+        """Follow next links; return (ids, query counts per page)."""
+        ids, counts = [], []
+        url = f"{url}?page_size={page_size}"
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                page = self.client.get(url).json()
+            counts.append(len(ctx))
+            ids += [row["id"] for row in page["results"]]
+            url = page["next"]
+        return ids, counts
+
+    def test_staff_history_pages_cost_the_same_at_any_depth(self):
+        self.client.force_authenticate(self.staff)
+        ids, counts = self.walk("/api/appointments/")
+        self.assertEqual(len(ids), self.ROWS)
+        self.assertEqual(len(set(ids)), self.ROWS)
+        self.assertEqual(set(counts), {1})
+
+    def test_own_history_and_upcoming_are_paginated(self):
+        self.client.force_authenticate(self.user)
+        mine = set(Appointment.objects.filter(user=self.user).values_list("id", flat=True))
+
+        ids, counts = self.walk("/api/me/appointments/", page_size=40)
+        self.assertEqual(set(ids), mine)
+        self.assertEqual(set(counts), {1})
+
+        ids, counts = self.walk("/api/appointments/upcoming/", page_size=40)
+        upcoming = list(
+            Appointment.objects.filter(user=self.user).exclude(status="cancelled")
+            .order_by("datetime").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, upcoming)
+        self.assertEqual(set(counts), {1})
+
+    def test_unpaginated_response_is_unchanged(self):
+        self.client.force_authenticate(self.user)
+        body = self.client.get("/api/me/appointments/").json()
+        self.assertIsInstance(body, list)
+        self.assertEqual(len(body), self.ROWS // 2)
+
+
+class AppointmentReadSerializerTests(BookingTestCase):
+    def test_renders_identical_json_to_appointment_serializer(self):
+        user = User.objects.create_user("amy", "Amy@Example.com", "pw-123456789")
+        cheap = make_style(name="Beard Trim", category="cut", price_min="14.63", duration_mins=30)
+        self.book("09:00", user=user, status="paid", notes="window seat")
+        self.book("11:00", style=cheap, contact_phone="+15551234567")
+        self.book("15:00", style=self.other, contact_email=None, status="cancelled")
+
+        qs = Appointment.objects.select_related("style", "user")
+        full = JSONRenderer().render(AppointmentSerializer(qs, many=True).data)
+        lean = JSONRenderer().render(
+            AppointmentReadSerializer(AppointmentReadSerializer.values_queryset(qs), many=True).data
+        )
+        self.assertEqual(lean, full)
+
+    def test_list_endpoints_use_one_query(self):
+        user = User.objects.create_user("amy", "amy@example.com", "pw-123456789")
+        for hhmm in ("09:00", "14:00", "19:00"):
+            self.book(hhmm, user=user)
+        self.client.force_authenticate(user)
+        for url in ("/api/appointments/", "/api/me/appointments/", "/api/appointments/upcoming/"):
+            with self.assertNumQueries(1):
+                self.assertEqual(len(self.client.get(url).json()), 3)
+
+
+class StatsEndpointTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user("desk", "desk@example.com", "pw-123456789", is_staff=True)
+        monday = self.day - timedelta(days=self.day.weekday())
+        self.book("09:00", status="paid")                       # braids 140, 240m
+        self.book("14:00", status="cancelled")
+        self.book("10:00", style=self.other, status="approved")  # cut 140, 45m
+        self.book("10:00", style=self.other, day=monday + timedelta(days=7))
+        self.client.force_authenticate(self.staff)
+
+    def get(self, url, **params):
+        resp = self.client.get(url, params)
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return resp.json()
+
+    def test_daily_series_by_category(self):
+        with self.assertNumQueries(2):  # rollup watermark + aggregate
+            rows = self.get("/api/stats/bookings/", by="category",
+                            start=self.day.isoformat(), end=self.day.isoformat())
+        self.assertEqual(rows, [
+            {"period": self.day.isoformat(), "category": "braids", "bookings": 2, "cancelled": 1,
+             "booked_minutes": 240, "revenue": "140.00", "paid_revenue": "140.00"},
+            {"period": self.day.isoformat(), "category": "cut", "bookings": 1, "cancelled": 0,
+             "booked_minutes": 45, "revenue": "140.00", "paid_revenue": "0.00"},
+        ])
+
+    def test_weekly_series_and_summary(self):
+        weeks = self.get("/api/stats/bookings/", period="week")
+        self.assertEqual([(w["period"], w["bookings"]) for w in weeks], [
+            ((self.day - timedelta(days=self.day.weekday())).isoformat(), 3),
+            ((self.day - timedelta(days=self.day.weekday()) + timedelta(days=7)).isoformat(), 1),
+        ])
+
+        summary = self.get("/api/stats/summary/")
+        self.assertEqual({r["status"]: r["bookings"] for r in summary},
+                         {"approved": 1, "cancelled": 1, "paid": 1, "pending": 1})
+
+        by_style = self.get("/api/stats/summary/", by="style")
+        self.assertEqual({r["style_name"]: r["revenue"] for r in by_style},
+                         {"Box Braids": "140.00", "Taper Fade": "280.00"})
+
+    def test_staff_only_and_validates_params(self):
+        self.assertEqual(self.client.get("/api/stats/bookings/", {"period": "year"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/stats/summary/", {"by": "user"}).status_code, 400)
+        self.client.force_authenticate(User.objects.create_user("amy", "amy@example.com", "pw-123456789"))
+        self.assertEqual(self.client.get("/api/stats/summary/").status_code, 403)
+
+
+@override_settings(ROLLUP_WATERMARK_LAG_SECONDS=0)
+class RollupTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.paid = self.book("09:00", status="paid")
+        self.book("14:00", status="cancelled")
+        self.cut = self.book("10:00", style=self.other, status="approved")
+        self.book("10:00", style=self.other, day=self.day + timedelta(days=8))
+
+    def rollups(self):
+        return sorted(
+            DailyStyleRollup.objects.values_list("date", "style__name", "status", "appointment_count", "minutes")
+        )
+
+    def serve_from_rollups(self, until):
+        RollupWatermark.objects.update(value=at(until, "00:00"))
+
+    def test_refresh_only_rebuilds_changed_buckets(self):
+        call_command("rollup_appointments", stdout=StringIO())
+        self.assertEqual(self.rollups(), [
+            (self.day, "Box Braids", "cancelled", 1, 240),
+            (self.day, "Box Braids", "paid", 1, 240),
+            (self.day, "Taper Fade", "approved", 1, 45),
+            (self.day + timedelta(days=8), "Taper Fade", "pending", 1, 45),
+        ])
+        self.assertEqual(refresh_rollups(), 0)
+
+        self.cut.status = "completed"
+        self.cut.save()
+        self.assertEqual(refresh_rollups(), 1)
+        self.assertIn((self.day, "Taper Fade", "completed", 1, 45), self.rollups())
+        self.assertNotIn((self.day, "Taper Fade", "approved", 1, 45), self.rollups())
+
+        # Moving away only touches the new bucket's updated_at; the old one is flagged stale
+        moved = Appointment.objects.get(pk=self.paid.pk)
+        moved.datetime = at(self.day + timedelta(days=1), "09:00")
+        moved.save()
+        self.assertEqual(refresh_rollups(), 2)
+        self.assertNotIn((self.day, "Box Braids", "paid", 1, 240), self.rollups())
+
+        Appointment.objects.get(pk=self.cut.pk).delete()
+        self.assertEqual(refresh_rollups(), 1)
+        self.assertFalse(DailyStyleRollup.objects.filter(date=self.day, style=self.other).exists())
+        self.assertFalse(DailyStyleRollup.objects.filter(stale=True).exists())
+
+    def test_reports_read_rollups_for_covered_days(self):
+        cases = [dict(period="day", by="category"), dict(period="week"), dict(by="status"),
+                 dict(period="month", by="style")]
+        live = [booking_stats(**case) for case in cases]
+
+        refresh_rollups()
+        self.serve_from_rollups(self.day + timedelta(days=30))
+        with self.assertNumQueries(2):  # entirely before the cutoff: rollups only
+            self.assertEqual(
+                booking_stats(period="day", by="category", end=self.day + timedelta(days=20)), live[0]
+            )
+        self.assertEqual([booking_stats(**case) for case in cases], live)
+
+        # Split at the cutoff: the week's older days come from rollups, the rest live
+        self.serve_from_rollups(self.day + timedelta(days=1))
+        self.book("16:00", style=self.other, day=self.day + timedelta(days=8))
+        with self.assertNumQueries(3):
+            weeks = booking_stats(period="week")
+        self.assertEqual([w["bookings"] for w in weeks], [3, 2])
+
+    def test_price_or_duration_change_restales_the_style(self):
+        refresh_rollups()
+        style = Style.objects.get(pk=self.style.pk)
+        style.price_min = 150
+        style.save()
+        stale = DailyStyleRollup.objects.filter(stale=True).values_list("style_id", flat=True)
+        self.assertEqual(set(stale), {self.style.id})
+
+        self.assertEqual(refresh_rollups(), 1)
+        live = booking_stats(by="style")
+        self.serve_from_rollups(self.day + timedelta(days=30))
+        self.assertEqual(booking_stats(by="style"), live)
+
+        call_command("seed_styles", stdout=mock.MagicMock())  # Box Braids back to 140, via bulk_update
+        self.assertEqual(set(stale), {self.style.id})
+
+
+class BulkAppointmentTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user("desk", "desk@example.com", "pw-123456789", is_staff=True)
+        self.client.force_authenticate(self.staff)
+
+    def payload(self, hhmm, style=None, **extra):
+        return {"style": (style or self.other).id, "datetime": at(self.day, hhmm).isoformat(),
+                "contact_name": "Walk-in", "contact_email": f"{hhmm.replace(':', '')}@example.com", **extra}
+
+    def test_bulk_create_books_indexes_and_notifies_in_one_go(self):
+        batch = [self.payload("09:00"), self.payload("10:00"), self.payload("11:00", contact_phone="+15550001111")]
+        with self.assertNumQueries(len(batch) + 8):  # one style lookup per row, then a fixed cost
+            resp = self.client.post("/api/appointments/bulk/", batch, format="json")
+        self.assertEqual(resp.status_code, 201, resp.content)
+        self.assertEqual([a["contact_email"] for a in resp.json()],
+                         ["0900@example.com", "1000@example.com", "1100@example.com"])
+        self.assertEqual(self.indexed(self.day, self.other.id), ["09:00", "10:00", "11:00"])
+        self.assertEqual(OutboxMessage.objects.count(), 4)
+        self.assertFalse(Appointment.objects.filter(contact_email="desk@example.com").exists())
+
+    def test_bulk_create_is_all_or_nothing(self):
+        self.book("12:00", style=self.other)
+        clash = self.client.post("/api/appointments/bulk/",
+                                 [self.payload("09:00"), self.payload("12:30")], format="json")
+        self.assertEqual(clash.status_code, 409)
+        inside = self.client.post("/api/appointments/bulk/",
+                                  [self.payload("09:00"), self.payload("09:30")], format="json")
+        self.assertEqual(inside.status_code, 409)
+        invalid = self.client.post("/api/appointments/bulk/",
+                                   [self.payload("09:00"), self.payload("10:00", contact_name="")], format="json")
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertFalse(OutboxMessage.objects.filter(subject__contains="confirmed").exclude(
+            to="1200@example.com").exists())
+
+    def test_bulk_approve_by_ids_and_cancel_by_date(self):
+        pending = [self.book(hhmm, style=self.other) for hhmm in ("09:00", "10:00", "11:00")]
+        done = self.book("13:00", style=self.other, status="completed")
+        tomorrow = self.book("09:00", style=self.other, day=self.day + timedelta(days=1))
+        OutboxMessage.objects.all().delete()
+
+        resp = self.client.post("/api/appointments/bulk-status/",
+                                {"status": "approved", "ids": [pending[0].id, pending[1].id, done.id]},
+                                format="json")
+        self.assertEqual(resp.json()["updated"], 2)
+        self.assertEqual(Appointment.objects.get(pk=done.pk).status, "completed")
+
+        with self.assertNumQueries(9):
+            resp = self.client.post("/api/appointments/bulk-status/",
+                                    {"status": "cancelled", "date": self.day.isoformat()}, format="json")
+        self.assertEqual(resp.json()["updated"], 3)
+        self.assertEqual(self.indexed(self.day, self.other.id), ["13:00"])
+        self.assertEqual(Appointment.objects.get(pk=tomorrow.pk).status, "pending")
+        self.assertEqual(OutboxMessage.objects.filter(subject__contains="cancelled").count(), 3)
+        self.assertTrue(Appointment.objects.filter(pk=pending[2].pk, updated_at__gt=pending[2].updated_at).exists())
+
+    def test_staff_only_and_validates(self):
+        self.assertEqual(self.client.post("/api/appointments/bulk-status/", {"status": "paid", "ids": []},
+                                          format="json").status_code, 400)
+        self.assertEqual(self.client.post("/api/appointments/bulk-status/", {"status": "cancelled"},
+                                          format="json").status_code, 400)
+        for bad in ({"ids": ["x"]}, {"ids": 3}, {"date": self.day.isoformat(), "style_id": "x"},
+                    {"date": "14/05/2030"}):
+            resp = self.client.post("/api/appointments/bulk-status/", {"status": "cancelled", **bad}, format="json")
+            self.assertEqual(resp.status_code, 400, bad)
+        self.assertEqual(self.client.post("/api/appointments/bulk/", [], format="json").status_code, 400)
+        self.client.force_authenticate(User.objects.create_user("amy", "amy@example.com", "pw-123456789"))
+        self.assertEqual(self.client.post("/api/appointments/bulk/", [self.payload("09:00")],
+                                          format="json").status_code, 403)
+
+
+class TransferTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.amy = User.objects.create_user("amy", "amy@example.com", "pw-123456789", first_name="Amy")
+        self.book("09:00", user=self.amy, contact_email="amy@example.com")
+        self.book("11:00", style=self.other, status="paid", notes='says "hi", twice')
+        self.book("13:00", contact_email=None, contact_phone="+15550001111")
+
+    def export(self, kind, fmt="csv", *args):
+        out = StringIO()
+        call_command("export_data", kind, "--format", fmt, *args, stdout=out)
+        return out.getvalue()
+
+    def snapshot(self):
+        return list(Appointment.objects.order_by("datetime").values_list(
+            "user_id", "style_id", "datetime", "status", "notes", "contact_name", "contact_email", "contact_phone",
+        ))
+
+    def test_export_import_round_trip(self):
+        for fmt in FORMATS:
+            with self.subTest(fmt=fmt):
+                before, dump = self.snapshot(), self.export("appointments", fmt)
+                Appointment.objects.all().delete()
+                result = import_rows("appointments", read_rows(fmt, StringIO(dump)), batch_size=2)
+                self.assertEqual((result["imported"], result["invalid"]), (3, 0))
+                self.assertEqual(self.snapshot(), before)
+                self.assertEqual(self.indexed(self.day), ["09:00", "11:00", "13:00"])
+
+    def test_reimport_skips_existing_and_reports_invalid_rows(self):
+        dump = self.export("appointments", "ndjson")
+        bad = [
+            {"style": "No Such Style", "datetime": at(self.day, "15:00").isoformat(), "contact_name": "X",
+             "contact_email": "x@example.com"},
+            {"style": self.style.name, "datetime": at(self.day, "16:00").isoformat(), "contact_phone": "+1555"},
+            {"style": self.style.name, "datetime": at(self.day, "17:00").isoformat(),
+             "user_email": "AMY@example.com"},
+        ]
+        dump += "".join(json.dumps(row) + "\n" for row in bad)
+
+        result = import_rows("appointments", read_rows("ndjson", StringIO(dump)))
+        self.assertEqual((result["rows"], result["imported"], result["skipped"], result["invalid"]), (6, 1, 3, 2))
+        self.assertEqual([(line, sorted(errors)) for line, errors in result["errors"]],
+                         [(4, ["style"]), (5, ["contact_name"])])
+        self.assertEqual(Appointment.objects.get(datetime=at(self.day, "17:00")).contact_name, "Amy")
+
+    def test_import_users_with_profiles(self):
+        dump = "email,first_name,phone\nAmy@Example.com,Amy,\nnew@example.com,Nia,+15550002222\nnot-an-email,X,\n"
+        with self.assertNumQueries(6):  # 2 lookups, then users + profiles in one transaction
+            result = import_rows("users", read_rows("csv", StringIO(dump)))
+        self.assertEqual((result["imported"], result["skipped"], result["invalid"]), (1, 1, 1))
+        user = User.objects.select_related("profile").get(email="new@example.com")
+        self.assertEqual((user.username, user.profile.phone_number), ("new@example.com", "+15550002222"))
+        self.assertFalse(user.has_usable_password())
+        self.assertIn("new@example.com", self.export("users"))
+
+    def test_export_endpoint_streams_for_staff_only(self):
+        self.assertEqual(self.client.get("/api/export/appointments.csv").status_code, 401)
+        self.client.force_authenticate(self.amy)
+        self.assertEqual(self.client.get("/api/export/appointments.csv").status_code, 403)
+
+        self.client.force_authenticate(User.objects.create_user("desk", "desk@example.com", "x", is_staff=True))
+        resp = self.client.get("/api/export/appointments.csv", {"status": "paid"}, HTTP_ACCEPT="text/csv")
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp["Content-Type"], "text/csv")
+        body = b"".join(resp.streaming_content).decode()
+        self.assertEqual(body, self.export("appointments", "csv", "--status", "paid"))
+        self.assertEqual(len(body.splitlines()), 2)
+        self.assertEqual(self.client.get("/api/export/payments.csv").status_code, 404)
+        self.assertEqual(self.client.get("/api/export/appointments.ndjson", {"start": "May 14"}).status_code, 400)
+
+
+class SeedLoadTests(TestCase):
+    ANCHOR = datetime(2030, 5, 14).date()
+
+    def seed(self, prefix, **counts):
+        counts = {"styles": 5, "users": 20, "appointments": 400, **counts}
+        return LoadSeeder(seed=7, anchor=self.ANCHOR, prefix=prefix, batch_size=64, **counts).run()
+
+    def rows(self, prefix):
+        return [
+            (start, status, minutes, phone, user_id is None)
+            for start, status, minutes, phone, user_id in Appointment.objects
+            .filter(style__name__startswith=f"{prefix.title()} ").order_by("pk")
+            .values_list("datetime", "status", "style__duration_mins", "contact_phone", "user_id")
+        ]
+
+    def test_same_seed_same_data(self):
+        counts = self.seed("a")
+        self.assertEqual((counts["styles"], counts["users"]), (5, 20))
+        self.assertGreater(counts["appointments"], 390)  # a regular's repeat booking is dropped
+        self.assertEqual(self.seed("b"), counts)
+        self.assertEqual(self.rows("a"), self.rows("b"))
+        self.assertEqual(Profile.objects.filter(user__username__startswith="a-user-").count(), 20)
+
+    def test_distributions_and_index(self):
+        self.seed("a", appointments=2000)
+        appts = Appointment.objects.all()
+        self.assertFalse(appts.filter(datetime__week_day=1).exists())  # closed Sundays
+        self.assertFalse(appts.filter(datetime__lt=at(self.ANCHOR, "00:00"), status="pending").exists())
+        self.assertFalse(appts.filter(datetime__gte=at(self.ANCHOR, "00:00"), status="completed").exists())
+        guests = appts.filter(user__isnull=True).count()
+        self.assertTrue(500 < guests < 900, guests)  # --guest-share 0.35
+
+        busiest = appts.exclude(status="cancelled").values("style").annotate(
+            day=TruncDate("datetime")).values_list("day", "style").first()
+        taken = SlotAvailability.objects.availability_on(*busiest)["taken"]
+        self.assertEqual(taken, sorted({
+            timezone.localtime(dt).strftime("%H:%M")
+            for dt in appts.filter(style=busiest[1], datetime__date=busiest[0])
+            .exclude(status="cancelled").values_list("datetime", flat=True)
+        }))
+
+    def test_command_refuses_to_reseed_a_prefix(self):
+        out = StringIO()
+        call_command("seed_load", "--styles", "2", "--users", "3", "--appointments", "10", stdout=out)
+        self.assertIn("Seeded 2 styles, 3 users and 10 appointments", out.getvalue())
+        with self.assertRaisesMessage(CommandError, "already exists"):
+            call_command("seed_load", "--appointments", "10", stdout=StringIO())
+
+
+WEBHOOK_SECRET = "whsec_test_secret"
+
+
+def stripe_event(event_id, appointment_id, event_type="checkout.session.completed", amount_total=14000):
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": event_type,
+        "data": {"object": {
+            "id": "cs_test_123",
+            "object": "checkout.session",
+            "amount_total": amount_total,
+            "metadata": {"appointment_id": str(appointment_id), "user_id": ""},
+        }},
+    }
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeWebhookTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.appt = self.book("09:00")
+        OutboxMessage.objects.all().delete()
+
+    def deliver(self, event, secret=WEBHOOK_SECRET):
+        payload = json.dumps(event)
+        return self.client.post(
+            "/api/webhooks/stripe/", payload, content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=stripe_signature(payload, secret),
+        )
+
+    def test_marks_paid_once_and_acknowledges_redeliveries(self):
+        CheckoutSession.objects.create(appointment=self.appt, session_id="cs_test_123", url="https://x",
+                                       amount_cents=14000, fingerprint="f", expires_at=timezone.now())
+        event = stripe_event("evt_1", self.appt.id)
+        self.assertEqual(self.deliver(event).status_code, 200)
+        self.appt.refresh_from_db()
+        self.assertEqual(self.appt.status, "paid")
+        self.assertEqual(StripeEvent.objects.get().appointment_id, self.appt.id)
+        self.assertFalse(CheckoutSession.objects.exists())
+        self.assertEqual(list(OutboxMessage.objects.values_list("subject", flat=True)),
+                         ["Payment received – Hair Salon"])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.deliver(event).status_code, 200)
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_new_event_for_paid_appointment_sends_nothing(self):
+        self.deliver(stripe_event("evt_1", self.appt.id))
+        self.assertEqual(self.deliver(stripe_event("evt_2", self.appt.id)).status_code, 200)
+        self.assertEqual(StripeEvent.objects.count(), 2)
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_paying_a_cancelled_booking_restores_its_slot(self):
+        self.appt.status = "cancelled"
+        self.appt.save()
+        self.assertEqual(self.indexed(self.day), [])
+        self.deliver(stripe_event("evt_1", self.appt.id))
+        self.assertEqual(self.indexed(self.day), ["09:00"])
+
+    def test_rejects_bad_signatures_and_ignores_other_events(self):
+        self.assertEqual(self.deliver(stripe_event("evt_1", self.appt.id), secret="whsec_wrong").status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+        self.assertEqual(self.deliver(stripe_event("evt_2", self.appt.id, "payment_intent.created")).status_code, 200)
+        self.assertEqual(Appointment.objects.get(pk=self.appt.pk).status, "pending")
+        self.assertEqual(StripeEvent.objects.get().type, "payment_intent.created")
+
+
+class FakeCheckout:
+    """Stands in for stripe.checkout.Session; records sessions created, honours idempotency keys."""
+
+    def __init__(self):
+        self.created, self.expired = [], []
+        self.by_key = {}
+
+    def create(self, idempotency_key=None, **kwargs):
+        if idempotency_key in self.by_key:
+            return self.by_key[idempotency_key]
+        self.created.append(kwargs)
+        n = len(self.created)
+        session = mock.Mock(id=f"cs_test_{n}", url=f"https://checkout.stripe.test/{n}",
+                            expires_at=int(time.time()) + 24 * 3600)
+        if idempotency_key:
+            self.by_key[idempotency_key] = session
+        return session
+
+    def expire(self, session_id):
+        self.expired.append(session_id)
+
+
+class CheckoutSessionCacheTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("amy", "amy@example.com", "pw-123456789")
+        self.appt = self.book("09:00", user=self.user)
+        self.client.force_authenticate(self.user)
+        self.fake = FakeCheckout()
+        for patcher in (mock.patch("stripe.api_key", "sk_test_123"),
+                        mock.patch("stripe.checkout.Session", self.fake)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def checkout(self):
+        resp = self.client.post(f"/api/checkout/create-session/{self.appt.id}/")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return resp.json()["url"]
+
+    def test_repeat_clicks_reuse_the_open_session(self):
+        first = self.checkout()
+        self.assertEqual(self.checkout(), first)
+        self.assertEqual(len(self.fake.created), 1)
+        self.assertEqual(self.appt.checkout_session.amount_cents, 14000)
+
+    def test_price_or_time_change_replaces_the_session(self):
+        first = self.checkout()
+        self.style.price_min = 150
+        self.style.save()
+        repriced = self.checkout()
+        self.assertNotEqual(repriced, first)
+        self.assertEqual(self.fake.expired, ["cs_test_1"])
+        self.assertEqual(self.fake.created[-1]["line_items"][0]["price_data"]["unit_amount"], 15000)
+
+        self.appt.datetime = at(self.day, "15:00")
+        self.appt.save()
+        self.checkout()
+        self.assertEqual(len(self.fake.created), 3)
+
+    def test_expiring_or_paid_session_is_not_reused(self):
+        self.checkout()
+        CheckoutSession.objects.update(expires_at=timezone.now() + timedelta(minutes=2))
+        self.checkout()
+        self.assertEqual(len(self.fake.created), 2)
+
+        # what the webhook does once paid
+        Appointment.objects.filter(pk=self.appt.pk).update(status="paid")
+        CheckoutSession.objects.all().delete()
+        self.checkout()
+        self.assertEqual(len(self.fake.created), 3)
+
+    def test_clicks_racing_past_the_cache_get_the_same_session(self):
+        first = self.checkout()
+        CheckoutSession.objects.all().delete()  # the second click read before the first stored it
+        self.assertEqual(self.checkout(), first)
+        self.assertEqual(len(self.fake.created), 1)
+
+
+class MetricsMiddlewareTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        REGISTRY.reset()
+
+    def test_records_per_view_histograms_and_server_timing(self):
+        self.book("09:00")
+        resp = self.client.get("/api/appointments/taken/", {"date": self.day.isoformat()})
+        self.assertRegex(resp["Server-Timing"], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries"$')
+        self.client.get("/api/styles/")
+        self.client.get("/api/nowhere/")
+
+        self.client.force_login(User.objects.create_user("ops", "ops@example.com", "pw-123456789", is_staff=True))
+        text = self.client.get("/api/metrics/").content.decode()
+        self.assertIn('http_request_db_queries_bucket{view="AppointmentViewSet.taken",le="1"} 1', text)
+        self.assertIn('http_request_duration_seconds_count{view="StyleViewSet.list"} 1', text)
+        self.assertIn('http_response_size_bytes_count{view="unresolved"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="AppointmentViewSet.taken",le="+Inf"} 1', text)
+
+    def test_labels_function_views(self):
+        self.client.post("/api/webhooks/stripe/")
+        text = REGISTRY.render()
+        self.assertIn('http_request_duration_seconds_count{view="stripe_webhook"} 1', text)
+
+    def test_streaming_responses_are_recorded_when_the_body_ends(self):
+        resp = self.client.get("/api/appointments/taken-range/", {"start": "2030-05-01", "end": "2030-05-02"})
+        self.assertNotIn("Server-Timing", resp)  # sent before the queries run
+        self.assertNotIn('view="AppointmentViewSet.taken_range"', REGISTRY.render())
+
+        body = b"".join(resp.streaming_content)
+        text = REGISTRY.render()
+        self.assertIn('http_request_db_queries_bucket{view="AppointmentViewSet.taken_range",le="0"} 0', text)
+        self.assertIn('http_request_db_queries_bucket{view="AppointmentViewSet.taken_range",le="1"} 1', text)
+        self.assertIn(f'http_response_size_bytes_sum{{view="AppointmentViewSet.taken_range"}} {len(body)}', text)
+
+    @override_settings(METRICS_TOKEN="scrape-me")
+    def test_token_protects_scrape_endpoint(self):
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+        self.assertEqual(self.client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer scrape-me").status_code, 200)
+
+    def test_scrape_endpoint_is_staff_only_without_a_token(self):
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+        self.client.force_login(User.objects.create_user("amy", "amy@example.com", "pw-123456789"))
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+
+
+class LoginEmailLookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user("amy", "Amy.Lee@Example.com", "pw-123456789")
+
+    def login(self, username):
+        return self.client.post("/api/auth/login/", {"username": username, "password": "pw-123456789"})
+
+    def test_email_login_is_case_insensitive_and_cached(self):
+        with self.assertNumQueries(3):  # email lookup, user by username, token state
+            self.assertEqual(self.login("amy.lee@example.com").status_code, 200)
+        with self.assertNumQueries(2):  # user by username, token state (read fresh on every login)
+            self.assertEqual(self.login("AMY.LEE@example.com").status_code, 200)
+        self.assertEqual(self.login("amy").status_code, 200)
+
+    def test_saving_a_user_clears_a_cached_miss(self):
+        self.assertEqual(self.login("new@example.com").status_code, 401)
+        resp = self.client.post("/api/auth/register/", {"email": "New@Example.com", "password": "pw-123456789"})
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(self.login("new@example.com").status_code, 200)
+
+    def test_register_rejects_an_email_in_any_case(self):
+        resp = self.client.post("/api/auth/register/", {"email": "AMY.lee@example.COM", "password": "pw-123456789"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("email", resp.json())
+
+
+class TokenUserAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            "amy", "amy@example.com", "pw-123456789", first_name="Amy", is_staff=True,
+        )
+        self.refresh = MyTokenObtainPairSerializer.get_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}")
+
+    def test_requests_trust_claims_without_loading_the_user(self):
+        self.client.get("/api/me/appointments/")  # caches the token state
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/api/me/appointments/").status_code, 200)
+
+        user = LazyTokenUser(self.refresh.access_token)
+        with self.assertNumQueries(0):
+            self.assertEqual((user.id, user.is_staff, user.email, user.get_full_name()),
+                             (self.user.id, True, "amy@example.com", "Amy"))
+        with self.assertNumQueries(1):
+            self.assertEqual((user.username, user.date_joined), (self.user.username, self.user.date_joined))
+
+    def test_revoked_and_deactivated_tokens_are_rejected(self):
+        revoke_tokens(self.user.id)
+        self.assertEqual(self.client.get("/api/me/appointments/").status_code, 401)
+        resp = self.client.post("/api/auth/refresh/", {"refresh": str(self.refresh)}, format="json")
+        self.assertEqual(resp.status_code, 401)
+
+        fresh = MyTokenObtainPairSerializer.get_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {fresh.access_token}")
+        self.assertEqual(self.client.get("/api/me/appointments/").status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/me/appointments/").status_code, 401)
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.client.get("/api/me/appointments/").status_code, 401)  # revoked, not just paused
+
+    def test_password_change_revokes_tokens(self):
+        self.user.set_password("pw-987654321")
+        self.user.save()
+        self.assertEqual(self.client.get("/api/me/appointments/").status_code, 401)
+
+        self.user.first_name = "Amelia"
+        self.user.save()  # other saves leave tokens alone
+        fresh = MyTokenObtainPairSerializer.get_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {fresh.access_token}")
+        self.assertEqual(self.client.get("/api/me/appointments/").status_code, 200)
+
+    def test_login_stamps_the_stored_version_not_a_cached_one(self):
+        self.client.get("/api/me/appointments/")  # caches version 0
+        Profile.objects.filter(user=self.user).update(token_version=5)  # revoked on another worker
+        fresh = MyTokenObtainPairSerializer.get_token(self.user)
+        self.assertEqual(fresh["ver"], 5)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {fresh.access_token}")
+        self.assertEqual(self.client.get("/api/me/appointments/").status_code, 200)
+
+    def test_stale_claims_fall_back_to_the_database(self):
+        self.assertEqual(self.client.get("/api/stats/summary/").status_code, 200)
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/stats/summary/").status_code, 403)
+
+        # tokens minted before the claims existed still work, the stateful way
+        legacy = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {legacy}")
+        self.assertEqual(self.client.get("/api/me/appointments/").status_code, 200)
+
+
+class MeProfileQueryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user("amy", "amy@example.com", "pw-123456789", first_name="Amy")
+        self.client.force_authenticate(self.user)
+
+    def patch(self, data):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.patch("/api/me/profile/", data, format="json")
+        self.assertEqual(resp.status_code, 200)
+        return resp.json(), [q["sql"] for q in ctx.captured_queries]
+
+    def test_get_is_one_query(self):
+        with self.assertNumQueries(1):
+            body = self.client.get("/api/me/profile/").json()
+        self.assertEqual((body["first_name"], body["phone"], body["dob"]), ("Amy", "", None))
+
+    def test_patch_writes_only_changed_columns(self):
+        body, queries = self.patch({"first_name": "Amy", "phone": "555-0100"})
+        self.assertEqual(body["phone"], "555-0100")
+        self.assertEqual(len(queries), 2)  # select user+profile, update profile
+        self.assertRegex(queries[1], r'^UPDATE "api_profile" SET "phone_number" = .* WHERE')
+
+        body, queries = self.patch({"first_name": "Amy", "phone": "555-0100"})
+        self.assertEqual(len(queries), 1)  # nothing changed, nothing written
+
+        body, queries = self.patch({"last_name": "Lee", "dob": "1990-02-03"})
+        self.assertEqual((body["last_name"], body["dob"]), ("Lee", "1990-02-03"))
+        self.assertEqual(len(queries), 3)
+        self.assertRegex(queries[1], r'^UPDATE "auth_user" SET "last_name" = .* WHERE')
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.phone_number, "555-0100")
+
+    def test_patch_creates_a_missing_profile(self):
+        self.user.profile.delete()
+        body, _ = self.patch({"preferred_stylist": "Jo"})
+        self.assertEqual(body["preferred_stylist"], "Jo")
+        self.assertEqual(Profile.objects.get(user=self.user).preferred_stylist, "Jo")
+
+
+class AsyncReadViewTests(BookingTestCase):
+    """The ASGI read views must answer exactly like the DRF views they front."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+        self.user = User.objects.create_user("amy", "amy@example.com", "pw-123456789")
+        self.token = str(MyTokenObtainPairSerializer.get_token(self.user).access_token)
+        self.book("09:00", user=self.user)
+        self.book("11:00", style=self.other)
+
+    async def sync_get(self, path, params=None, **headers):
+        return await sync_to_async(self.client.get)(path, params, **headers)
+
+    async def test_style_list_matches_drf_and_shares_its_cache(self):
+        params = {"category": "braids", "ordering": "-price_min"}
+        fresh = await async_views.style_list(self.factory.get("/api/styles/", params))
+        drf = await self.sync_get("/api/styles/", params)
+        self.assertEqual(fresh.content, drf.content)
+        self.assertEqual(fresh["ETag"], drf["ETag"])
+
+        cached = await async_views.style_list(
+            self.factory.get("/api/styles/", params, headers={"If-None-Match": drf["ETag"]})
+        )
+        self.assertEqual(cached.status_code, 304)
+
+    async def test_style_list_defers_to_drf_off_the_hot_path(self):
+        bad = await async_views.style_list(self.factory.get("/api/styles/", {"min_price": "cheap"}))
+        self.assertEqual(bad.status_code, 400)
+        page = await async_views.style_list(self.factory.get("/api/styles/", {"page_size": 1}))
+        self.assertEqual(len(json.loads(page.content)["results"]), 1)
+        post = await async_views.style_list(self.factory.post("/api/styles/", {}, content_type="application/json"))
+        drf = await sync_to_async(self.client.post)("/api/styles/", {}, format="json")
+        self.assertEqual((post.status_code, json.loads(post.content)), (drf.status_code, drf.json()))
+
+    async def test_taken_matches_drf(self):
+        for params in ({"date": self.day.isoformat()}, {"date": self.day.isoformat(), "style_id": self.other.id}, {},
+                       {"date": self.day.isoformat(), "style_id": "abc"}):
+            with self.subTest(params=params):
+                ours = await async_views.taken(self.factory.get("/api/appointments/taken/", params))
+                drf = await self.sync_get("/api/appointments/taken/", params)
+                self.assertEqual(ours.status_code, drf.status_code)
+                self.assertEqual(json.loads(ours.content), drf.json())
+
+    async def test_upcoming_authenticates_bearer_tokens(self):
+        auth = {"Authorization": f"Bearer {self.token}"}
+        ours = await async_views.upcoming(self.factory.get("/api/appointments/upcoming/", headers=auth))
+        drf = await self.sync_get("/api/appointments/upcoming/", HTTP_AUTHORIZATION=auth["Authorization"])
+        self.assertEqual(json.loads(ours.content), drf.json())
+        self.assertEqual(len(drf.json()), 1)
+
+        for headers in ({}, {"Authorization": "Bearer not-a-token"}):
+            resp = await async_views.upcoming(self.factory.get("/api/appointments/upcoming/", headers=headers))
+            self.assertEqual(resp.status_code, 401)
+
+    async def test_metrics_middleware_wraps_async_views(self):
+        REGISTRY.reset()
+        middleware = MetricsMiddleware(async_views.taken)
+        self.assertTrue(iscoroutinefunction(middleware))
+        resp = await middleware(self.factory.get("/api/appointments/taken/", {"date": self.day.isoformat()}))
+        self.assertIn("app;dur=", resp["Server-Timing"])
+        self.assertIn('http_request_duration_seconds_count{view="unresolved"} 1', REGISTRY.render())
+
+
+class EndpointBudgetTests(TestCase):
+    """
+    Query-count ceilings for every endpoint against realistic volumes (see
+    ENDPOINT_BUDGETS). An N+1 in a serializer or get_queryset shows up here
+    as a blown query budget; `bench endpoints` reports the latencies.
+    """
+
+    def test_every_endpoint_stays_within_budget(self):
+        ctx = endpoint_context(seed_realistic())
+        client = APIClient()
+        with endpoint_environment():
+            for name, max_queries, _, build in ENDPOINT_BUDGETS:
+                with self.subTest(endpoint=name):
+                    for _ in range(3):
+                        response, _, queries = call_endpoint(client, ctx, build)
+                        self.assertLess(response.status_code, 400)
+                        self.assertLessEqual(queries, max_queries)
+
+
+class LoadGeneratorTests(LiveServerTestCase):
+    def setUp(self):
+        self.style = make_style()
+
+    def test_replays_mix_and_reports_conflicts(self):
+        runner = LoadRunner(
+            self.live_server_url, mix={"taken": 2, "styles": 1, "book": 3, "cancel": 1},
+            # one virtual user: the test database is in-memory SQLite, where concurrent
+            # writers fail with "table is locked" instead of waiting on the busy timeout
+            concurrency=1, duration=30, max_requests=40, collision_rate=1.0, seed=3,
+        )
+        rows, _ = runner.run()
+        by_action = {row["action"]: row for row in rows}
+
+        self.assertEqual(by_action["total"]["n"], 40)
+        self.assertEqual(by_action["total"]["error_pct"], 0.0)
+        self.assertGreater(by_action["book"]["conflict_pct"], 0.0)  # everyone wants the same slots
+        self.assertEqual(
+            Appointment.objects.filter(contact_name="Load Test").count(),
+            runner.stats.statuses["book"].get(201, 0),
+        )
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix("taken=3, book"), {"taken": 3.0, "book": 1.0})
+        with self.assertRaises(ValueError):
+            parse_mix("browse=1")
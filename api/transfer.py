@@ -0,0 +1,355 @@
+# api/transfer.py
+"""
+Bulk import/export of styles, users and appointments as CSV or NDJSON,
+behind `manage.py import_data` / `export_data` and the staff-only
+/api/export/<kind>.<format> endpoint.
+
+Exports stream: rows come from a values_list() queryset read with
+.iterator(), so memory stays flat however many rows there are. Imports
+run in chunks: each chunk is validated row by row with its lookups
+preloaded (appointments go through AppointmentImportSerializer, i.e.
+AppointmentSerializer.validate), then written with bulk_create in its own
+transaction. Invalid rows are reported by line number and skipped.
+
+Column names match in both directions, so an export can be re-imported.
+"""
+import csv
+import json
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.fields import empty
+
+from .accounts import forget_email
+from .cache import bump_version
+from .models import Style, Appointment, Profile, SlotAvailability, STYLE_CACHE_NAMESPACE
+from .serializers import AppointmentImportSerializer, StyleSerializer, UserProfileSerializer
+
+FORMATS = ("csv", "ndjson")
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# kind -> ((column, lookup), ...) for export
+COLUMNS = {
+    "styles": tuple((name, name) for name in (
+        "id", "name", "category", "price_min", "price_max", "duration_mins", "image_url", "rating_avg",
+    )),
+    "users": (
+        ("id", "id"), ("username", "username"), ("email", "email"),
+        ("first_name", "first_name"), ("last_name", "last_name"), ("date_joined", "date_joined"),
+        ("phone", "profile__phone_number"), ("dob", "profile__dob"),
+        ("preferred_stylist", "profile__preferred_stylist"),
+    ),
+    "appointments": (
+        ("id", "id"), ("datetime", "datetime"), ("status", "status"),
+        ("style", "style_id"), ("style_name", "style__name"), ("user_email", "user__email"),
+        ("contact_name", "contact_name"), ("contact_email", "contact_email"),
+        ("contact_phone", "contact_phone"), ("notes", "notes"),
+        ("amount", "style__price_min"), ("created_at", "created_at"),
+    ),
+}
+KINDS = tuple(COLUMNS)
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+# ---------- export ----------
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_rows(kind, start=None, end=None, status=None):
+    """
+    (column names, iterator of tuples) for `kind`, in id order.
+    Appointments can be limited to [start, end] dates and a status.
+    """
+    model = {"styles": Style, "users": User, "appointments": Appointment}[kind]
+    qs = model.objects.order_by("pk")
+    if kind == "appointments":
+        if start:
+            qs = qs.filter(datetime__gte=_aware(start))
+        if end:
+            qs = qs.filter(datetime__lt=_aware(end + timedelta(days=1)))
+        if status:
+            qs = qs.filter(status=status)
+    columns, lookups = zip(*COLUMNS[kind])
+    return columns, qs.values_list(*lookups).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """File-like object for csv.writer that hands each line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def render(fmt, columns, rows, lines_per_chunk=500):
+    """Yield the export as str chunks of up to `lines_per_chunk` lines."""
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        encode = lambda row: writer.writerow([_text(v) for v in row])  # noqa: E731
+    else:
+        encoder = DjangoJSONEncoder()
+        encode = lambda row: encoder.encode(dict(zip(columns, row))) + "\n"  # noqa: E731
+    while True:
+        chunk = [encode(row) for row in islice(rows, lines_per_chunk)]
+        if not chunk:
+            return
+        yield "".join(chunk)
+
+
+# ---------- import ----------
+
+def format_for(path, fmt=None):
+    """Explicit format, else inferred from the file extension."""
+    fmt = fmt or ("ndjson" if str(path).endswith((".ndjson", ".jsonl")) else "csv")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; choose from {', '.join(FORMATS)}.")
+    return fmt
+
+
+def read_rows(fmt, fh):
+    """(line number, dict of column -> value) per record, blank values dropped."""
+    if fmt == "csv":
+        reader = csv.DictReader(fh)
+        for row in reader:
+            yield reader.line_num, {k: v for k, v in row.items() if k and v not in ("", None)}
+        return
+    for line_no, line in enumerate(fh, start=1):
+        if line.strip():
+            record = json.loads(line)
+            yield line_no, {k: v for k, v in record.items() if v not in ("", None)}
+
+
+def _validated(serializer, chunk, errors):
+    """
+    (line, validated data) for each valid row; (line, field errors) for the
+    rest go to `errors`. One serializer validates every row, as a
+    ListSerializer does with its child: building a ModelSerializer's fields
+    costs more than validating a row.
+    """
+    for line, row in chunk:
+        try:
+            yield line, serializer.run_validation(row)
+        except serializers.ValidationError as exc:
+            errors.append((line, exc.detail))
+
+
+class _Importer(ABC):
+    """Per-kind import steps; build() validates a chunk, write() stores it."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.skipped = 0
+
+    @abstractmethod
+    def build(self, chunk):
+        """(objects to write, [(line, errors), ...]) for one chunk of (line, row) pairs."""
+
+    @abstractmethod
+    def write(self, objs):
+        """Store what build() returned; runs inside the chunk's transaction."""
+
+    def finish(self):
+        pass
+
+
+class _StyleImporter(_Importer):
+    """Styles whose name is already in the catalog are skipped."""
+
+    def __init__(self, batch_size):
+        super().__init__(batch_size)
+        self.names = {name.lower() for name in Style.objects.values_list("name", flat=True)}
+        self.created = False
+
+    def build(self, chunk):
+        objs, errors = [], []
+        for line, data in _validated(StyleSerializer(), chunk, errors):
+            if data["name"].lower() in self.names:
+                self.skipped += 1
+            else:
+                self.names.add(data["name"].lower())
+                objs.append(Style(**data))
+        return objs, errors
+
+    def write(self, objs):
+        Style.objects.bulk_create(objs, batch_size=self.batch_size)
+        self.created = self.created or bool(objs)
+
+    def finish(self):
+        if self.created:
+            bump_version(STYLE_CACHE_NAMESPACE)  # bulk_create skips the signal
+
+
+def _email(row):
+    return str(row.get("email", "")).strip().lower()
+
+
+def _username(row):
+    """Imported accounts default to username = email, like registration."""
+    return str(row.get("username") or _email(row)).strip()
+
+
+class _UserImporter(_Importer):
+    """
+    Accounts get an unusable password (owners reset it to log in). Emails
+    already registered, in any case, are skipped.
+    """
+
+    def __init__(self, batch_size):
+        super().__init__(batch_size)
+        self.seen = set()
+        self.email_field = serializers.EmailField()
+        self.serializer = UserProfileSerializer()
+
+    def build(self, chunk):
+        emails = {_email(row) for _, row in chunk}
+        taken = set(
+            User.objects.annotate(email_lower=Lower("email"))
+            .filter(email_lower__in=emails).values_list("email_lower", flat=True)
+        )
+        usernames = {_username(row) for _, row in chunk}
+        used = set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+
+        objs, errors = [], []
+        for line, row in chunk:
+            try:
+                email = self.email_field.run_validation(row.get("email", empty)).strip().lower()
+            except serializers.ValidationError as exc:
+                errors.append((line, {"email": exc.detail}))
+                continue
+            try:
+                data = self.serializer.run_validation(row)
+            except serializers.ValidationError as exc:
+                errors.append((line, exc.detail))
+                continue
+            if email in taken or email in self.seen:
+                self.skipped += 1
+                continue
+            username = _username(row)
+            if username in used:
+                errors.append((line, {"username": ["A user with that username already exists."]}))
+                continue
+            self.seen.add(email)
+            used.add(username)
+            profile = data.pop("profile", {})
+            objs.append((User(username=username, email=email, password=make_password(None), **data), profile))
+        return objs, errors
+
+    def write(self, objs):
+        users = User.objects.bulk_create([user for user, _ in objs], batch_size=self.batch_size)
+        Profile.objects.bulk_create(
+            [Profile(user=user, **profile) for user, (_, profile) in zip(users, objs)],
+            batch_size=self.batch_size,
+        )
+        for user in users:
+            forget_email(user.email)  # may hold a cached "no such user"
+
+
+class _AppointmentImporter(_Importer):
+    """
+    Rows repeating a booking already stored or earlier in the file (same
+    user or guest email, style and time: the unique constraints; phone-only
+    guests match on phone) are skipped, so re-running an import is safe. Overlaps are not checked:
+    history is loaded as it happened.
+    """
+
+    def __init__(self, batch_size):
+        super().__init__(batch_size)
+        self.styles = {}
+        for style in Style.objects.all():
+            self.styles[str(style.id)] = style
+            self.styles.setdefault(style.name.lower(), style)
+        self.slots = set()
+
+    @staticmethod
+    def _identity(user_id, email, phone, style_id, start):
+        if user_id is not None:
+            return ("user", user_id, style_id, start)
+        if email:
+            return ("guest", email, style_id, start)
+        return ("phone", phone, style_id, start) if phone else None
+
+    def build(self, chunk):
+        emails = {str(row["user_email"]).strip().lower() for _, row in chunk if "user_email" in row}
+        users = {
+            user.email.lower(): user
+            for user in User.objects.alias(email_lower=Lower("email")).filter(email_lower__in=emails)
+        }
+        context = {"styles": self.styles, "users": users}
+
+        errors = []
+        serializer = AppointmentImportSerializer(context=context)
+        valid = [Appointment(**data) for _, data in _validated(serializer, chunk, errors)]
+
+        seen = {
+            self._identity(*row)
+            for row in Appointment.objects.filter(datetime__in={appt.datetime for appt in valid})
+            .values_list("user_id", "contact_email", "contact_phone", "style_id", "datetime")
+        }
+        objs = []
+        for appt in valid:
+            key = self._identity(
+                appt.user_id, appt.contact_email, appt.contact_phone, appt.style_id, appt.datetime,
+            )
+            if key is not None and key in seen:
+                self.skipped += 1
+                continue
+            seen.add(key)
+            objs.append(appt)
+        return objs, errors
+
+    def write(self, objs):
+        Appointment.objects.bulk_create(objs, batch_size=self.batch_size)
+        self.slots.update(appt.slot_key() for appt in objs)
+
+    def finish(self):
+        # bulk_create skips the signals that keep the index in sync
+        SlotAvailability.objects.refresh_many(self.slots)
+
+
+IMPORTERS = {"styles": _StyleImporter, "users": _UserImporter, "appointments": _AppointmentImporter}
+
+MAX_REPORTED_ERRORS = 100
+
+
+def import_rows(kind, rows, batch_size=1000, dry_run=False):
+    """
+    Import (line, row) pairs from read_rows(). Each chunk of `batch_size`
+    rows commits on its own. Returns {"rows", "imported", "skipped",
+    "invalid", "errors"}; "errors" keeps the first MAX_REPORTED_ERRORS
+    (line, field errors) pairs.
+    """
+    importer = IMPORTERS[kind](batch_size)
+    result = {"rows": 0, "imported": 0, "skipped": 0, "invalid": 0, "errors": []}
+    rows = iter(rows)
+    while chunk := list(islice(rows, batch_size)):
+        objs, errors = importer.build(chunk)
+        if not dry_run and objs:
+            with transaction.atomic():
+                importer.write(objs)
+        result["rows"] += len(chunk)
+        result["imported"] += len(objs)
+        result["invalid"] += len(errors)
+        result["errors"].extend(errors[:max(0, MAX_REPORTED_ERRORS - len(result["errors"]))])
+    if not dry_run:
+        importer.finish()
+    result["skipped"] = importer.skipped
+    return result
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
@@ -7,6 +8,8 @@ from .views import (
     AppointmentViewSet,
     MeAppointmentsView,
     MeProfileView,
+    StatsViewSet,
+    ExportView,
 
     # Auth
     RegisterView,
@@ -22,6 +25,7 @@ from .views import (
 router = DefaultRouter()
 router.register(r"styles", StyleViewSet, basename="style")
 router.register(r"appointments", AppointmentViewSet, basename="appointment")
+router.register(r"stats", StatsViewSet, basename="stats")
 
 urlpatterns = [
     # ---------- Authentication ----------
@@ -33,6 +37,9 @@ urlpatterns = [
     path("me/appointments/", MeAppointmentsView.as_view(), name="me_appointments"),
     path("me/profile/", MeProfileView.as_view(), name="me_profile"),
 
+    # ---------- Staff export (streaming CSV / NDJSON) ----------
+    path("export/<slug:kind>.<slug:fmt>", ExportView.as_view(), name="export"),
+
     # ---------- Stripe payments ----------
     # Function-view endpoint your frontend should call
     path(
@@ -44,4 +51,13 @@ urlpatterns = [
 
     # ---------- API root (viewsets) ----------
     path("", include(router.urls)),
-]
\ No newline at end of file
+]
+if getattr(settings, "ASYNC_READ_VIEWS", False):
+    from . import async_views
+
+    # Matched before the router; they defer to the DRF views off the hot path
+    urlpatterns = [
+        path("styles/", async_views.style_list, name="style-list-async"),
+        path("appointments/taken/", async_views.taken, name="appointment-taken-async"),
+        path("appointments/upcoming/", async_views.upcoming, name="appointment-upcoming-async"),
+    ] + urlpatterns
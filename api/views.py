@@ -2,11 +2,18 @@
 from django.utils.timezone import now
 from django.contrib.auth.models import User
 from django.conf import settings
-from django.http import JsonResponse, HttpResponse
-from django.db import IntegrityError
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 
-from rest_framework import generics, viewsets, permissions
+from rest_framework import generics, viewsets, permissions, serializers
 from rest_framework.response import Response
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
+from rest_framework.filters import OrderingFilter
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import (
     action,
     api_view,
@@ -15,11 +22,15 @@ from rest_framework.decorators import (
 )
 from rest_framework.permissions import AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
 from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.utils import timezone
 
+import hashlib
+import json
 import stripe
 from urllib.parse import quote_plus
 
@@ -28,9 +39,40 @@ from .serializers import (
     UserProfileSerializer,
     StyleSerializer,
     AppointmentSerializer,
+    AppointmentReadSerializer,
+)
+from .models import (
+    Style,
+    Appointment,
+    SlotAvailability,
+    CheckoutSession,
+    StripeEvent,
+    STYLE_CACHE_NAMESPACE,
+)
+from .accounts import token_state, username_for_email
+from .authentication import TokenUserAuthentication, add_claims, check_token
+from .locks import booking_lock, booking_locks, bucket_locks, SlotBusy
+from .cache import CachedReadMixin
+from .stats import GROUPS, PERIODS, booking_stats
+from .transfer import (
+    CONTENT_TYPES as EXPORT_CONTENT_TYPES,
+    FORMATS as EXPORT_FORMATS,
+    KINDS as EXPORT_KINDS,
+    export_rows,
+    render as render_export,
+)
+from .filters import StyleFilter
+from .pagination import (
+    StyleCursorPagination,
+    AppointmentCursorPagination,
+    UpcomingCursorPagination,
+)
+from .notifications import (
+    send_booking_confirmation,
+    send_payment_confirmation,
+    queue_booking_confirmations,
+    queue_status_updates,
 )
-from .models import Style, Appointment
-from .notifications import send_booking_confirmation, send_payment_confirmation
 
 # ---------------- AUTH ----------------
 
@@ -41,37 +83,95 @@ class RegisterView(generics.CreateAPIView):
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
-        token = super().get_token(user)
-        token["email"] = user.email
-        token["name"] = f"{user.first_name} {user.last_name}".strip()
-        return token
+        # claims TokenUserAuthentication serves request.user from
+        return add_claims(super().get_token(user), user)
 
     def validate(self, attrs):
         supplied = attrs.get("username")
         if supplied and "@" in supplied:
-            try:
-                u = User.objects.get(email__iexact=supplied)
-                attrs["username"] = u.username
-            except User.DoesNotExist:
-                pass
+            attrs["username"] = username_for_email(supplied) or supplied
         return super().validate(attrs)
 
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
 
+class MyTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        check_token(refresh, token_state(refresh[jwt_settings.USER_ID_CLAIM]))
+        return super().validate(attrs)
+
 class MyTokenRefreshView(TokenRefreshView):
-    pass
+    serializer_class = MyTokenRefreshSerializer
 
 # ---------------- STYLES ----------------
 
-class StyleViewSet(viewsets.ModelViewSet):
+class StyleViewSet(CachedReadMixin, viewsets.ModelViewSet):
+    """
+    Style catalog. Supports ?category=, ?min_price=/max_price=, ?max_duration=,
+    ?min_rating=, ?ordering=(-)name|price_min|duration_mins, and cursor
+    pagination when ?page_size= or ?cursor= is given.
+    """
+    cache_namespace = STYLE_CACHE_NAMESPACE
     queryset = Style.objects.all().order_by("name")
     serializer_class = StyleSerializer
     permission_classes = [permissions.AllowAny]
     authentication_classes = []
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = StyleFilter
+    ordering_fields = ("name", "price_min", "duration_mins")
+    ordering = ("name",)
+    pagination_class = StyleCursorPagination
 
 # ---------------- APPOINTMENTS ----------------
 
+MAX_TAKEN_RANGE_DAYS = 92
+MAX_BULK_SIZE = 500
+
+# bulk-status target -> statuses it may be applied to
+BULK_TRANSITIONS = {
+    "approved": ("pending",),
+    "cancelled": ("pending", "approved", "paid"),
+}
+
+
+class BulkStatusSerializer(serializers.Serializer):
+    """bulk-status body; ids and style_id must be integers, so bad input is a 400."""
+    status = serializers.ChoiceField(choices=list(BULK_TRANSITIONS))
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), max_length=MAX_BULK_SIZE, required=False, allow_null=True,
+    )
+    date = serializers.DateField(required=False, allow_null=True)
+    style_id = serializers.IntegerField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        if attrs.get("ids") is None and not attrs.get("date"):
+            raise ValidationError({"detail": "Provide ids or date."})
+        return attrs
+
+
+INVALID_STYLE_ID = "Invalid style_id (must be an integer)."
+
+
+def _bad_style_id(style_id):
+    """True unless the style_id query param is absent or a whole number."""
+    return bool(style_id) and not style_id.isdecimal()
+
+
+def _conflict(detail):
+    err = APIException(detail)
+    err.status_code = 409
+    return err
+
+
+def _lean_list(request, queryset, paginator, view):
+    """List appointments through the values()-based read serializer."""
+    rows = AppointmentReadSerializer.values_queryset(queryset)
+    page = paginator.paginate_queryset(rows, request, view=view)
+    if page is not None:
+        return paginator.get_paginated_response(AppointmentReadSerializer(page, many=True).data)
+    return Response(AppointmentReadSerializer(rows, many=True).data)
+
 class AppointmentViewSet(viewsets.ModelViewSet):
     """
     - Anyone can create.
@@ -79,10 +179,13 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     - Staff can view all.
     """
     serializer_class = AppointmentSerializer
+    pagination_class = AppointmentCursorPagination
 
     def get_permissions(self):
-        if self.action in ("create", "taken"):
+        if self.action in ("create", "taken", "taken_range"):
             return [permissions.AllowAny()]
+        if self.action in ("bulk_create", "bulk_status"):
+            return [permissions.IsAdminUser()]
         return [permissions.IsAuthenticated()]
 
     def get_queryset(self):
@@ -91,26 +194,47 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         if user.is_authenticated and user.is_staff:
             return qs
         if user.is_authenticated:
-            return qs.filter(user=user)
+            return qs.filter(user_id=user.id)
         return qs.none()
 
+    def list(self, request, *args, **kwargs):
+        return _lean_list(request, self.filter_queryset(self.get_queryset()), self.paginator, self)
+
     def perform_create(self, serializer):
-        user = self.request.user if self.request.user.is_authenticated else None
+        user_id = self.request.user.id if self.request.user.is_authenticated else None
+        style = serializer.validated_data["style"]
+        start = serializer.validated_data["datetime"]
         try:
-            appt = serializer.save(user=user)
+            # Serialize per (style, day) so the overlap check and insert are atomic
+            with booking_lock(style, start):
+                if Appointment.objects.overlapping(style, start).exists():
+                    raise _conflict("This time overlaps an existing booking for this service.")
+                appt = serializer.save(user_id=user_id)
+                # outbox rows commit with the booking; the drain_outbox worker delivers them
+                send_booking_confirmation(appt)
+        except SlotBusy:
+            raise _conflict("This time is being booked right now. Please pick another slot.")
         except IntegrityError:
-            from rest_framework.exceptions import APIException
-            err = APIException(
+            raise _conflict(
                 "An appointment for this service, date, and time already exists for you."
             )
-            err.status_code = 409
-            raise err
 
-        # fire-and-forget confirmation
+    def perform_update(self, serializer):
+        appt = serializer.instance
+        style = serializer.validated_data.get("style", appt.style)
+        start = serializer.validated_data.get("datetime", appt.datetime)
+        if (style.id, start) == (appt.style_id, appt.datetime):
+            serializer.save()
+            return
         try:
-            send_booking_confirmation(appt)
-        except Exception:
-            pass
+            # the old slot's buckets too: the save signal rebuilds the day it leaves
+            with booking_locks([(style, start), (appt.style, appt.datetime)]):
+                if Appointment.objects.overlapping(style, start).exclude(pk=appt.pk).exists():
+                    raise _conflict("This time overlaps an existing booking for this service.")
+                # a new time deserves a new reminder
+                serializer.save(reminded_at=None)
+        except SlotBusy:
+            raise _conflict("This time is being booked right now. Please pick another slot.")
 
     @action(
         detail=False,
@@ -121,29 +245,59 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     )
     def taken(self, request):
         date_str = request.query_params.get("date")
-        if not date_str or not parse_date(date_str):
+        day = parse_date(date_str) if date_str else None
+        if not day:
             return Response({"detail": "Missing or invalid date (YYYY-MM-DD)."}, status=400)
 
         style_id = request.query_params.get("style_id")
+        if _bad_style_id(style_id):
+            return Response({"detail": INVALID_STYLE_ID}, status=400)
 
-        qs = (
-            Appointment.objects
-            .select_related("style")
-            .filter(datetime__date=date_str)
-            .exclude(status="cancelled")
-        )
-        if style_id:
-            qs = qs.filter(style_id=style_id)
+        # Served from the availability index (kept in sync by model signals)
+        availability = SlotAvailability.objects.availability_on(day, style_id)
+
+        return Response({"date": date_str, "style_id": style_id, **availability})
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[AllowAny],
+        authentication_classes=[],
+        url_path="taken-range",
+    )
+    def taken_range(self, request):
+        """
+        Taken slots for every day in [start, end] as {"YYYY-MM-DD": [...]},
+        so a month view is one request instead of one per day.
+        """
+        start_str = request.query_params.get("start")
+        end_str = request.query_params.get("end")
+        start = parse_date(start_str) if start_str else None
+        end = parse_date(end_str) if end_str else None
+        if not start or not end or end < start:
+            return Response(
+                {"detail": "Missing or invalid start/end (YYYY-MM-DD, start <= end)."},
+                status=400,
+            )
+        if (end - start).days >= MAX_TAKEN_RANGE_DAYS:
+            return Response(
+                {"detail": f"Range cannot exceed {MAX_TAKEN_RANGE_DAYS} days."},
+                status=400,
+            )
+
+        style_id = request.query_params.get("style_id")
+        if _bad_style_id(style_id):  # before streaming starts, while a 400 can still be sent
+            return Response({"detail": INVALID_STYLE_ID}, status=400)
+        days = SlotAvailability.objects.taken_between(start, end, style_id)
 
-        seen = set()
-        taken = []
-        for appt in qs:
-            hhmm = appt.datetime.strftime("%H:%M")
-            if hhmm not in seen:
-                seen.add(hhmm)
-                taken.append(hhmm)
+        def stream():
+            yield json.dumps({"start": start_str, "end": end_str, "style_id": style_id})[:-1]
+            yield ', "taken": {'
+            for i, (day, taken) in enumerate(days):
+                yield ("" if i == 0 else ", ") + f'"{day.isoformat()}": {json.dumps(taken)}'
+            yield "}}"
 
-        return Response({"date": date_str, "style_id": style_id, "taken": taken})
+        return StreamingHttpResponse(stream(), content_type="application/json")
 
     @action(
         detail=False,
@@ -160,7 +314,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             .exclude(status="cancelled")
             .order_by("datetime")
         )
-        return Response(AppointmentSerializer(qs, many=True).data)
+        return _lean_list(request, qs, UpcomingCursorPagination(), self)
 
     @action(
         detail=True,
@@ -171,35 +325,209 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         appt = self.get_object()
         if appt.status != "cancelled":
             appt.status = "cancelled"
-            appt.save(update_fields=["status"])
+            try:
+                # status and index change together, never around a booking in flight
+                with booking_lock(appt.style, appt.datetime):
+                    appt.save(update_fields=["status", "updated_at"])
+            except SlotBusy:
+                raise _conflict("This booking is being changed right now. Please retry.")
         return Response(AppointmentSerializer(appt).data)
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request):
+        """
+        Staff: book a list of guest appointments in one transaction. All or
+        nothing: any overlap (with existing bookings or within the batch)
+        is a 409 and nothing is saved.
+        """
+        if not isinstance(request.data, list) or not 0 < len(request.data) <= MAX_BULK_SIZE:
+            raise ValidationError({"detail": f"Send a list of 1-{MAX_BULK_SIZE} appointments."})
+        # no request in context: staff details must not be copied into guests' contacts
+        serializer = AppointmentSerializer(data=request.data, many=True, context={"view": self})
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data
+
+        slots = sorted(
+            ((item["style"].id, item["datetime"], item["style"]) for item in items),
+            key=lambda slot: slot[:2],
+        )
+        for (style_id, start, style), (next_id, next_start, _) in zip(slots, slots[1:]):
+            if style_id == next_id and next_start < start + timedelta(minutes=max(style.duration_mins, 1)):
+                raise _conflict(f"Bookings at {start.isoformat()} and {next_start.isoformat()} overlap.")
+
+        overlaps = Q()
+        for _, start, style in slots:
+            span = timedelta(minutes=max(style.duration_mins, 1))
+            overlaps |= Q(style=style, datetime__gt=start - span, datetime__lt=start + span)
+
+        appts = [Appointment(**item) for item in items]
+        try:
+            with booking_locks([(style, start) for _, start, style in slots]):
+                if Appointment.objects.filter(overlaps).exclude(status="cancelled").exists():
+                    raise _conflict("One or more times overlap an existing booking.")
+                Appointment.objects.bulk_create(appts)
+                # bulk_create skips the signals that keep the index in sync
+                SlotAvailability.objects.refresh_many(appt.slot_key() for appt in appts)
+                queue_booking_confirmations(appts)
+        except SlotBusy:
+            raise _conflict("Some of these times are being booked right now. Please retry.")
+        except IntegrityError:
+            raise _conflict("One or more of these appointments already exist.")
+
+        return Response(AppointmentSerializer(appts, many=True).data, status=201)
+
+    @action(detail=False, methods=["post"], url_path="bulk-status")
+    def bulk_status(self, request):
+        """
+        Staff: approve or cancel many appointments with one UPDATE.
+        Body: {"status": "approved"|"cancelled"} plus either "ids": [...] or
+        "date": "YYYY-MM-DD" (optionally "style_id"). Rows not in an
+        eligible status are left alone.
+        """
+        serializer = BulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        status = data["status"]
+
+        qs = Appointment.objects.order_by().filter(status__in=BULK_TRANSITIONS[status])
+        if data.get("ids") is not None:
+            qs = qs.filter(id__in=data["ids"])
+        else:
+            start = timezone.make_aware(datetime.combine(data["date"], time.min))
+            qs = qs.filter(datetime__gte=start, datetime__lt=start + timedelta(days=1))
+            if data.get("style_id"):
+                qs = qs.filter(style_id=data["style_id"])
+
+        # Cancelling rebuilds index buckets: take their booking locks before the
+        # row locks, in the same order as a booking does, so a booking in flight
+        # can't be dropped from the index and nothing deadlocks.
+        buckets = []
+        if status == "cancelled":
+            candidates = list(qs.values_list("id", "style_id", "datetime"))
+            qs = qs.filter(id__in=[pk for pk, _, _ in candidates])
+            buckets = [(style_id, timezone.localdate(dt)) for _, style_id, dt in candidates]
+        try:
+            with bucket_locks(buckets):
+                rows = list(
+                    qs.select_for_update(of=("self",)).values_list(
+                        "id", "style_id", "contact_name", "contact_email", "contact_phone",
+                        "style__name", "datetime",
+                    )
+                )
+                ids = [row[0] for row in rows]
+                # .update() bypasses auto_now and signals: stamp and re-index by hand
+                Appointment.objects.filter(id__in=ids).update(status=status, updated_at=now())
+                if status == "cancelled":
+                    SlotAvailability.objects.refresh_many(
+                        (timezone.localdate(row[6]), row[1]) for row in rows
+                    )
+                queue_status_updates([row[2:] for row in rows], status)
+        except SlotBusy:
+            raise _conflict("Some of these bookings are being changed right now. Please retry.")
+
+        return Response({"status": status, "updated": len(ids), "ids": ids})
+
+# ---------------- STATS (staff) ----------------
+
+class StatsViewSet(viewsets.ViewSet):
+    """
+    Staff reports aggregated in SQL. Common params: ?start=&end= (YYYY-MM-DD)
+    and ?by=status|category|style.
+      - bookings/: time series, ?period=day|week|month (default day)
+      - summary/:  totals over the range (default by=status)
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def _params(self, request, default_by=None):
+        params = request.query_params
+        start = parse_date(params["start"]) if params.get("start") else None
+        end = parse_date(params["end"]) if params.get("end") else None
+        by = params.get("by", default_by)
+        if (params.get("start") and not start) or (params.get("end") and not end):
+            raise ValidationError({"detail": "Invalid start/end (YYYY-MM-DD)."})
+        if by and by not in GROUPS:
+            raise ValidationError({"by": f"Choose one of: {', '.join(GROUPS)}."})
+        return start, end, by
+
+    @action(detail=False, methods=["get"])
+    def bookings(self, request):
+        start, end, by = self._params(request)
+        period = request.query_params.get("period", "day")
+        if period not in PERIODS:
+            raise ValidationError({"period": f"Choose one of: {', '.join(PERIODS)}."})
+        return Response(booking_stats(period=period, by=by, start=start, end=end))
+
+    @action(detail=False, methods=["get"])
+    def summary(self, request):
+        start, end, by = self._params(request, default_by="status")
+        return Response(booking_stats(by=by, start=start, end=end))
+
+# ---------------- EXPORT (staff) ----------------
+
+class _ExportNegotiation(DefaultContentNegotiation):
+    """
+    The export body is written by the view whatever the Accept header says
+    (e.g. text/csv); only error responses go through a renderer, as JSON.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class ExportView(APIView):
+    """
+    Staff: stream /api/export/<styles|users|appointments>.<csv|ndjson>.
+    Appointments accept ?start=&end= (YYYY-MM-DD) and ?status=.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = [JSONRenderer]
+    content_negotiation_class = _ExportNegotiation
+
+    def get(self, request, kind, fmt):
+        if kind not in EXPORT_KINDS or fmt not in EXPORT_FORMATS:
+            raise NotFound()
+        params = request.query_params
+        start = parse_date(params["start"]) if params.get("start") else None
+        end = parse_date(params["end"]) if params.get("end") else None
+        if (params.get("start") and not start) or (params.get("end") and not end):
+            raise ValidationError({"detail": "Invalid start/end (YYYY-MM-DD)."})
+
+        columns, rows = export_rows(kind, start=start, end=end, status=params.get("status"))
+        response = StreamingHttpResponse(render_export(fmt, columns, rows), content_type=EXPORT_CONTENT_TYPES[fmt])
+        response["Content-Disposition"] = f'attachment; filename="{kind}.{fmt}"'
+        return response
+
 # ---------------- PROFILE (me) ----------------
 
 class MeAppointmentsView(generics.ListAPIView):
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AppointmentCursorPagination
 
     def get_queryset(self):
         return (
             Appointment.objects
-            .select_related("style")
-            .filter(user=self.request.user)
+            .select_related("style", "user")
+            .filter(user_id=self.request.user.id)
         )
 
+    def list(self, request, *args, **kwargs):
+        return _lean_list(request, self.get_queryset(), self.paginator, self)
+
 class MeProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = UserProfileSerializer
 
     def get_object(self):
-        return self.request.user
+        # one query for GET; the serializer's PATCH path reuses the profile
+        return User.objects.select_related("profile").get(pk=self.request.user.id)
 
 # ---------------- STRIPE PAYMENT ----------------
 
 stripe.api_key = getattr(settings, "STRIPE_SECRET_KEY", None)
 
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([TokenUserAuthentication])
 @permission_classes([permissions.IsAuthenticated])
 def create_checkout_session(request, appointment_id: int):
     try:
@@ -226,7 +554,7 @@ def create_checkout_session(request, appointment_id: int):
     # Prepare data for success_url enrichments
     amount_str = f"{unit_amount_cents / 100:.2f}"
     style_name = getattr(appt.style, "name", "Service")
-    raw_first = (user.first_name or "").strip() or getattr(appt, "contact_name", "") or "there"
+    raw_first = user.get_full_name().strip() or getattr(appt, "contact_name", "") or "there"
     first_name = raw_first.split(" ")[0]
     appt_dt = getattr(appt, "datetime", None)
     dt_iso = appt_dt.isoformat() if appt_dt else ""
@@ -264,11 +592,58 @@ def create_checkout_session(request, appointment_id: int):
         if customer_email:
             kwargs["customer_email"] = customer_email
 
-        session = stripe.checkout.Session.create(**kwargs)
-        return JsonResponse({"url": session.url})
+        return JsonResponse({"url": _checkout_url(appt, kwargs, unit_amount_cents)})
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
+
+def _checkout_url(appt, kwargs, amount_cents):
+    """
+    URL of an open Checkout session for `appt`, creating one only when the
+    stored session is missing, about to expire, or was built from different
+    arguments (price, service, time or customer changed).
+
+    Stripe is called outside any transaction, so a slow round trip never
+    holds the database write lock; the idempotency key makes a double-click
+    get the same session instead.
+    """
+    fingerprint = hashlib.sha256(json.dumps(kwargs, sort_keys=True).encode()).hexdigest()
+    margin = timedelta(seconds=getattr(settings, "CHECKOUT_SESSION_REUSE_MARGIN_SECONDS", 300))
+
+    cached = CheckoutSession.objects.filter(appointment_id=appt.id).first()
+    if cached and cached.fingerprint == fingerprint and cached.expires_at > now() + margin:
+        return cached.url
+
+    # Same arguments and same session being replaced (or none, per status):
+    # same key. Replacing an expiring session, or paying, moves to a new key.
+    generation = cached.session_id if cached else appt.status
+    session = stripe.checkout.Session.create(
+        **kwargs, idempotency_key=f"checkout-{appt.id}-{fingerprint}-{generation}",
+    )
+    if cached and cached.fingerprint != fingerprint:
+        try:
+            # don't leave a payable session at the old price around
+            stripe.checkout.Session.expire(cached.session_id)
+        except Exception:
+            pass
+
+    expires_at = getattr(session, "expires_at", None)
+    with transaction.atomic():
+        CheckoutSession.objects.update_or_create(
+            appointment_id=appt.id,
+            defaults={
+                "session_id": session.id,
+                "url": session.url,
+                "amount_cents": amount_cents,
+                "fingerprint": fingerprint,
+                "expires_at": (
+                    datetime.fromtimestamp(expires_at, tz=dt_timezone.utc) if expires_at
+                    else now() + timedelta(hours=23)
+                ),
+            },
+        )
+    return session.url
+
 @api_view(["POST"])
 def stripe_webhook(request):
     webhook_secret = getattr(settings, "STRIPE_WEBHOOK_SECRET", None)
@@ -279,37 +654,62 @@ def stripe_webhook(request):
     sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
 
     try:
-        event = stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
+        stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
     except stripe.error.SignatureVerificationError:
         return HttpResponse(status=400)
     except ValueError:
         return HttpResponse(status=400)
+    # Verified; read it as a plain dict (newer SDKs' Event objects have no .get)
+    event = json.loads(payload)
 
-    if event.get("type") == "checkout.session.completed":
-        session = event["data"]["object"]
-        metadata = session.get("metadata") or {}
-        appt_id = metadata.get("appointment_id")
-        amount_total = session.get("amount_total") or 0
-        paid_amount = (amount_total or 0) / 100.0
+    event_id = event.get("id")
+    if not event_id:
+        return HttpResponse(status=400)
+    # Redelivery: one indexed lookup, acknowledged without reprocessing
+    if StripeEvent.objects.filter(event_id=event_id).exists():
+        return HttpResponse(status=200)
+
+    # Ledger row and its effects commit together: a failure is retried by
+    # Stripe, a concurrent duplicate blocks on the unique event_id and stops.
+    with transaction.atomic():
+        ledger, created = StripeEvent.objects.get_or_create(
+            event_id=event_id, defaults={"type": event.get("type") or ""}
+        )
+        if created and event.get("type") == "checkout.session.completed":
+            _mark_paid(ledger, event["data"]["object"])
 
-        if appt_id:
-            try:
-                appt = Appointment.objects.get(id=int(appt_id))
-                # Mark as paid (works whether you have 'is_paid' or 'status')
-                if hasattr(appt, "is_paid"):
-                    appt.is_paid = True
-                if hasattr(appt, "status"):
-                    appt.status = "paid"
-                # If your model has an amount column, record it:
-                if hasattr(appt, "amount") and not getattr(appt, "amount"):
-                    appt.amount = paid_amount
-                appt.save()
-
-                try:
-                    send_payment_confirmation(appt, paid_amount)
-                except Exception:
-                    pass
-            except Appointment.DoesNotExist:
-                pass
-
-    return HttpResponse(status=200)
\ No newline at end of file
+    return HttpResponse(status=200)
+
+
+def _mark_paid(ledger, session):
+    metadata = session.get("metadata") or {}
+    appt_id = metadata.get("appointment_id")
+    if not appt_id or not str(appt_id).isdigit():
+        return
+    paid_amount = (session.get("amount_total") or 0) / 100.0
+
+    appt = (
+        Appointment.objects.select_related("style")
+        .only("id", "status", "datetime", "style_id", "contact_name", "contact_email", "style__name")
+        .filter(id=int(appt_id))
+        .first()
+    )
+    if appt is None:
+        return
+    ledger.appointment = appt
+    ledger.save(update_fields=["appointment"])
+    CheckoutSession.objects.filter(appointment_id=appt.id).delete()  # completed; never reuse
+
+    # Narrow transition instead of a full-row save; already-paid rows are left alone
+    updated = (
+        Appointment.objects.filter(id=appt.id).exclude(status="paid")
+        .update(status="paid", updated_at=now())
+    )
+    if not updated:
+        return
+    if appt.status == "cancelled":
+        # .update() skips the signal; paying revives the slot
+        SlotAvailability.objects.refresh(*appt.slot_key())
+
+    # queued; delivered by the drain_outbox worker
+    send_payment_confirmation(appt, paid_amount)
@@ -0,0 +1,228 @@
+# config/metrics.py
+"""
+Per-view request metrics.
+
+MetricsMiddleware times every request, counts and times its SQL through
+`connection.execute_wrapper`, and records the response size. Samples go
+into in-process histograms labelled by the resolved view (e.g.
+"AppointmentViewSet.taken", "stripe_webhook"), served in Prometheus text
+format at /api/metrics/, and each response gets a Server-Timing header.
+
+Streaming responses (taken-range, the exports) run most of their queries
+while the body is sent, after the view has returned. Their samples are
+recorded when the stream ends, and they get no Server-Timing header
+since the headers go out before the numbers are known.
+
+Histograms live in the worker process: scrape each worker, or aggregate
+in Prometheus across instances.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name -> (help text, bucket bounds)
+METRICS = {
+    "http_request_duration_seconds": ("Wall time per request.", DURATION_BUCKETS),
+    "http_request_db_queries": ("SQL queries per request.", QUERY_BUCKETS),
+    "http_request_db_duration_seconds": ("Time spent in SQL per request.", DURATION_BUCKETS),
+    "http_response_size_bytes": ("Response body size.", SIZE_BUCKETS),
+}
+
+
+class Histogram:
+    """Cumulative-on-export histogram: per-bucket counts plus sum and count."""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}  # view label -> {metric name: Histogram}
+
+    def observe(self, view, samples):
+        with self._lock:
+            histograms = self._views.get(view)
+            if histograms is None:
+                histograms = self._views[view] = {
+                    name: Histogram(bounds) for name, (_, bounds) in METRICS.items()
+                }
+            for name, value in samples.items():
+                histograms[name].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            lines = []
+            for name, (help_text, bounds) in METRICS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for view in sorted(self._views):
+                    hist = self._views[view][name]
+                    label = view.replace("\\", "\\\\").replace('"', '\\"')
+                    running = 0
+                    for bound, count in zip((*bounds, "+Inf"), hist.counts):
+                        running += count
+                        lines.append(f'{name}_bucket{{view="{label}",le="{bound}"}} {running}')
+                    lines.append(f'{name}_sum{{view="{label}"}} {hist.sum:g}')
+                    lines.append(f'{name}_count{{view="{label}"}} {hist.count}')
+            return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _QueryTimer:
+    """execute_wrapper hook: counts queries and accumulates their time."""
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def view_label(request):
+    """
+    "ViewSet.action" for DRF viewsets, the class or function name for
+    other views; one shared label for unresolved paths keeps the number of
+    series bounded.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    func = match.func
+    cls = getattr(func, "cls", None) or getattr(func, "view_class", None)
+    actions = getattr(func, "actions", None)
+    if cls and actions:
+        return f"{cls.__name__}.{actions.get(request.method.lower(), request.method.lower())}"
+    if cls:
+        return cls.__name__  # @api_view functions are wrapped in a class named after them
+    return getattr(func, "__name__", match.view_name or "unknown")
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        return self._record(request, response, started, timer)
+
+    async def __acall__(self, request):
+        # DB connections are per thread and the ORM (sync views and async
+        # querysets alike) runs on asgiref's sync thread, so under ASGI the
+        # DB samples only see queries made on this one; wall time is exact.
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = await self.get_response(request)
+        return self._record(request, response, started, timer)
+
+    def _record(self, request, response, started, timer):
+        if response.streaming:
+            self._record_when_streamed(request, response, started, timer)
+            return response
+        elapsed = time.perf_counter() - started
+        _observe(request, elapsed, timer, len(response.content))
+        response["Server-Timing"] = (
+            f"app;dur={elapsed * 1000:.1f}, "
+            f'db;dur={timer.seconds * 1000:.1f};desc="{timer.count} queries"'
+        )
+        return response
+
+    def _record_when_streamed(self, request, response, started, timer):
+        content = response.streaming_content
+
+        def measured():
+            size = 0
+            iterator = iter(content)
+            try:
+                while True:
+                    # only while producing a chunk: the thread may serve others between chunks
+                    with connection.execute_wrapper(timer):
+                        chunk = next(iterator, None)
+                    if chunk is None:
+                        return
+                    size += len(chunk)
+                    yield chunk
+            finally:
+                _observe(request, time.perf_counter() - started, timer, size)
+
+        async def ameasured():
+            size = 0
+            try:
+                async for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+            finally:
+                _observe(request, time.perf_counter() - started, timer, size)
+
+        response.streaming_content = ameasured() if response.is_async else measured()
+
+
+def _observe(request, elapsed, timer, size):
+    REGISTRY.observe(view_label(request), {
+        "http_request_duration_seconds": elapsed,
+        "http_request_db_queries": timer.count,
+        "http_request_db_duration_seconds": timer.seconds,
+        "http_response_size_bytes": size,
+    })
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. When METRICS_TOKEN is set the scraper must
+    send it as a bearer token; without one only staff sessions (e.g. logged
+    in to the admin) may read it.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        allowed = request.headers.get("Authorization") == f"Bearer {token}"
+    else:
+        allowed = getattr(request, "user", None) is not None and request.user.is_staff
+    if not allowed:
+        return HttpResponse(status=403)
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -32,6 +32,7 @@ INSTALLED_APPS = [
     # Third-party
     "rest_framework",
     "corsheaders",
+    "django_filters",
 
     # Local apps
     "api",
@@ -39,6 +40,8 @@ INSTALLED_APPS = [
 
 # --- Middleware ---
 MIDDLEWARE = [
+    # first, so its timings cover every other middleware
+    "config.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
 
@@ -81,6 +84,34 @@ DATABASES = {
     }
 }
 
+# --- Cache (locmem per process by default; set REDIS_URL to share across workers) ---
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+# Seconds a cached catalog response lives; also bounds staleness for
+# per-process caches that don't see another worker's invalidation.
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+# --- Async read views ---
+# Serve styles/taken/upcoming from native async views (api/async_views.py).
+# config/asgi.py turns this on; under WSGI they would only add overhead.
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "false").lower() == "true"
+
+# --- Metrics (Prometheus text at /api/metrics/) ---
+# If set, scrapers must send "Authorization: Bearer <token>"; if not, only
+# staff sessions can read the endpoint.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 # --- Password validation ---
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -104,7 +135,8 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # --- DRF / JWT ---
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # JWT claims stand in for the User row; see api/authentication.py
+        "api.authentication.TokenUserAuthentication",
     ),
     # Public by default; views override where needed
     "DEFAULT_PERMISSION_CLASSES": (
@@ -116,6 +148,13 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
+# Seconds an email -> username login lookup is cached. Saving a user clears
+# their current address; a changed-away address may resolve until expiry.
+LOGIN_EMAIL_CACHE_TTL = int(os.getenv("LOGIN_EMAIL_CACHE_TTL", "60"))
+# Seconds the user state that access-token claims are checked against is
+# cached. Saves clear it locally; with a per-process cache other workers
+# notice a revocation or deactivation within this window.
+TOKEN_STATE_CACHE_TTL = int(os.getenv("TOKEN_STATE_CACHE_TTL", "300"))
 
 # --- CORS / CSRF ---
 CORS_ALLOWED_ORIGINS = [
@@ -132,6 +171,19 @@ CORS_ALLOW_CREDENTIALS = True
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 DEFAULT_FROM_EMAIL = "noreply@hairsalon.dev"
 
+# --- Booking ---
+# Seconds a booking waits for a concurrent booking of the same style/day
+# before giving up with 409.
+BOOKING_LOCK_TIMEOUT = float(os.getenv("BOOKING_LOCK_TIMEOUT", "2"))
+
+# --- Notification outbox (drained by `manage.py drain_outbox`) ---
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "30"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+
+# --- Reporting rollups (refreshed by `manage.py rollup_appointments`) ---
+# How far the watermark trails each run, to catch slow-committing writes.
+ROLLUP_WATERMARK_LAG_SECONDS = int(os.getenv("ROLLUP_WATERMARK_LAG_SECONDS", "60"))
+
 # --- Stripe / Frontend ---
 STRIPE_SECRET_KEY = os.getenv(
     "STRIPE_SECRET_KEY",
@@ -141,6 +193,8 @@ STRIPE_WEBHOOK_SECRET = os.getenv(
     "STRIPE_WEBHOOK_SECRET",
     "",
 )
+# An open Checkout session is reused until this many seconds before it expires
+CHECKOUT_SESSION_REUSE_MARGIN_SECONDS = int(os.getenv("CHECKOUT_SESSION_REUSE_MARGIN_SECONDS", "300"))
 # Use the same origin you actually browse on during dev
 FRONTEND_BASE_URL = os.getenv("FRONTEND_BASE_URL", "http://localhost:5173")
 
@@ -5,8 +5,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("api/metrics/", metrics_view, name="metrics"),  # Prometheus scrape
     path("api/", include("api.urls")),  # app API routes
 
     # --- Password reset endpoints (Django built-ins) ---